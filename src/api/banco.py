@@ -0,0 +1,112 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.pool import QueuePool
+
+from src.database.publicacao import banco_atual
+from src.utils.metricas import histograma
+
+# --- CONFIGURAÇÃO DO ACESSO AO BANCO ---
+# O arquivo em uso vem do ponteiro gravado pelo importador (src/database/publicacao.py);
+# sem ponteiro, o banco_teste.db da raiz
+DB_URL = None
+
+# Pool explícito: no máximo TAMANHO_POOL conexões abertas, reaproveitadas entre requisições
+TAMANHO_POOL = 8
+ESPERA_CONEXAO_SEGUNDOS = 30
+
+# Executor dedicado às consultas (mesmo tamanho do pool: cada thread sempre acha uma conexão)
+# As rotas são async: enquanto o SQLite trabalha aqui, o event loop continua atendendo
+MAX_THREADS_BANCO = TAMANHO_POOL
+
+# Aplicados em cada conexão nova do pool. A API só lê.
+PRAGMAS_LEITURA = {
+    "query_only": "ON",           # Qualquer escrita vira erro
+    "mmap_size": 268435456,       # 256 MB lidos via memória mapeada (menos cópias)
+    "cache_size": -65536,         # Negativo = KB -> ~64 MB de cache por conexão
+    "temp_store": "MEMORY",
+}
+
+engine = None
+executor = None
+arquivo = None # Banco aberto agora (None quando a URL foi passada direto para abrir())
+
+# Tempo de cada comando SQL, por operação (SELECT, PRAGMA, ...): exportado no /metrics
+SQL_SEGUNDOS = histograma("api_sql_segundos", "Duração dos comandos SQL executados pela API", ("operacao",))
+
+def configurar_conexao(conexao_dbapi, _registro):
+    cursor = conexao_dbapi.cursor()
+    for nome, valor in PRAGMAS_LEITURA.items():
+        cursor.execute(f"PRAGMA {nome} = {valor}")
+    cursor.close()
+
+def antes_do_sql(conn, _cursor, _sql, _params, _contexto, _varios):
+    conn.info["inicio_sql"] = time.perf_counter()
+
+def depois_do_sql(conn, _cursor, sql, _params, _contexto, _varios):
+    inicio = conn.info.pop("inicio_sql", None)
+    if inicio is None:
+        return
+    operacao = sql.lstrip().split(None, 1)[0].upper() if sql.strip() else "?"
+    SQL_SEGUNDOS.observar(time.perf_counter() - inicio, operacao=operacao)
+
+def conexoes_em_uso():
+    return engine.pool.checkedout() if engine is not None else 0
+
+def criar_engine(url=DB_URL):
+    novo = create_engine(
+        url,
+        poolclass=QueuePool,
+        pool_size=TAMANHO_POOL,
+        max_overflow=0,
+        pool_timeout=ESPERA_CONEXAO_SEGUNDOS,
+        connect_args={"check_same_thread": False}, # A conexão é usada pela thread que a pegou do pool
+    )
+    event.listen(novo, "connect", configurar_conexao)
+    event.listen(novo, "before_cursor_execute", antes_do_sql)
+    event.listen(novo, "after_cursor_execute", depois_do_sql)
+    return novo
+
+def abrir(url=DB_URL):
+    """Chamado na subida da API (lifespan)"""
+    global engine, executor, arquivo
+    arquivo = None if url else banco_atual()
+    engine = criar_engine(url or f"sqlite:///{arquivo}")
+    executor = ThreadPoolExecutor(max_workers=MAX_THREADS_BANCO, thread_name_prefix="banco")
+
+def trocar_se_publicado():
+    """
+    Confere o ponteiro: se o importador publicou outro arquivo, as próximas consultas já vão
+    para um pool novo. O pool antigo é descartado sem interromper ninguém: conexões em uso
+    (ex: um streaming no meio) terminam normalmente e são fechadas quando devolvidas.
+    Devolve True se trocou.
+    """
+    global engine, arquivo
+    if arquivo is None:
+        return False
+    novo = banco_atual()
+    if novo == arquivo:
+        return False
+
+    antigo = engine
+    engine, arquivo = criar_engine(f"sqlite:///{novo}"), novo
+    antigo.dispose()
+    print(f"🔀 API lendo o banco: {novo}")
+    return True
+
+def fechar():
+    """Chamado no desligamento da API: espera as consultas em andamento e fecha o pool"""
+    global engine, executor, arquivo
+    if executor is not None:
+        executor.shutdown(wait=True)
+    if engine is not None:
+        engine.dispose()
+    engine = executor = arquivo = None
+
+async def executar(funcao, *args, **kwargs):
+    """Roda uma função bloqueante (que usa o banco) no executor dedicado, sem travar o event loop"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, partial(funcao, *args, **kwargs))
@@ -0,0 +1,44 @@
+import re
+
+# Índice de busca (FTS5) criado pelo importador a partir da tabela operadoras
+# - unicode61 + remove_diacritics: 'sao jose' encontra 'SÃO JOSÉ' (sem acento e sem caixa)
+# - cnpj_digitos: CNPJ só com números, para busca por prefixo
+TABELA_BUSCA = "operadoras_busca"
+
+SQL_BUSCA = f"""
+    SELECT o.registro_ans, o.cnpj, o.razao_social, o.uf
+    FROM {TABELA_BUSCA} b
+    JOIN operadoras o ON o.registro_ans = b.registro_ans
+    WHERE {TABELA_BUSCA} MATCH :consulta
+    ORDER BY b.rank
+    LIMIT :limit OFFSET :offset
+"""
+
+SQL_CONTAGEM = f"SELECT COUNT(*) FROM {TABELA_BUSCA} WHERE {TABELA_BUSCA} MATCH :consulta"
+
+# Mesmo filtro, como condição sobre operadoras 'o' (para a paginação por cursor)
+FILTRO_FTS = f"o.registro_ans IN (SELECT registro_ans FROM {TABELA_BUSCA} WHERE {TABELA_BUSCA} MATCH :consulta)"
+
+SQL_TEM_INDICE = f"SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = '{TABELA_BUSCA}'"
+
+def somente_digitos(texto):
+    return re.sub(r"\D", "", texto or "")
+
+def consulta_fts(search):
+    """
+    Converte o texto digitado numa consulta FTS5 (ou None se não sobrar nada para buscar).
+    - Só números/pontuação (ex: '12.345.678/0001'): prefixo do CNPJ
+    - Texto: cada palavra vira um prefixo na razão social, todas obrigatórias
+    """
+    if not search:
+        return None
+
+    digitos = somente_digitos(search)
+    if digitos and not re.search(r"[^\W\d_]", search):
+        return f'cnpj_digitos : "{digitos}"*'
+
+    palavras = re.findall(r"\w+", search)
+    if not palavras:
+        return None
+
+    return "razao_social : (" + " ".join(f'"{p}"*' for p in palavras) + ")"
@@ -0,0 +1,110 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import Response
+
+# orjson é opcional: serializa bem mais rápido listas/arrays grandes
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# --- CONFIGURAÇÕES DO CACHE ---
+CACHE_MAX_ITENS = 1024      # Acima disso, sai a resposta usada há mais tempo (LRU)
+CACHE_TTL_SEGUNDOS = 300    # Mesmo sem recarga do banco, nada fica mais que 5 min
+
+class CacheRespostas:
+    """Cache LRU com TTL, em memória, seguro para as threads do FastAPI"""
+
+    def __init__(self, max_itens=CACHE_MAX_ITENS, ttl=CACHE_TTL_SEGUNDOS):
+        self.max_itens = max_itens
+        self.ttl = ttl
+        self._itens = OrderedDict()
+        self._lock = threading.Lock()
+        self._versao = None
+
+    def obter(self, chave):
+        with self._lock:
+            item = self._itens.get(chave)
+            if item is None:
+                return None
+
+            expira_em, valor = item
+            if expira_em < time.monotonic():
+                del self._itens[chave]
+                return None
+
+            self._itens.move_to_end(chave) # Usado agora -> fim da fila do LRU
+            return valor
+
+    def guardar(self, chave, valor):
+        with self._lock:
+            self._itens[chave] = (time.monotonic() + self.ttl, valor)
+            self._itens.move_to_end(chave)
+            while len(self._itens) > self.max_itens:
+                self._itens.popitem(last=False)
+
+    def sincronizar_versao(self, versao):
+        """Se o importador gravou uma versão nova dos dados, tudo que está guardado é descartado"""
+        with self._lock:
+            if versao != self._versao:
+                self._itens.clear()
+                self._versao = versao
+
+    def limpar(self):
+        with self._lock:
+            self._itens.clear()
+
+    def __len__(self):
+        return len(self._itens)
+
+def chave_cache(rota, params):
+    """Rota + parâmetros normalizados (ordem fixa, sem espaços extras, sem valores vazios)"""
+    normalizados = []
+    for nome, valor in sorted(params.items()):
+        if isinstance(valor, str):
+            valor = valor.strip()
+        if valor is None or valor == "":
+            continue
+        normalizados.append((nome, valor))
+    return (rota, tuple(normalizados))
+
+def serializar(conteudo):
+    """Conteúdo da rota -> bytes JSON (orjson se estiver instalado)"""
+    if orjson is not None:
+        try:
+            return orjson.dumps(conteudo)
+        except TypeError:
+            pass # Tipo que o orjson não conhece: passa pelo encoder do FastAPI
+    return json.dumps(jsonable_encoder(conteudo), ensure_ascii=False).encode('utf-8')
+
+def gerar_etag(versao, corpo):
+    return '"' + hashlib.sha1(versao.encode('utf-8') + corpo).hexdigest() + '"'
+
+async def responder_com_cache(cache, request, versao, rota, params, gerar):
+    """
+    Devolve a resposta da rota a partir do cache (ou aguarda 'gerar' e guarda o resultado).
+    'gerar' devolve um awaitable (ex: a consulta rodando no executor do banco).
+    Se o cliente já tem a mesma versão (If-None-Match == ETag), responde 304 sem corpo.
+    """
+    cache.sincronizar_versao(versao)
+    chave = chave_cache(rota, params)
+
+    guardado = cache.obter(chave)
+    if guardado is None:
+        corpo = serializar(await gerar())
+        guardado = (corpo, gerar_etag(versao, corpo))
+        cache.guardar(chave, guardado)
+
+    corpo, etag = guardado
+    cabecalhos = {"ETag": etag, "Cache-Control": "no-cache"} # no-cache: o navegador sempre revalida
+
+    if_none_match = request.headers.get("if-none-match", "")
+    if etag in [e.strip() for e in if_none_match.split(",")]:
+        return Response(status_code=304, headers=cabecalhos)
+
+    return Response(content=corpo, media_type="application/json", headers=cabecalhos)
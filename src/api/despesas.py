@@ -0,0 +1,223 @@
+import csv
+import io
+import json
+import re
+
+from fastapi import HTTPException
+from sqlalchemy import text
+
+from src.api import banco
+from src.database.motor_analitico import chave_periodo
+
+# Formatos de resposta do histórico de despesas
+# - json: lista de objetos (padrão, igual ao original)
+# - colunar: um array por coluna ({"ano": [...], "valor": [...]}) -> payload bem menor
+# - ndjson / csv: enviados aos poucos, em páginas lidas do banco (sem montar a lista na memória)
+FORMATOS = ("json", "colunar", "ndjson", "csv")
+FORMATOS_STREAMING = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+}
+
+# Linhas por página no modo streaming (cada página é uma consulta; a conexão volta ao pool entre elas)
+TAMANHO_LOTE_STREAM = 2000
+
+# Trimestre aceito na consulta: '3', '3t' ou '3T'
+TRIMESTRE_VALIDO = re.compile(r"^[1-4]T?$")
+
+def normalizar_trimestre(trimestre):
+    """'3', '3t' ou '3T' -> '3T' (formato gravado no banco); qualquer outro valor é 400"""
+    if not trimestre:
+        return None
+    trimestre = trimestre.strip().upper()
+    if not TRIMESTRE_VALIDO.match(trimestre):
+        raise HTTPException(status_code=400, detail="Trimestre inválido (use 1 a 4, ex: 3 ou 3T)")
+    return trimestre.rstrip("T") + "T"
+
+# Formato do banco (schema.sql): 'compacto' (despesas_fato + contas_dim) ou a tabela despesas antiga
+# Conferido a cada versão nova dos dados (ver main.versao_dados)
+SQL_TEM_FATO = "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'despesas_fato'"
+_layout = {"compacto": True}
+
+def detectar_layout(engine):
+    with engine.connect() as conn:
+        _layout["compacto"] = conn.execute(text(SQL_TEM_FATO)).scalar() is not None
+    return _layout["compacto"]
+
+def condicoes_despesas(ano=None, trimestre=None, compacto=True):
+    """Filtros do histórico nos dois formatos"""
+    if not compacto:
+        condicoes = ["registro_ans = :reg"]
+        if ano is not None:
+            condicoes.append("ano = :ano")
+        if trimestre:
+            condicoes.append("trimestre = :trimestre")
+        return condicoes
+
+    # Tudo pela chave (registro, periodo) de despesas_fato; o ano vira uma faixa de períodos
+    condicoes = ["f.registro = :registro"]
+    if ano is not None:
+        condicoes.append("f.periodo BETWEEN :periodo_de AND :periodo_ate")
+    if trimestre:
+        condicoes.append("f.periodo % 10 = :num_trimestre")
+    return condicoes
+
+def sql_despesas(ano=None, trimestre=None, agrupar=None, compacto=None):
+    """Monta a consulta do histórico com os filtros e o agrupamento pedidos"""
+    if compacto is None:
+        compacto = _layout["compacto"]
+    if not compacto:
+        return sql_despesas_antigo(ano, trimestre, agrupar)
+
+    where = " AND ".join(condicoes_despesas(ano, trimestre, compacto=True))
+    ano_tri = "f.periodo / 10 AS ano, (f.periodo % 10) || 'T' AS trimestre"
+
+    if agrupar == "trimestre":
+        return f"""
+            SELECT {ano_tri}, SUM(f.valor) AS valor, COUNT(*) AS qtd
+            FROM despesas_fato f
+            WHERE {where}
+            GROUP BY f.periodo
+            ORDER BY f.periodo DESC
+        """
+    if agrupar == "descricao":
+        return f"""
+            SELECT c.descricao, SUM(f.valor) AS valor, COUNT(*) AS qtd
+            FROM despesas_fato f
+            JOIN contas_dim c ON c.id = f.conta
+            WHERE {where}
+            GROUP BY c.descricao
+            ORDER BY valor DESC
+        """
+    return f"""
+        SELECT {ano_tri}, c.descricao, f.valor
+        FROM despesas_fato f
+        JOIN contas_dim c ON c.id = f.conta
+        WHERE {where}
+        ORDER BY f.periodo DESC, f.seq
+    """
+
+def sql_despesas_antigo(ano=None, trimestre=None, agrupar=None):
+    """Mesma consulta sobre a tabela despesas de bancos anteriores ao formato compacto"""
+    where = " AND ".join(condicoes_despesas(ano, trimestre, compacto=False))
+
+    if agrupar == "trimestre":
+        return f"""
+            SELECT ano, trimestre, SUM(valor) AS valor, COUNT(*) AS qtd
+            FROM despesas
+            WHERE {where}
+            GROUP BY ano, trimestre
+            ORDER BY ano DESC, trimestre DESC
+        """
+    if agrupar == "descricao":
+        return f"""
+            SELECT descricao, SUM(valor) AS valor, COUNT(*) AS qtd
+            FROM despesas
+            WHERE {where}
+            GROUP BY descricao
+            ORDER BY valor DESC
+        """
+    return f"""
+        SELECT ano, trimestre, descricao, valor
+        FROM despesas
+        WHERE {where}
+        ORDER BY ano DESC, trimestre DESC
+    """
+
+def sql_pagina_despesas(ano=None, trimestre=None, compacto=None, continuar=False):
+    """
+    Uma página do histórico sem agrupamento, para o streaming: até :lote linhas depois da chave
+    (:ult_periodo, :ult_seq) da página anterior. As duas últimas colunas são a chave da página.
+    """
+    if compacto is None:
+        compacto = _layout["compacto"]
+    condicoes = condicoes_despesas(ano, trimestre, compacto)
+    if compacto:
+        colunas = "f.periodo / 10 AS ano, (f.periodo % 10) || 'T' AS trimestre, c.descricao, f.valor"
+        origem = "despesas_fato f JOIN contas_dim c ON c.id = f.conta"
+        periodo, seq = "f.periodo", "f.seq"
+    else:
+        # Tabela antiga: o período sai de ano e trimestre ('3T' -> 3) e o id desempata
+        colunas = "ano, trimestre, descricao, valor"
+        origem = "despesas"
+        periodo, seq = "(ano * 10 + CAST(trimestre AS INTEGER))", "id"
+    if continuar:
+        condicoes.append(f"({periodo} < :ult_periodo OR ({periodo} = :ult_periodo AND {seq} > :ult_seq))")
+
+    return f"""
+        SELECT {colunas}, {periodo} AS pag_periodo, {seq} AS pag_seq
+        FROM {origem}
+        WHERE {" AND ".join(condicoes)}
+        ORDER BY {periodo} DESC, {seq}
+        LIMIT :lote
+    """
+
+def parametros_despesas(registro, ano=None, trimestre=None):
+    """Parâmetros dos dois formatos: texto para a tabela antiga, inteiros para despesas_fato"""
+    params = {"reg": registro, "ano": ano, "trimestre": trimestre}
+    params["registro"] = int(registro) if str(registro).isdigit() else -1
+    if ano is not None:
+        params.update(periodo_de=chave_periodo(ano, 1), periodo_ate=chave_periodo(ano, 4))
+    if trimestre:
+        params["num_trimestre"] = int(trimestre.rstrip("T"))
+    return params
+
+def para_colunar(colunas, linhas):
+    """Linhas -> um array por coluna (sem criar um dicionário por linha)"""
+    if not linhas:
+        return {coluna: [] for coluna in colunas}
+    return {coluna: list(valores) for coluna, valores in zip(colunas, zip(*linhas))}
+
+def formatar_lote(formato, colunas, linhas):
+    if formato == "ndjson":
+        return "".join(json.dumps(dict(zip(colunas, linha)), ensure_ascii=False) + "\n" for linha in linhas)
+
+    saida = io.StringIO()
+    csv.writer(saida, delimiter=";", lineterminator="\n").writerows(linhas)
+    return saida.getvalue()
+
+def ler_consulta(engine, sql, params):
+    """(colunas, linhas) de uma consulta inteira; a conexão volta para o pool antes de retornar"""
+    with engine.connect() as conn:
+        resultado = conn.execute(text(sql), params)
+        return list(resultado.keys()), resultado.fetchall()
+
+async def transmitir_despesas(formato, params, ano=None, trimestre=None, agrupar=None):
+    """
+    Gerador assíncrono para StreamingResponse. Nenhuma conexão do pool fica presa enquanto o
+    cliente baixa: cada página de TAMANHO_LOTE_STREAM linhas é lida (no executor do banco) por uma
+    consulta própria, pela chave (periodo, seq), e a conexão é devolvida antes do envio.
+    Agrupado, o resultado é pequeno (uma linha por trimestre ou descrição) e sai de uma consulta só.
+    Todas as páginas vêm do mesmo banco, mesmo que o importador publique outro no meio do envio.
+    """
+    engine = banco.engine
+    if agrupar:
+        colunas, linhas = await banco.executar(ler_consulta, engine, sql_despesas(ano, trimestre, agrupar), params)
+        if formato == "csv":
+            yield ";".join(colunas) + "\n"
+        for inicio in range(0, len(linhas), TAMANHO_LOTE_STREAM):
+            yield formatar_lote(formato, colunas, linhas[inicio:inicio + TAMANHO_LOTE_STREAM])
+        return
+
+    pagina = {**params, "lote": TAMANHO_LOTE_STREAM}
+    sql = sql_pagina_despesas(ano, trimestre)
+    sql_seguinte = sql_pagina_despesas(ano, trimestre, continuar=True)
+    primeira = True
+    while True:
+        colunas, linhas = await banco.executar(ler_consulta, engine, sql if primeira else sql_seguinte, pagina)
+        colunas = colunas[:-2]
+        if primeira and formato == "csv":
+            yield ";".join(colunas) + "\n"
+        primeira = False
+        if linhas:
+            yield formatar_lote(formato, colunas, [linha[:-2] for linha in linhas])
+        if len(linhas) < TAMANHO_LOTE_STREAM:
+            break
+        pagina.update(ult_periodo=linhas[-1][-2], ult_seq=linhas[-1][-1])
+
+async def transmitir_linhas(formato, colunas, linhas):
+    """Como transmitir_despesas, para linhas que já estão na memória (modo API_MODO_LEITURA=memoria)"""
+    if formato == "csv":
+        yield ";".join(colunas) + "\n"
+    for inicio in range(0, len(linhas), TAMANHO_LOTE_STREAM):
+        yield formatar_lote(formato, colunas, linhas[inicio:inicio + TAMANHO_LOTE_STREAM])
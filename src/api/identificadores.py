@@ -0,0 +1,53 @@
+import re
+import threading
+
+from sqlalchemy import text
+
+# Mapa em memória: CNPJ / Registro ANS -> operadora
+# Carregado na subida da API e recarregado quando a versão dos dados muda.
+# São poucos milhares de operadoras: cabe folgado na memória e evita ir ao banco a cada clique.
+
+_lock = threading.Lock()
+_mapa = {"por_registro": {}, "por_cnpj": {}, "versao": None}
+
+def somente_digitos(texto):
+    return re.sub(r"\D", "", texto or "")
+
+def classificar(identifier):
+    """
+    Descobre o tipo do identificador pelo formato:
+    - até 6 dígitos: Registro ANS ('123' -> '000123')
+    - 14 dígitos (com ou sem pontuação, ex: '12.345.678/0001-90'): CNPJ
+    Devolve (tipo, valor normalizado) ou (None, None) se não for nenhum dos dois.
+    """
+    digitos = somente_digitos(identifier)
+
+    if len(digitos) == 14:
+        return "cnpj", digitos
+    if 1 <= len(digitos) <= 6 and identifier.strip().isdigit():
+        return "registro", digitos.zfill(6)
+    return None, None
+
+def carregar(engine, versao):
+    """Lê a tabela operadoras e troca o mapa inteiro de uma vez (quem está lendo não vê meio mapa)"""
+    with engine.connect() as conn:
+        linhas = [dict(row._mapping) for row in conn.execute(text("SELECT * FROM operadoras"))]
+
+    por_registro = {op["registro_ans"]: op for op in linhas}
+    por_cnpj = {somente_digitos(op["cnpj"]): op for op in linhas if op.get("cnpj")}
+
+    with _lock:
+        _mapa.update(por_registro=por_registro, por_cnpj=por_cnpj, versao=versao)
+    return len(linhas)
+
+def versao_carregada():
+    return _mapa["versao"]
+
+def resolver(identifier):
+    """Operadora (dicionário) para o CNPJ/Registro informado, ou None"""
+    tipo, valor = classificar(identifier)
+    if tipo == "registro":
+        return _mapa["por_registro"].get(valor)
+    if tipo == "cnpj":
+        return _mapa["por_cnpj"].get(valor)
+    return None
@@ -1,11 +1,35 @@
-from fastapi import FastAPI, HTTPException, Query
+from fastapi import FastAPI, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy import create_engine, text
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+from contextlib import asynccontextmanager
 from typing import List, Optional
+import asyncio
 import os
+import time
+
+from src.api import banco, identificadores, memoria
+from src.api.cache import CacheRespostas, responder_com_cache
+from src.api.busca import SQL_BUSCA, SQL_CONTAGEM, SQL_TEM_INDICE, FILTRO_FTS, consulta_fts
+from src.api.paginacao import codificar_cursor, decodificar_cursor
+from src.api.despesas import (FORMATOS_STREAMING, normalizar_trimestre, sql_despesas, parametros_despesas,
+                              para_colunar, transmitir_despesas, transmitir_linhas, detectar_layout)
+from src.database.motor_analitico import MotorAnalitico
+from src.utils.metricas import exportar_prometheus, histograma, medidor
 
 # --- CONFIGURAÇÃO ---
-app = FastAPI(title="API Intuitive Care", description="Teste Técnico 2026")
+@asynccontextmanager
+async def ciclo_de_vida(app):
+    # Subida: abre o pool de conexões e o executor do banco (src/api/banco.py)
+    banco.abrir()
+    # ... e já carrega o mapa CNPJ/Registro -> operadora (src/api/identificadores.py)
+    await versao_dados()
+    yield
+    # Desligamento: espera as consultas em andamento e fecha tudo
+    banco.fechar()
+
+app = FastAPI(title="API Intuitive Care", description="Teste Técnico 2026", lifespan=ciclo_de_vida)
 
 # Habilita CORS (Permite que o Frontend Vue.js converse com este Backend Python)
 app.add_middleware(
@@ -16,50 +40,208 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Conexão com Banco (SQLite)
-# O banco está na raiz, então voltamos duas pastas (../../)
-DB_URL = "sqlite:///banco_teste.db" 
-engine = create_engine(DB_URL)
+# --- MÉTRICAS ---
+# Latência por rota (o molde da rota, ex: /api/operadoras/{identifier}, e não a URL: poucas séries)
+# Nas rotas de streaming o tempo medido vai até o início da resposta, não até o último byte
+REQUISICAO_SEGUNDOS = histograma("api_requisicao_segundos", "Duração das requisições HTTP",
+                                 ("rota", "metodo", "status"))
+
+@app.middleware("http")
+async def medir_requisicao(request: Request, call_next):
+    inicio = time.perf_counter()
+    status = 500
+    try:
+        resposta = await call_next(request)
+        status = resposta.status_code
+        return resposta
+    finally:
+        rota = request.scope.get("route")
+        REQUISICAO_SEGUNDOS.observar(time.perf_counter() - inicio,
+                                     rota=getattr(rota, "path", "desconhecida"),
+                                     metodo=request.method, status=status)
+
+# --- CACHE DE RESPOSTAS ---
+# Os dados só mudam quando o importador roda, então as respostas podem ser reaproveitadas
+# até a versão gravada pelo importador (tabela metadados) mudar
+cache = CacheRespostas()
+# Totais por termo de busca: o COUNT(*) só roda uma vez por termo e versão dos dados
+contagens = CacheRespostas(max_itens=256)
+VERSAO_VERIFICAR_A_CADA = 5 # segundos entre consultas da versão no banco
+_versao = {"valor": None, "verificado_em": 0.0}
+
+# Motor analítico (matriz operadora x trimestre), remontado quando a versão dos dados muda
+_motor = {"instancia": None, "versao": None}
+
+# Cópia em memória dos dados (opcional: API_MODO_LEITURA=memoria, ver src/api/memoria.py)
+_memoria = {"instancia": None, "versao": None}
+
+medidor("api_cache_itens", "Respostas guardadas no cache", lambda: len(cache))
+medidor("api_pool_conexoes_em_uso", "Conexões do pool emprestadas no momento", banco.conexoes_em_uso)
+medidor("api_memoria_bytes", "Tamanho dos arrays da cópia em memória (modo memoria)",
+        lambda: _memoria["instancia"].tamanho_bytes() if _memoria["instancia"] is not None else 0)
+
+def ler_versao():
+    try:
+        with banco.engine.connect() as conn:
+            return conn.execute(text("SELECT valor FROM metadados WHERE chave = 'versao_dados'")).scalar()
+    except OperationalError:
+        return None # Banco antigo, sem a tabela metadados
+
+async def versao_dados():
+    """Versão atual dos dados (consultada no banco no máximo a cada VERSAO_VERIFICAR_A_CADA s)"""
+    agora = time.monotonic()
+    if _versao["valor"] is None or agora - _versao["verificado_em"] > VERSAO_VERIFICAR_A_CADA:
+        # Importador publicou um banco novo? (troca azul/verde, ver src/database/publicacao.py)
+        # O banco novo traz outra versão dos dados: cache, identificadores e motor são refeitos abaixo
+        banco.trocar_se_publicado()
+        valor = await banco.executar(ler_versao)
+        _versao.update(valor=valor or "sem-versao", verificado_em=agora)
+        contagens.sincronizar_versao(_versao["valor"])
+        
+        # Dados recarregados pelo importador: refaz o mapa de identificadores
+        if identificadores.versao_carregada() != _versao["valor"]:
+            try:
+                await banco.executar(detectar_layout, banco.engine)
+                await banco.executar(identificadores.carregar, banco.engine, _versao["valor"])
+            except OperationalError as e:
+                print(f"❌ Erro ao carregar o mapa de operadoras: {e}")
+        
+        if _motor["versao"] != _versao["valor"]:
+            try:
+                instancia = await banco.executar(MotorAnalitico.do_banco, banco.engine)
+                _motor.update(instancia=instancia, versao=_versao["valor"])
+            except OperationalError as e:
+                print(f"❌ Erro ao carregar o motor analítico: {e}")
+        
+        if memoria.MODO_MEMORIA and _memoria["versao"] != _versao["valor"]:
+            try:
+                instancia = await banco.executar(montar_instantaneo, _versao["valor"])
+            except Exception as e:
+                # Ex: banco no formato antigo (sem despesas_fato). Qualquer falha na montagem deixa
+                # esta versão sem cópia em memória: as rotas seguem pelo SQL, sem tentar de novo a cada requisição
+                print(f"❌ Cópia em memória indisponível, respondendo pelo banco: {type(e).__name__}: {e}")
+                instancia = None
+            _memoria.update(instancia=instancia, versao=_versao["valor"])
+    return _versao["valor"]
+
+def montar_instantaneo(versao):
+    instancia = memoria.Instantaneo.do_banco(banco.engine, versao)
+    # As estatísticas só mudam com a versão dos dados: calculadas uma vez, na montagem
+    instancia.estatisticas = consultar_estatisticas()
+    return instancia
+
+def instantaneo():
+    """Cópia em memória da versão atual dos dados (None no modo SQL ou se ela não pôde ser montada)"""
+    if _memoria["versao"] != _versao["valor"]:
+        return None
+    return _memoria["instancia"]
+
+async def pronto(valor):
+    # O cache espera um awaitable em 'gerar': a resposta da memória já vem calculada
+    return valor
+
+def em_thread(funcao, *args):
+    # Histórico da memória (fatia, somas, ordenação, montagem das linhas) cresce com a operadora:
+    # roda fora do event loop para não segurar as outras requisições
+    return asyncio.to_thread(funcao, *args)
 
 # --- ROTAS ---
 
 @app.get("/")
-def home():
+async def home():
     return {"message": "API Online! Acesse /docs para ver a documentação."}
 
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def metricas():
+    """Métricas no formato texto do Prometheus (latência por rota, SQL, cache, pool)"""
+    return PlainTextResponse(exportar_prometheus(), media_type="text/plain; version=0.0.4")
+
 @app.get("/api/operadoras")
-def listar_operadoras(
-    page: int = 1, 
-    limit: int = 10, 
-    search: Optional[str] = None
+async def listar_operadoras(
+    request: Request,
+    page: int = Query(1, ge=1),
+    # Página vazia não tem último registro para o next_cursor; o teto vale para os dois modos
+    limit: int = Query(10, ge=1, le=1000),
+    search: Optional[str] = None,
+    cursor: Optional[str] = None
 ):
     """
     Lista todas as operadoras com paginação e busca.
     Requisito: GET /api/operadoras (paginação: page, limit) [cite: 143]
+    Paginação por cursor (para percorrer a lista toda): envie cursor= vazio na primeira chamada
+    e depois o next_cursor recebido, até ele voltar nulo. Nesse modo a ordem é por registro_ans.
+    """
+    versao = await versao_dados()
+    # A busca por texto (FTS5) sempre vai ao banco; a listagem simples sai da memória, se houver
+    inst = instantaneo() if not search else None
+    
+    if cursor is not None:
+        params = {"modo": "cursor", "cursor": cursor, "limit": limit, "search": search}
+        if inst is not None:
+            gerar = lambda: pronto(inst.listar_operadoras_cursor(decodificar_cursor(cursor), limit))
+        else:
+            gerar = lambda: banco.executar(consultar_operadoras_cursor, cursor, limit, search)
+    else:
+        params = {"page": page, "limit": limit, "search": search}
+        if inst is not None:
+            gerar = lambda: pronto(inst.listar_operadoras(page, limit))
+        else:
+            gerar = lambda: banco.executar(consultar_operadoras, page, limit, search)
+    
+    return await responder_com_cache(cache, request, versao, "/api/operadoras", params, gerar)
+
+def filtro_busca(conn, search):
+    """
+    Decide como filtrar o termo buscado. Devolve (tipo, condição SQL sobre 'o', parâmetros).
+    Usa o índice FTS5; em banco antigo (sem o índice) ou termo sem palavras para o FTS5
+    (ex: só pontuação) cai no LIKE, para o filtro nunca sumir.
     """
+    if not search:
+        return None, "", {}
+    
+    if conn.execute(text(SQL_TEM_INDICE)).scalar():
+        consulta = consulta_fts(search)
+        if consulta is not None:
+            return "fts", FILTRO_FTS, {"consulta": consulta}
+    
+    return "like", "(o.razao_social LIKE :search OR o.cnpj LIKE :search)", {"search": f"%{search}%"}
+
+def contar_operadoras(conn, tipo, condicao, params):
+    """Conta o total para o frontend saber quantas páginas existem (guardado por termo)"""
+    chave = (tipo, tuple(sorted(params.items())))
+    
+    total = contagens.obter(chave)
+    if total is None:
+        if tipo == "fts":
+            total = conn.execute(text(SQL_CONTAGEM), params).scalar()
+        else:
+            sql_count = "SELECT COUNT(*) FROM operadoras o"
+            if condicao:
+                sql_count += f" WHERE {condicao}"
+            total = conn.execute(text(sql_count), params).scalar()
+        contagens.guardar(chave, total)
+    
+    return total
+
+def consultar_operadoras(page, limit, search):
     offset = (page - 1) * limit
     
-    with engine.connect() as conn:
-        # Query Base
-        sql = "SELECT registro_ans, cnpj, razao_social, uf FROM operadoras"
-        params = {"limit": limit, "offset": offset}
-        
+    with banco.engine.connect() as conn:
         # Filtro de Busca (Requisito 4.3.1 - Busca Híbrida/Server-side)
-        if search:
-            sql += " WHERE razao_social LIKE :search OR cnpj LIKE :search"
-            params["search"] = f"%{search}%"
-            
-        sql += " LIMIT :limit OFFSET :offset"
-        
-        result = conn.execute(text(sql), params)
-        operadoras = [dict(row._mapping) for row in result]
+        tipo, condicao, params_filtro = filtro_busca(conn, search)
+        params = {**params_filtro, "limit": limit, "offset": offset}
         
-        # Conta o total para o frontend saber quantas páginas existem
-        sql_count = "SELECT COUNT(*) FROM operadoras"
-        if search:
-            sql_count += " WHERE razao_social LIKE :search OR cnpj LIKE :search"
+        if tipo == "fts":
+            # Ordenado por relevância
+            sql = SQL_BUSCA
+        else:
+            sql = "SELECT o.registro_ans, o.cnpj, o.razao_social, o.uf FROM operadoras o"
+            if condicao:
+                sql += f" WHERE {condicao}"
+            sql += " ORDER BY o.registro_ans LIMIT :limit OFFSET :offset"
         
-        total = conn.execute(text(sql_count), params).scalar()
+        operadoras = [dict(row._mapping) for row in conn.execute(text(sql), params)]
+        total = contar_operadoras(conn, tipo, condicao, params_filtro)
 
     return {
         "data": operadoras,
@@ -68,62 +250,142 @@ def listar_operadoras(
         "limit": limit
     }
 
-@app.get("/api/operadoras/{identifier}")
-def detalhes_operadora(identifier: str):
-    """
-    Busca por CNPJ ou Registro ANS.
-    Requisito: GET /api/operadoras/{cnpj} [cite: 144]
-    """
-    with engine.connect() as conn:
-        # Tenta achar por CNPJ ou RegistroANS
-        query = """
-            SELECT * FROM operadoras 
-            WHERE cnpj = :id OR registro_ans = :id
-        """
-        result = conn.execute(text(query), {"id": identifier}).fetchone()
+def consultar_operadoras_cursor(cursor, limit, search):
+    # Busca a partir do último registro visto: usa a chave primária, sem OFFSET
+    apos = decodificar_cursor(cursor)
+    
+    with banco.engine.connect() as conn:
+        tipo, condicao, params_filtro = filtro_busca(conn, search)
         
-        if not result:
-            raise HTTPException(status_code=404, detail="Operadora não encontrada")
-            
-        return dict(result._mapping)
+        condicoes = ["o.registro_ans > :apos"] + ([condicao] if condicao else [])
+        sql = f"""
+            SELECT o.registro_ans, o.cnpj, o.razao_social, o.uf
+            FROM operadoras o
+            WHERE {' AND '.join(condicoes)}
+            ORDER BY o.registro_ans
+            LIMIT :limit
+        """
+        # Pede uma linha a mais só para saber se existe próxima página
+        params = {**params_filtro, "apos": apos, "limit": limit + 1}
+        linhas = [dict(row._mapping) for row in conn.execute(text(sql), params)]
+        total = contar_operadoras(conn, tipo, condicao, params_filtro)
+    
+    operadoras = linhas[:limit]
+    proximo = codificar_cursor(operadoras[-1]["registro_ans"]) if len(linhas) > limit else None
+    
+    return {
+        "data": operadoras,
+        "total": total,
+        "limit": limit,
+        "next_cursor": proximo
+    }
 
-@app.get("/api/operadoras/{identifier}/despesas")
-def historico_despesas(identifier: str):
+def operadora_ou_404(identifier):
+    """Resolve CNPJ (com ou sem pontuação) ou Registro ANS pelo mapa em memória, sem ir ao banco"""
+    op = identificadores.resolver(identifier)
+    if op is None:
+        raise HTTPException(status_code=404, detail="Operadora não encontrada")
+    return op
+
+# {identifier:path} aceita CNPJ com barra (ex: 12.345.678/0001-90).
+# Por isso a rota de despesas vem antes da de detalhes: senão "/despesas" seria lido como parte do CNPJ.
+@app.get("/api/operadoras/{identifier:path}/despesas")
+async def historico_despesas(
+    request: Request,
+    identifier: str,
+    formato: str = Query("json", pattern="^(json|colunar|ndjson|csv)$"),
+    ano: Optional[int] = None,
+    trimestre: Optional[str] = None,
+    agrupar: Optional[str] = Query(None, pattern="^(trimestre|descricao)$")
+):
     """
     Retorna histórico de despesas.
     Requisito: GET /api/operadoras/{cnpj}/despesas [cite: 144]
+    Opcionais: filtros ano/trimestre, agrupar=trimestre|descricao (soma no banco) e
+    formato=colunar (um array por coluna), ndjson ou csv (enviados em streaming).
     """
-    with engine.connect() as conn:
-        # 1. Acha o registro_ans primeiro (caso o user passe CNPJ)
-        op = conn.execute(text("SELECT registro_ans FROM operadoras WHERE cnpj = :id OR registro_ans = :id"), {"id": identifier}).fetchone()
-        
-        if not op:
-            raise HTTPException(status_code=404, detail="Operadora não encontrada")
-        
-        registro = op.registro_ans
+    versao = await versao_dados()
+    registro = operadora_ou_404(identifier)["registro_ans"]
+    trimestre = normalizar_trimestre(trimestre)
+    inst = instantaneo()
+    
+    if formato in FORMATOS_STREAMING and inst is not None:
+        colunas, linhas = await em_thread(inst.linhas_despesas, registro, ano, trimestre, agrupar)
+        return StreamingResponse(transmitir_linhas(formato, colunas, linhas),
+                                 media_type=FORMATOS_STREAMING[formato])
+    
+    if formato in FORMATOS_STREAMING:
+        # Streaming não passa pelo cache: as linhas saem do banco, página a página, direto para o cliente
+        params = parametros_despesas(registro, ano, trimestre)
+        return StreamingResponse(transmitir_despesas(formato, params, ano, trimestre, agrupar),
+                                 media_type=FORMATOS_STREAMING[formato])
+    
+    params = {"registro": registro, "formato": formato, "ano": ano, "trimestre": trimestre, "agrupar": agrupar}
+    if inst is not None:
+        gerar = lambda: em_thread(inst.despesas, registro, formato, ano, trimestre, agrupar)
+    else:
+        gerar = lambda: banco.executar(consultar_despesas, registro, formato, ano, trimestre, agrupar)
+    return await responder_com_cache(cache, request, versao, "/api/operadoras/{identifier}/despesas", params, gerar)
+
+@app.get("/api/operadoras/{identifier:path}")
+async def detalhes_operadora(request: Request, identifier: str, incluir_despesas: bool = False):
+    """
+    Busca por CNPJ ou Registro ANS.
+    Requisito: GET /api/operadoras/{cnpj} [cite: 144]
+    incluir_despesas=true devolve também o histórico (uma única consulta, pela chave de despesas_fato).
+    """
+    versao = await versao_dados()
+    op = operadora_ou_404(identifier)
+    
+    async def gerar():
+        if not incluir_despesas:
+            return op
+        inst = instantaneo()
+        if inst is not None:
+            return {**op, "despesas": await em_thread(inst.despesas, op["registro_ans"])}
+        return {**op, "despesas": await banco.executar(consultar_despesas, op["registro_ans"])}
+    
+    # A chave do cache usa o registro: CNPJ e Registro da mesma operadora dividem a resposta
+    params = {"registro": op["registro_ans"], "incluir_despesas": incluir_despesas}
+    return await responder_com_cache(cache, request, versao, "/api/operadoras/{identifier}", params, gerar)
+
+def consultar_despesas(registro, formato="json", ano=None, trimestre=None, agrupar=None):
+    # O registro já vem resolvido: uma única consulta, pela chave (registro, periodo) de despesas_fato
+    with banco.engine.connect() as conn:
+        result = conn.execute(text(sql_despesas(ano, trimestre, agrupar)), parametros_despesas(registro, ano, trimestre))
         
-        # 2. Busca as despesas
-        query = """
-            SELECT ano, trimestre, descricao, valor 
-            FROM despesas 
-            WHERE registro_ans = :reg
-            ORDER BY ano DESC, trimestre DESC
-        """
-        result = conn.execute(text(query), {"reg": registro})
+        if formato == "colunar":
+            return para_colunar(list(result.keys()), result.fetchall())
         return [dict(row._mapping) for row in result]
 
 @app.get("/api/estatisticas")
-def estatisticas_gerais():
+async def estatisticas_gerais(request: Request):
     """
     Retorna estatísticas agregadas (Total, Média, Top 5).
     Requisito: GET /api/estatisticas [cite: 145]
+    Tudo vem das tabelas de resumo montadas pelo importador (nenhuma varredura em despesas).
     """
-    with engine.connect() as conn:
-        # Total Geral
-        total = conn.execute(text("SELECT SUM(valor) FROM despesas")).scalar()
+    versao = await versao_dados()
+    inst = instantaneo()
+    if inst is not None:
+        gerar = lambda: pronto(inst.estatisticas)
+    else:
+        gerar = lambda: banco.executar(consultar_estatisticas)
+    return await responder_com_cache(cache, request, versao, "/api/estatisticas", {}, gerar)
+
+def consultar_estatisticas():
+    with banco.engine.connect() as conn:
+        # Total Geral e Média (a média sai da soma e da quantidade de lançamentos)
+        total, qtd = conn.execute(text("SELECT SUM(total), SUM(qtd) FROM resumo_trimestre")).one()
+        media = total / qtd if qtd else None
         
-        # Média por Trimestre
-        media = conn.execute(text("SELECT AVG(valor) FROM despesas")).scalar()
+        # Totais por Trimestre
+        por_trimestre_query = """
+            SELECT ano, trimestre, total, qtd 
+            FROM resumo_trimestre 
+            ORDER BY ano, trimestre
+        """
+        por_trimestre = [dict(row._mapping) for row in conn.execute(text(por_trimestre_query))]
         
         # Top 5 Operadoras (Mesma lógica da Missão 3)
         top_5_query = """
@@ -136,19 +398,96 @@ def estatisticas_gerais():
         
         # Top 5 Estados
         top_uf_query = """
-            SELECT uf, SUM(valor) as total 
-            FROM despesas d 
-            JOIN operadoras o ON d.registro_ans = o.registro_ans 
-            WHERE o.uf != 'INDEFINIDO'
-            GROUP BY o.uf 
+            SELECT uf, total 
+            FROM resumo_uf 
+            WHERE uf != 'INDEFINIDO'
             ORDER BY total DESC 
             LIMIT 5
         """
         top_uf = [dict(row._mapping) for row in conn.execute(text(top_uf_query))]
+        
+        # Totais por Modalidade
+        modalidade_query = """
+            SELECT modalidade, total 
+            FROM resumo_modalidade 
+            ORDER BY total DESC
+        """
+        por_modalidade = [dict(row._mapping) for row in conn.execute(text(modalidade_query))]
 
     return {
         "total_geral": total,
         "media_geral": media,
         "top_operadoras": top_5,
-        "distribuicao_uf": top_uf
-    }
\ No newline at end of file
+        "distribuicao_uf": top_uf,
+        "totais_trimestre": por_trimestre,
+        "distribuicao_modalidade": por_modalidade
+    }
+
+# --- ANÁLISES (motor analítico em memória, sem varrer a tabela de despesas) ---
+
+def motor_ou_503():
+    if _motor["instancia"] is None:
+        raise HTTPException(status_code=503, detail="Dados de análise indisponíveis")
+    return _motor["instancia"]
+
+async def responder_analise(request, rota, params, calcular):
+    """Análises também passam pelo cache; período inválido ou sem dados vira 400"""
+    versao = await versao_dados()
+    motor = motor_ou_503()
+    
+    async def gerar():
+        try:
+            return calcular(motor)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    
+    return await responder_com_cache(cache, request, versao, rota, params, gerar)
+
+@app.get("/api/analises/periodos")
+async def analise_periodos(request: Request):
+    """Trimestres disponíveis para as análises (ex: ["1T2023", "2T2023", "3T2023"])"""
+    return await responder_analise(request, "/api/analises/periodos", {},
+                                   lambda motor: motor.listar_periodos())
+
+@app.get("/api/analises/crescimento")
+async def analise_crescimento(
+    request: Request,
+    de: Optional[str] = None,
+    ate: Optional[str] = None,
+    minimo: float = 500000,
+    limite: int = Query(5, ge=1, le=100)
+):
+    """
+    Operadoras com maior crescimento percentual de despesas entre dois trimestres quaisquer.
+    de/ate no formato 3T2023 (padrão: primeiro e último trimestre com dados).
+    """
+    def calcular(motor):
+        periodos = motor.listar_periodos()
+        if not periodos:
+            return []
+        return motor.crescimento(de or periodos[0], ate or periodos[-1], minimo=minimo, limite=limite)
+    
+    params = {"de": de, "ate": ate, "minimo": minimo, "limite": limite}
+    return await responder_analise(request, "/api/analises/crescimento", params, calcular)
+
+@app.get("/api/analises/acima-media")
+async def analise_acima_media(
+    request: Request,
+    min_trimestres: int = Query(2, ge=1),
+    limite: int = Query(10, ge=1, le=100)
+):
+    """Operadoras com despesa acima da média do mercado em pelo menos min_trimestres trimestres"""
+    params = {"min_trimestres": min_trimestres, "limite": limite}
+    return await responder_analise(request, "/api/analises/acima-media", params,
+                                   lambda motor: motor.acima_da_media(min_trimestres=min_trimestres, limite=limite))
+
+@app.get("/api/analises/uf")
+async def analise_uf(
+    request: Request,
+    periodos: Optional[List[str]] = Query(None),
+    limite: int = Query(5, ge=1, le=27)
+):
+    """Despesa total, quantidade de operadoras e média por operadora em cada UF (opcional: só alguns trimestres)"""
+    params = {"periodos": ",".join(periodos or []), "limite": limite}
+    return await responder_analise(request, "/api/analises/uf", params,
+                                   lambda motor: motor.distribuicao_uf(limite=limite, periodos=periodos))
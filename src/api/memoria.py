@@ -0,0 +1,162 @@
+import math
+import os
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+
+from src.api.despesas import para_colunar
+from src.api.paginacao import codificar_cursor
+from src.database.motor_analitico import chave_periodo
+
+# Modo de leitura em memória (opcional): API_MODO_LEITURA=memoria
+# A cada versão nova dos dados, a API copia operadoras, despesas e resumos para arrays do NumPy
+# e responde listagens, históricos e estatísticas sem passar pelo SQLite.
+# Continuam no banco: a busca por texto (FTS5) e os bancos no formato antigo (sem despesas_fato).
+MODO_MEMORIA = os.environ.get("API_MODO_LEITURA", "sql") == "memoria"
+
+# Ordem física do banco (schema.sql): o NumPy reordena para (registro, período desc, seq)
+SQL_FATO = "SELECT registro, periodo, seq, conta, valor FROM despesas_fato"
+SQL_CONTAS = "SELECT id, descricao FROM contas_dim"
+SQL_OPERADORAS = "SELECT registro_ans, cnpj, razao_social, uf FROM operadoras ORDER BY registro_ans"
+
+COLUNAS_HISTORICO = ["ano", "trimestre", "descricao", "valor"]
+COLUNAS_POR_TRIMESTRE = ["ano", "trimestre", "valor", "qtd"]
+COLUNAS_POR_DESCRICAO = ["descricao", "valor", "qtd"]
+
+class Instantaneo:
+    """
+    Cópia colunar e só de leitura de uma versão dos dados.
+    As despesas ficam ordenadas por operadora: o histórico de uma operadora é a fatia
+    [inicio, fim) dos arrays, achada por busca binária no array de registros distintos.
+    """
+
+    def __init__(self, fato, contas, operadoras, estatisticas=None, versao=None):
+        self.versao = versao
+        self.estatisticas = estatisticas
+
+        # Mesma ordem do histórico na API: período mais recente primeiro, linhas na ordem de carga
+        ordem = np.lexsort((fato['seq'].to_numpy(), -fato['periodo'].to_numpy(), fato['registro'].to_numpy()))
+        self.registro = fato['registro'].to_numpy(dtype=np.int64)[ordem]
+        self.periodo = fato['periodo'].to_numpy(dtype=np.int32)[ordem]
+        self.valor = fato['valor'].to_numpy(dtype=np.float64)[ordem]
+
+        # Descrição de cada conta vira um código pequeno (contas com a mesma descrição dividem o código)
+        codigo_descricao, self.descricoes = pd.factorize(contas['descricao'])
+        por_conta = np.full(int(contas['id'].max()) + 1 if len(contas) else 1, -1, dtype=np.int32)
+        por_conta[contas['id'].to_numpy()] = codigo_descricao
+        self.descricao = por_conta[fato['conta'].to_numpy()[ordem]]
+        self.descricoes = np.array(self.descricoes, dtype=object)
+
+        # Índice de offsets: registros distintos (ordenados) e onde começa cada um
+        self.registros, self.inicios = np.unique(self.registro, return_index=True)
+        self.fins = np.append(self.inicios[1:], len(self.registro))
+
+        # Operadoras em colunas, na ordem de registro_ans (a mesma do ORDER BY da listagem)
+        self.op_registro = operadoras['registro_ans'].astype(str).to_numpy(dtype=object)
+        self.op_linhas = [
+            {"registro_ans": r, "cnpj": c, "razao_social": s, "uf": u}
+            for r, c, s, u in operadoras[['registro_ans', 'cnpj', 'razao_social', 'uf']]
+                .astype(object).where(operadoras.notna(), None).itertuples(index=False, name=None)
+        ]
+
+    @classmethod
+    def do_banco(cls, engine, versao=None):
+        with engine.connect() as conn:
+            fato = pd.read_sql(text(SQL_FATO), conn)
+            contas = pd.read_sql(text(SQL_CONTAS), conn)
+            operadoras = pd.read_sql(text(SQL_OPERADORAS), conn)
+        return cls(fato, contas, operadoras, versao=versao)
+
+    def tamanho_bytes(self):
+        arrays = (self.registro, self.periodo, self.valor, self.descricao, self.registros, self.inicios, self.fins)
+        return sum(a.nbytes for a in arrays)
+
+    # --- OPERADORAS ---
+    def listar_operadoras(self, page, limit):
+        """Mesma resposta de consultar_operadoras sem busca"""
+        offset = max(page - 1, 0) * limit
+        return {
+            "data": self.op_linhas[offset:offset + limit],
+            "total": len(self.op_linhas),
+            "page": page,
+            "limit": limit
+        }
+
+    def listar_operadoras_cursor(self, apos, limit):
+        """Mesma resposta de consultar_operadoras_cursor sem busca: busca binária no lugar da chave primária"""
+        inicio = int(np.searchsorted(self.op_registro, apos, side='right'))
+        linhas = self.op_linhas[inicio:inicio + limit + 1]
+        operadoras = linhas[:limit]
+        return {
+            "data": operadoras,
+            "total": len(self.op_linhas),
+            "limit": limit,
+            "next_cursor": codificar_cursor(operadoras[-1]["registro_ans"]) if len(linhas) > limit else None
+        }
+
+    # --- DESPESAS ---
+    def fatia(self, registro):
+        """Posições [inicio, fim) das despesas da operadora (vazia se ela não tiver despesas)"""
+        try:
+            numero = int(registro)
+        except (TypeError, ValueError):
+            return 0, 0
+        k = int(np.searchsorted(self.registros, numero))
+        if k == len(self.registros) or self.registros[k] != numero:
+            return 0, 0
+        return int(self.inicios[k]), int(self.fins[k])
+
+    def linhas_despesas(self, registro, ano=None, trimestre=None, agrupar=None):
+        """(colunas, linhas) do histórico, com as mesmas regras de sql_despesas"""
+        inicio, fim = self.fatia(registro)
+        periodo = self.periodo[inicio:fim]
+        valor = self.valor[inicio:fim]
+        descricao = self.descricao[inicio:fim]
+
+        filtro = np.ones(len(periodo), dtype=bool)
+        if ano is not None:
+            filtro &= (periodo >= chave_periodo(ano, 1)) & (periodo <= chave_periodo(ano, 4))
+        if trimestre:
+            filtro &= periodo % 10 == int(trimestre.rstrip("T"))
+        if not filtro.all():
+            periodo, valor, descricao = periodo[filtro], valor[filtro], descricao[filtro]
+
+        if agrupar == "trimestre":
+            # Períodos já vêm em blocos contíguos (ordem decrescente): soma por bloco
+            if not len(periodo):
+                return COLUNAS_POR_TRIMESTRE, []
+            # fsum: soma sem acumular erro de arredondamento, como o SUM do SQLite
+            cortes = np.flatnonzero(np.diff(periodo)) + 1
+            inicios = np.concatenate(([0], cortes)).tolist()
+            fins = inicios[1:] + [len(periodo)]
+            return COLUNAS_POR_TRIMESTRE, [
+                (int(periodo[i]) // 10, f"{int(periodo[i]) % 10}T", math.fsum(valor[i:f].tolist()), f - i)
+                for i, f in zip(inicios, fins)
+            ]
+
+        if agrupar == "descricao":
+            # Agrupa ordenando pelo código da descrição (ordem estável: linhas na ordem de carga)
+            ordem = np.argsort(descricao, kind='stable')
+            codigos, inicios, qtds = np.unique(descricao[ordem], return_index=True, return_counts=True)
+            valores = valor[ordem]
+            grupos = [
+                (self.descricoes[c], math.fsum(valores[i:i + q].tolist()), int(q))
+                for c, i, q in zip(codigos, inicios, qtds)
+            ]
+            grupos.sort(key=lambda g: -g[1])
+            return COLUNAS_POR_DESCRICAO, grupos
+
+        return COLUNAS_HISTORICO, list(zip(
+            (periodo // 10).tolist(),
+            [f"{t}T" for t in (periodo % 10).tolist()],
+            self.descricoes[descricao].tolist(),
+            valor.tolist(),
+        ))
+
+    def despesas(self, registro, formato="json", ano=None, trimestre=None, agrupar=None):
+        """Mesma resposta de consultar_despesas"""
+        colunas, linhas = self.linhas_despesas(registro, ano, trimestre, agrupar)
+        if formato == "colunar":
+            return para_colunar(colunas, linhas)
+        return [dict(zip(colunas, linha)) for linha in linhas]
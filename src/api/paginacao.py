@@ -0,0 +1,25 @@
+import base64
+import json
+
+from fastapi import HTTPException
+
+# Paginação por cursor (keyset): em vez de OFFSET, o cliente devolve o cursor da página anterior
+# e a próxima consulta continua de onde parou (WHERE registro_ans > último visto).
+# O custo de cada página é o mesmo, seja a primeira ou a milésima.
+
+def codificar_cursor(ultimo_registro):
+    """Cursor opaco para o cliente: base64 de {"r": último registro_ans da página}"""
+    bruto = json.dumps({"r": ultimo_registro}, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(bruto).decode("ascii").rstrip("=")
+
+def decodificar_cursor(cursor):
+    """Cursor vazio = primeira página. Cursor inválido = erro 400."""
+    if not cursor:
+        return ""
+
+    try:
+        preenchido = cursor + "=" * (-len(cursor) % 4)
+        dados = json.loads(base64.urlsafe_b64decode(preenchido.encode("ascii")))
+        return str(dados["r"])
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Cursor inválido")
@@ -0,0 +1,285 @@
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+try:
+    import resource
+except ImportError:
+    resource = None  # Windows: sem ru_maxrss, o pico do processo fica como None
+
+# Benchmark de ponta a ponta, todo offline:
+# gera dados sintéticos -> transformação -> consolidação -> missão 2 -> importador -> rotas da API
+# e grava tempos (várias repetições) e pico de memória de cada etapa em um relatório JSON.
+# Ex: python src/benchmarks/executar.py --linhas 500000 --operadoras 1500 --saida bench.json
+
+RAIZ = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path.append(os.path.join(RAIZ, 'src', 'etl'))
+sys.path.append(RAIZ)
+
+import transformacao
+import missao2
+from src.benchmarks.gerador import gerar_conjunto
+from src.utils.armazenamento import FORMATO, PARTICOES_DESPESAS, salvar_tabela_em_blocos
+from src.database import importador
+
+# --- PARÂMETROS PADRÃO ---
+LINHAS_POR_TRIMESTRE = 200_000
+OPERADORAS = 1_000
+TRIMESTRES = 3
+SEMENTE = 42
+REPETICOES = 3
+NIVEIS_CONCORRENCIA = [1, 4, 16]
+REQUISICOES_POR_NIVEL = 200
+ARQUIVO_RELATORIO = "benchmark_resultado.json"
+
+@contextlib.contextmanager
+def silencioso():
+    """As etapas imprimem o próprio progresso; no benchmark isso só atrapalha a leitura"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+def medir(nome, funcao, repeticoes=REPETICOES, preparar=None):
+    """
+    Roda a etapa 'repeticoes' vezes medindo só o tempo e uma vez a mais com o tracemalloc
+    (que deixa o código mais lento) para o pico de memória alocada pelo Python/NumPy/pandas.
+    'preparar' roda antes de cada execução, fora da medição (ex: apagar o banco).
+    """
+    tempos = []
+    for _ in range(repeticoes):
+        if preparar:
+            preparar()
+        inicio = time.perf_counter()
+        with silencioso():
+            funcao()
+        tempos.append(time.perf_counter() - inicio)
+
+    if preparar:
+        preparar()
+    tracemalloc.start()
+    try:
+        with silencioso():
+            funcao()
+        _, pico = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    resultado = {
+        "etapa": nome,
+        "repeticoes": repeticoes,
+        "segundos": [round(t, 4) for t in tempos],
+        "segundos_min": round(min(tempos), 4),
+        "segundos_media": round(sum(tempos) / len(tempos), 4),
+        "pico_memoria_mb": round(pico / 2**20, 1),
+    }
+    print(f"  {nome:<16} min {resultado['segundos_min']:>8.3f}s | "
+          f"média {resultado['segundos_media']:>8.3f}s | pico {resultado['pico_memoria_mb']:>8.1f} MB")
+    return resultado
+
+# --- ROTAS DA API ---
+
+def rotas_da_api(caminho_db):
+    """Uma URL por rota (e variações relevantes), com identificadores reais do banco gerado"""
+    import sqlite3
+    with sqlite3.connect(caminho_db) as conn:
+        registro, cnpj, razao = conn.execute(
+            "SELECT registro_ans, cnpj, razao_social FROM operadoras WHERE cnpj IS NOT NULL ORDER BY registro_ans LIMIT 1"
+        ).fetchone()
+
+    termo = razao.split()[0]
+    return [
+        ("home", "/"),
+        ("operadoras", "/api/operadoras?page=1&limit=10"),
+        ("operadoras_pagina_50", "/api/operadoras?page=50&limit=10"),
+        ("operadoras_busca", f"/api/operadoras?search={termo}"),
+        ("operadoras_cursor", "/api/operadoras?cursor=&limit=50"),
+        ("operadora_registro", f"/api/operadoras/{registro}"),
+        ("operadora_cnpj", f"/api/operadoras/{cnpj}"),
+        ("operadora_com_despesas", f"/api/operadoras/{registro}?incluir_despesas=true"),
+        ("despesas_json", f"/api/operadoras/{registro}/despesas"),
+        ("despesas_colunar", f"/api/operadoras/{registro}/despesas?formato=colunar"),
+        ("despesas_por_trimestre", f"/api/operadoras/{registro}/despesas?agrupar=trimestre"),
+        ("despesas_ndjson", f"/api/operadoras/{registro}/despesas?formato=ndjson"),
+        ("despesas_csv", f"/api/operadoras/{registro}/despesas?formato=csv"),
+        ("estatisticas", "/api/estatisticas"),
+        ("analises_periodos", "/api/analises/periodos"),
+        ("analises_crescimento", "/api/analises/crescimento"),
+        ("analises_acima_media", "/api/analises/acima-media"),
+        ("analises_uf", "/api/analises/uf"),
+    ]
+
+def percentil(valores, p):
+    return round(float(np.percentile(valores, p)) * 1000, 3)
+
+async def medir_rota(cliente, nome, url, concorrencia, requisicoes):
+    """Dispara 'requisicoes' GETs com no máximo 'concorrencia' em andamento ao mesmo tempo"""
+    semaforo = asyncio.Semaphore(concorrencia)
+    latencias = []
+    status = {}
+
+    async def uma():
+        async with semaforo:
+            inicio = time.perf_counter()
+            resposta = await cliente.get(url)
+            latencias.append(time.perf_counter() - inicio)
+            status[resposta.status_code] = status.get(resposta.status_code, 0) + 1
+
+    inicio = time.perf_counter()
+    await asyncio.gather(*(uma() for _ in range(requisicoes)))
+    total = time.perf_counter() - inicio
+
+    return {
+        "rota": nome,
+        "url": url,
+        "concorrencia": concorrencia,
+        "requisicoes": requisicoes,
+        "status": {str(k): v for k, v in sorted(status.items())},
+        "segundos": round(total, 4),
+        "req_por_segundo": round(requisicoes / total, 1),
+        "latencia_ms": {"p50": percentil(latencias, 50), "p95": percentil(latencias, 95),
+                        "p99": percentil(latencias, 99), "max": percentil(latencias, 100)},
+    }
+
+async def medir_api(caminho_db, niveis, requisicoes):
+    """
+    Sobe a API (com o lifespan: pool de conexões, mapa de identificadores, motor analítico)
+    e mede cada rota em cada nível de concorrência, via cliente ASGI local (sem rede).
+    O cache de respostas é esvaziado antes de cada medição: a primeira requisição é sempre 'fria'.
+    """
+    import httpx
+    from src.api import main as api
+
+    resultados = []
+    async with api.app.router.lifespan_context(api.app):
+        transporte = httpx.ASGITransport(app=api.app)
+        async with httpx.AsyncClient(transport=transporte, base_url="http://benchmark") as cliente:
+            for nome, url in rotas_da_api(caminho_db):
+                for concorrencia in niveis:
+                    api.cache.limpar()
+                    api.contagens.limpar()
+                    r = await medir_rota(cliente, nome, url, concorrencia, requisicoes)
+                    resultados.append(r)
+                    print(f"  {nome:<24} c={concorrencia:<3} {r['req_por_segundo']:>8.1f} req/s | "
+                          f"p50 {r['latencia_ms']['p50']:>7.2f} ms | p99 {r['latencia_ms']['p99']:>7.2f} ms")
+    return resultados
+
+# --- EXECUÇÃO ---
+
+def versao_do_codigo():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=RAIZ, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def executar_benchmark(pasta, linhas=LINHAS_POR_TRIMESTRE, operadoras=OPERADORAS, trimestres=TRIMESTRES,
+                       semente=SEMENTE, repeticoes=REPETICOES, niveis=NIVEIS_CONCORRENCIA,
+                       requisicoes=REQUISICOES_POR_NIVEL):
+    """Roda todas as etapas dentro de 'pasta' (os scripts usam caminhos relativos) e devolve o relatório"""
+    os.makedirs(pasta, exist_ok=True)
+    os.chdir(pasta)
+    # O importador procura o schema relativo à raiz do projeto
+    importador.SQL_SCHEMA = os.path.join(RAIZ, 'src', 'database', 'schema.sql')
+
+    print(f"--- BENCHMARK: {trimestres} trimestre(s) x {linhas} linhas, {operadoras} operadoras ---")
+    print(f"Pasta de trabalho: {pasta}")
+
+    inicio = time.perf_counter()
+    arquivos, _ = gerar_conjunto(os.path.dirname(missao2.ARQUIVO_CADASTRO), linhas, operadoras,
+                                 trimestres=trimestres, semente=semente)
+    print(f"Dados sintéticos gerados em {time.perf_counter() - inicio:.1f}s\n")
+
+    etapas = []
+    saidas = {}
+
+    # 1. Transformação (um CSV por trimestre, como no executar_pipeline)
+    def transformar():
+        for tri, caminho in arquivos.items():
+            df = transformacao.processar_arquivo(caminho)
+            saidas[tri] = df[df['Valor'] != 0.0]
+    etapas.append(medir("transformacao", transformar, repeticoes))
+
+    # 2. Consolidação dos trimestres na tabela intermediária
+    def consolidar():
+        salvar_tabela_em_blocos(saidas.values(), missao2.ARQUIVO_DESPESAS, particoes=PARTICOES_DESPESAS)
+    etapas.append(medir("consolidacao", consolidar, repeticoes))
+
+    # 3. Missão 2: join com o cadastro + agregação
+    etapas.append(medir("missao2", missao2.executar_missao_2, repeticoes))
+
+    # 4. Importador (carga em massa em um banco novo a cada repetição)
+    def apagar_banco():
+        if os.path.exists(importador.ARQUIVO_DB):
+            os.remove(importador.ARQUIVO_DB)
+    etapas.append(medir("importador", importador.importar_dados_em_massa, repeticoes, preparar=apagar_banco))
+
+    # 5. API
+    print()
+    api = asyncio.run(medir_api(importador.ARQUIVO_DB, niveis, requisicoes))
+
+    return {
+        "gerado_em": datetime.now().isoformat(timespec='seconds'),
+        "codigo": versao_do_codigo(),
+        "ambiente": {
+            "python": platform.python_version(),
+            "pandas": pd.__version__,
+            "numpy": np.__version__,
+            "sistema": platform.platform(),
+            "cpus": os.cpu_count(),
+            "formato": FORMATO,
+        },
+        "parametros": {
+            "linhas_por_trimestre": linhas,
+            "operadoras": operadoras,
+            "trimestres": trimestres,
+            "semente": semente,
+            "repeticoes": repeticoes,
+            "niveis_concorrencia": niveis,
+            "requisicoes_por_nivel": requisicoes,
+        },
+        "etapas": etapas,
+        "api": api,
+        # Pico de memória do processo inteiro (ru_maxrss vem em KB no Linux)
+        "pico_rss_processo_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1) if resource else None,
+    }
+
+def ler_argumentos():
+    parser = argparse.ArgumentParser(description="Benchmark offline do ETL e da API com dados sintéticos")
+    parser.add_argument("--linhas", type=int, default=LINHAS_POR_TRIMESTRE, help="linhas por trimestre")
+    parser.add_argument("--operadoras", type=int, default=OPERADORAS)
+    parser.add_argument("--trimestres", type=int, default=TRIMESTRES)
+    parser.add_argument("--semente", type=int, default=SEMENTE)
+    parser.add_argument("--repeticoes", type=int, default=REPETICOES)
+    parser.add_argument("--concorrencia", default=",".join(map(str, NIVEIS_CONCORRENCIA)),
+                        help="níveis separados por vírgula (ex: 1,4,16)")
+    parser.add_argument("--requisicoes", type=int, default=REQUISICOES_POR_NIVEL, help="requisições por rota e nível")
+    parser.add_argument("--pasta", default=None, help="pasta de trabalho (padrão: temporária, apagada no fim)")
+    parser.add_argument("--saida", default=ARQUIVO_RELATORIO, help="arquivo JSON do relatório")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = ler_argumentos()
+    saida = os.path.abspath(args.saida)
+    niveis = [int(n) for n in args.concorrencia.split(",") if n.strip()]
+
+    with contextlib.ExitStack() as pilha:
+        pasta = args.pasta or pilha.enter_context(tempfile.TemporaryDirectory(prefix="benchmark_ans_"))
+        relatorio = executar_benchmark(os.path.abspath(pasta), args.linhas, args.operadoras, args.trimestres,
+                                       args.semente, args.repeticoes, niveis, args.requisicoes)
+        os.chdir(RAIZ) # Sai da pasta temporária antes de apagá-la
+
+    with open(saida, 'w', encoding='utf-8') as f:
+        json.dump(relatorio, f, ensure_ascii=False, indent=2)
+    print(f"\n✅ Relatório salvo em {saida}")
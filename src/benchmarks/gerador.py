@@ -0,0 +1,98 @@
+import csv
+import os
+import numpy as np
+import pandas as pd
+
+# Gerador de dados sintéticos no formato da ANS (demonstrações contábeis + Relatorio_cadop).
+# Mesma semente -> mesmos arquivos, byte a byte: os benchmarks de execuções diferentes são comparáveis.
+
+# Contas usadas nas linhas geradas (código, descrição, peso no sorteio)
+# 30% das linhas são da conta 41 (Eventos/Sinistros, a que o filtro mantém); o resto, inclusive as
+# subcontas de 41, o filtro descarta
+CONTAS = [
+    (41, 'EVENTOS INDENIZÁVEIS LÍQUIDOS / SINISTROS RETIDOS', 0.30),
+    (411211, 'EVENTOS/ SINISTROS CONHECIDOS OU AVISADOS', 0.20),
+    (311111, 'CONTRAPRESTAÇÕES EFETIVAS DE PLANO DE ASSISTÊNCIA À SAÚDE', 0.20),
+    (211111, 'PROVISÃO DE EVENTOS/SINISTROS A LIQUIDAR', 0.10),
+    (461111, 'DESPESAS ADMINISTRATIVAS', 0.10),
+    (121111, 'APLICAÇÕES FINANCEIRAS', 0.10),
+]
+
+# Parte das linhas vem com saldo zerado (removidas no ETL)
+FRACAO_ZERADOS = 0.3
+
+# Parte das operadoras fica fora do cadastro (caem em "OPERADORA NÃO IDENTIFICADA")
+FRACAO_FORA_DO_CADASTRO = 0.05
+
+UFS = ['SP', 'RJ', 'MG', 'RS', 'PR', 'SC', 'BA', 'PE', 'CE', 'GO', 'DF', 'ES', 'PA', 'AM', 'MT', 'MS']
+MODALIDADES = ['Cooperativa Médica', 'Medicina de Grupo', 'Seguradora Especializada em Saúde',
+               'Autogestão', 'Filantropia', 'Odontologia de Grupo', 'Cooperativa Odontológica']
+
+COLUNAS_DEMONSTRACOES = ['DATA', 'REG_ANS', 'CD_CONTA_CONTABIL', 'DESCRICAO', 'VL_SALDO_INICIAL', 'VL_SALDO_FINAL']
+COLUNAS_CADASTRO = ['REGISTRO_OPERADORA', 'CNPJ', 'Razao_Social', 'Nome_Fantasia', 'Modalidade', 'UF']
+
+def registros_operadoras(operadoras, semente=42):
+    """Registros ANS (6 dígitos, sem repetição) das operadoras sintéticas"""
+    rng = np.random.default_rng(semente)
+    return np.sort(rng.choice(np.arange(300000, 999999), size=operadoras, replace=False))
+
+def gerar_demonstracoes(caminho, linhas, registros, ano=2023, trimestre=1, semente=42):
+    """Grava um CSV de demonstrações contábeis de um trimestre (aspas, ';' e vírgula decimal, como a ANS)"""
+    rng = np.random.default_rng([semente, ano, trimestre])
+
+    codigos = np.array([c[0] for c in CONTAS])
+    descricoes = np.array([c[1] for c in CONTAS], dtype=object)
+    pesos = np.array([c[2] for c in CONTAS])
+    contas = rng.choice(len(CONTAS), size=linhas, p=pesos / pesos.sum())
+
+    saldo_final = np.round(rng.lognormal(mean=11, sigma=2, size=linhas), 2)
+    saldo_final[rng.random(linhas) < FRACAO_ZERADOS] = 0.0
+
+    df = pd.DataFrame({
+        'DATA': f"{ano}-{(trimestre - 1) * 3 + 1:02d}-01",
+        'REG_ANS': rng.choice(registros, size=linhas),
+        'CD_CONTA_CONTABIL': codigos[contas],
+        'DESCRICAO': descricoes[contas],
+        'VL_SALDO_INICIAL': np.round(saldo_final * rng.uniform(0.5, 1.5, size=linhas), 2),
+        'VL_SALDO_FINAL': saldo_final,
+    }, columns=COLUNAS_DEMONSTRACOES)
+
+    os.makedirs(os.path.dirname(caminho) or '.', exist_ok=True)
+    df.to_csv(caminho, sep=';', decimal=',', index=False, quoting=csv.QUOTE_ALL, encoding='utf-8')
+    return caminho
+
+def gerar_cadastro(caminho, registros, semente=42):
+    """Grava um Relatorio_cadop.csv sintético com parte das operadoras (as demais ficam sem cadastro)"""
+    rng = np.random.default_rng([semente, 0])
+    cadastradas = registros[rng.random(len(registros)) >= FRACAO_FORA_DO_CADASTRO]
+
+    df = pd.DataFrame({
+        'REGISTRO_OPERADORA': cadastradas,
+        'CNPJ': [f"{rng.integers(10**12, 10**13):013d}{i % 10}" for i in range(len(cadastradas))],
+        'Razao_Social': [f"OPERADORA SINTÉTICA {r} LTDA" for r in cadastradas],
+        'Nome_Fantasia': [f"SAÚDE {r}" for r in cadastradas],
+        'Modalidade': rng.choice(MODALIDADES, size=len(cadastradas)),
+        'UF': rng.choice(UFS, size=len(cadastradas)),
+    }, columns=COLUNAS_CADASTRO)
+
+    os.makedirs(os.path.dirname(caminho) or '.', exist_ok=True)
+    df.to_csv(caminho, sep=';', index=False, encoding='utf-8')
+    return caminho
+
+def gerar_conjunto(pasta, linhas, operadoras, trimestres=3, ano=2023, semente=42):
+    """
+    Gera os arquivos de 'trimestres' trimestres seguidos a partir do 1T de 'ano'
+    (pasta/<n>T<ano>/<n>T<ano>.csv) e o cadastro (pasta/Relatorio_cadop.csv).
+    Devolve ({trimestre: caminho do CSV}, caminho do cadastro).
+    """
+    registros = registros_operadoras(operadoras, semente)
+
+    arquivos = {}
+    for i in range(trimestres):
+        ano_tri, tri = ano + i // 4, i % 4 + 1
+        nome = f"{tri}T{ano_tri}"
+        arquivos[nome] = gerar_demonstracoes(os.path.join(pasta, nome, f"{nome}.csv"), linhas, registros,
+                                             ano=ano_tri, trimestre=tri, semente=semente)
+
+    cadastro = gerar_cadastro(os.path.join(pasta, 'Relatorio_cadop.csv'), registros, semente)
+    return arquivos, cadastro
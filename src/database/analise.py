@@ -1,102 +1,58 @@
+import os
+import sys
 import pandas as pd
-from sqlalchemy import create_engine, text
+from sqlalchemy import create_engine
 
-# Conexão com nosso banco SQLite
-DB_URL = "sqlite:///banco_teste.db"
+# Permite rodar direto (python src/database/analise.py) importando pelo pacote src
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+from src.database.motor_analitico import MotorAnalitico
+from src.database.publicacao import url_banco_atual
+
+# Conexão com nosso banco SQLite (o publicado pelo importador)
+DB_URL = url_banco_atual()
 engine = create_engine(DB_URL)
 
-def executar_analise():
+# Trimestres comparados na Query 1 (None = primeiro e último trimestre com dados)
+# Também podem ser passados na linha de comando: python src/database/analise.py 1T2023 3T2023
+PERIODO_INICIAL = None
+PERIODO_FINAL = None
+
+def executar_analise(periodo_inicial=PERIODO_INICIAL, periodo_final=PERIODO_FINAL):
     print("--- INICIANDO ANÁLISE DE DADOS (MISSÃO 3.4 - FINAL) ---")
 
-    # --- QUERY 1: CRESCIMENTO DAS DESPESAS ---
-    print("\n📊 1. Top 5 Operadoras com maior crescimento de despesas (1T vs 3T):")
-    
-    query1 = """
-    WITH despesas_1t AS (
-        SELECT registro_ans, SUM(valor) as total_1t
-        FROM despesas 
-        WHERE trimestre = '1T'  -- <--- CORRIGIDO: Agora busca '1T'
-        GROUP BY registro_ans
-    ),
-    despesas_3t AS (
-        SELECT registro_ans, SUM(valor) as total_3t
-        FROM despesas 
-        WHERE trimestre = '3T'  -- <--- CORRIGIDO: Agora busca '3T'
-        GROUP BY registro_ans
-    )
-    SELECT 
-        o.razao_social,
-        d1.total_1t,
-        d3.total_3t,
-        ROUND(((d3.total_3t - d1.total_1t) / d1.total_1t) * 100, 2) as crescimento_percentual
-    FROM despesas_1t d1
-    JOIN despesas_3t d3 ON d1.registro_ans = d3.registro_ans
-    JOIN operadoras o ON d1.registro_ans = o.registro_ans
-    WHERE d1.total_1t > 500000 -- Filtro: Ignora operadoras pequenas para focar nas relevantes
-    ORDER BY crescimento_percentual DESC
-    LIMIT 5;
-    """
+    # Matriz operadora x trimestre montada uma vez (a partir do resumo gravado pelo importador)
     try:
-        df1 = pd.read_sql(query1, engine)
-        pd.options.display.float_format = '{:,.2f}'.format
-        print(df1.to_string(index=False))
+        motor = MotorAnalitico.do_banco(engine)
     except Exception as e:
+        print(f"Erro ao carregar os dados de análise: {e}")
+        return
+
+    periodos = motor.listar_periodos()
+    if not periodos:
+        print("Nenhuma despesa encontrada no banco.")
+        return
+
+    pd.options.display.float_format = '{:,.2f}'.format
+
+    # --- QUERY 1: CRESCIMENTO DAS DESPESAS ---
+    inicial = periodo_inicial or periodos[0]
+    final = periodo_final or periodos[-1]
+    print(f"\n📊 1. Top 5 Operadoras com maior crescimento de despesas ({inicial} vs {final}):")
+    try:
+        df1 = pd.DataFrame(motor.crescimento(inicial, final, minimo=500000, limite=5))
+        print(df1.drop(columns='registro_ans', errors='ignore').to_string(index=False))
+    except ValueError as e:
         print(f"Erro na Query 1: {e}")
 
     # --- QUERY 2: DISTRIBUIÇÃO POR UF ---
     print("\n📊 2. Top 5 Estados com maiores despesas totais:")
-    
-    query2 = """
-    SELECT 
-        o.uf,
-        SUM(d.valor) as total_despesas,
-        COUNT(DISTINCT o.registro_ans) as qtd_operadoras,
-        ROUND(SUM(d.valor) / COUNT(DISTINCT o.registro_ans), 2) as media_por_operadora
-    FROM despesas d
-    JOIN operadoras o ON d.registro_ans = o.registro_ans
-    WHERE o.uf != 'INDEFINIDO' 
-    GROUP BY o.uf
-    ORDER BY total_despesas DESC
-    LIMIT 5;
-    """
-    try:
-        df2 = pd.read_sql(query2, engine)
-        print(df2.to_string(index=False))
-    except Exception as e:
-        print(f"Erro na Query 2: {e}")
+    df2 = pd.DataFrame(motor.distribuicao_uf(limite=5))
+    print(df2.to_string(index=False))
 
     # --- QUERY 3: ACIMA DA MÉDIA ---
     print("\n📊 3. Operadoras 'Gastonas' (Acima da média em >= 2 trimestres):")
-    
-    query3 = """
-    WITH medias_trimestrais AS (
-        SELECT trimestre, AVG(valor) as media_mercado
-        FROM despesas
-        GROUP BY trimestre
-    ),
-    operadoras_acima AS (
-        SELECT 
-            d.registro_ans,
-            d.trimestre
-        FROM despesas d
-        JOIN medias_trimestrais m ON d.trimestre = m.trimestre
-        WHERE d.valor > m.media_mercado
-    )
-    SELECT 
-        o.razao_social,
-        COUNT(*) as qtd_trimestres_acima
-    FROM operadoras_acima oa
-    JOIN operadoras o ON oa.registro_ans = o.registro_ans
-    GROUP BY o.razao_social
-    HAVING qtd_trimestres_acima >= 2
-    ORDER BY qtd_trimestres_acima DESC, o.razao_social
-    LIMIT 10;
-    """
-    try:
-        df3 = pd.read_sql(query3, engine)
-        print(df3.to_string(index=False))
-    except Exception as e:
-        print(f"Erro na Query 3: {e}")
+    df3 = pd.DataFrame(motor.acima_da_media(min_trimestres=2, limite=10))
+    print(df3.drop(columns='registro_ans', errors='ignore').to_string(index=False))
 
 if __name__ == "__main__":
-    executar_analise()
\ No newline at end of file
+    executar_analise(*sys.argv[1:3])
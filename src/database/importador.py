@@ -1,20 +1,62 @@
+import numpy as np
 import pandas as pd
 from sqlalchemy import create_engine, text
 import os
+import sys
+import sqlite3
+import uuid
+from datetime import datetime
+
+# Adiciona a raiz do projeto para importar os utilitários compartilhados (src/utils)
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from src.utils.armazenamento import ler_tabela, ler_tabela_em_blocos, existe_tabela
+from src.utils.estatisticas import novo_acumulador_trimestral, desempenho_por_operadora
+from src.utils.metricas import etapa, execucao
+from src.database.motor_analitico import chave_periodo
+from src.database.publicacao import (novo_caminho_versao, caminho_parcial, concluir_versao, otimizar, publicar,
+                                     limpar_versoes_antigas)
 
 # --- CONFIGURAÇÃO PARA SQLITE ---
 # Troca a conexão complexa por um arquivo local simples
-DB_URL = "sqlite:///banco_teste.db"
+ARQUIVO_DB = "banco_teste.db"
+DB_URL = f"sqlite:///{ARQUIVO_DB}"
+
+# Modo de carga: 'massa' (sqlite3 + executemany, padrão) ou 'sqlalchemy' (to_sql, modo antigo)
+MODO_CARGA = os.environ.get("IMPORTADOR_MODO", "massa")
+
+# Publicação: 'versionada' (banco novo + troca do ponteiro, ver publicacao.py, padrão)
+# ou 'no_lugar' (apaga e refaz o ARQUIVO_DB, modo antigo: a API fica sem dados durante a carga)
+PUBLICACAO = os.environ.get("IMPORTADOR_PUBLICACAO", "versionada")
 
-# Caminhos
-CSV_COMPLETO = "dados_completos_para_sql.csv"
-CSV_AGREGADO = "despesas_agregadas.csv"
+# --- CARGA EM MASSA ---
+TAMANHO_LOTE = 50_000
+# Valem só durante a carga (depois voltamos ao padrão do SQLite)
+PRAGMAS_CARGA = {
+    'journal_mode': 'WAL',
+    'synchronous': 'OFF',    # Não espera o disco a cada escrita (se cair, basta rodar de novo)
+    'cache_size': -262144,   # Negativo = KB -> ~256 MB de cache de páginas
+    'temp_store': 'MEMORY',
+}
+PRAGMAS_PADRAO = {
+    'journal_mode': 'DELETE',
+    'synchronous': 'FULL',
+}
+
+# Colunas do arquivo completo usadas na carga
+COLUNAS_COMPLETO = ['RegistroANS', 'CNPJ', 'RazaoSocial', 'Modalidade', 'UF', 'Ano', 'Trimestre', 'DESCRICAO', 'Categoria', 'Valor']
+# RegistroANS e CNPJ como texto para não perder zeros à esquerda
+TIPOS_COMPLETO = {'RegistroANS': str, 'CNPJ': str}
+
+# Caminhos (sem extensão: .csv ou .parquet conforme ETL_FORMATO)
+CSV_COMPLETO = "dados_completos_para_sql"
+CSV_AGREGADO = "despesas_agregadas"
 SQL_SCHEMA   = "./src/database/schema.sql"
 
-def criar_banco_e_tabelas():
+def criar_banco_e_tabelas(caminho_db=ARQUIVO_DB):
     print("--- 1. Preparando Banco de Dados (SQLite) ---")
     try:
-        engine = create_engine(DB_URL)
+        engine = create_engine(f"sqlite:///{caminho_db}")
         
         # Lê o script SQL
         with open(SQL_SCHEMA, 'r', encoding='utf-8') as f:
@@ -30,7 +72,7 @@ def criar_banco_e_tabelas():
                     conn.execute(text(cmd))
             
             conn.commit()
-            print("✅ Tabelas criadas com sucesso no arquivo 'banco_teste.db'.")
+            print(f"✅ Tabelas criadas com sucesso no arquivo '{caminho_db}'.")
             return engine
             
     except Exception as e:
@@ -42,7 +84,10 @@ def importar_dados(engine):
     
     # A. OPERADORAS
     print("Importando operadoras...")
-    df = pd.read_csv(CSV_COMPLETO, sep=';', encoding='utf-8')
+    # Lê só as colunas usadas
+    df = ler_tabela(CSV_COMPLETO, colunas=COLUNAS_COMPLETO, tipos=TIPOS_COMPLETO)
+    df, descartadas = descartar_registros_invalidos(df)
+    avisar_descartadas(descartadas)
     df_ops = df[['RegistroANS', 'CNPJ', 'RazaoSocial', 'Modalidade', 'UF']].drop_duplicates(subset=['RegistroANS'])
     df_ops.columns = ['registro_ans', 'cnpj', 'razao_social', 'modalidade', 'uf']
     
@@ -52,29 +97,335 @@ def importar_dados(engine):
     df_ops.to_sql('operadoras', engine, if_exists='append', index=False, chunksize=1000)
     print(f"✅ {len(df_ops)} operadoras salvas.")
     
-    # B. DESPESAS
+    # B. DESPESAS (formato compacto: despesas_fato + contas_dim, ver schema.sql)
     print("Importando despesas (pode demorar alguns segundos)...")
-    df_desp = df[['RegistroANS', 'Ano', 'Trimestre', 'DESCRICAO', 'Valor']].copy()
-    df_desp.columns = ['registro_ans', 'ano', 'trimestre', 'descricao', 'valor']
-    df_desp['registro_ans'] = df_desp['registro_ans'].astype(str)
+    df_desp, contas_novas = codificar_despesas(df, {})
     
-    df_desp.to_sql('despesas', engine, if_exists='append', index=False, chunksize=1000)
+    with etapa('carga', tabela='despesas') as span:
+        pd.DataFrame(contas_novas, columns=COLUNAS_CONTAS).to_sql('contas_dim', engine, if_exists='append', index=False)
+        df_desp.to_sql('despesas_fato', engine, if_exists='append', index=False, chunksize=1000)
+        span['linhas'] = len(df_desp)
+        span['descartadas'] = descartadas
     print(f"✅ {len(df_desp)} despesas salvas.")
     
+    # Resumos para a API (/api/estatisticas)
+    conn = engine.raw_connection()
+    try:
+        atualizar_resumos(conn, df)
+        montar_indice_busca(conn)
+        registrar_versao(conn)
+        conn.commit()
+    finally:
+        conn.close()
+    
     # C. AGREGADOS
     print("Importando tabela de desempenho...")
-    if os.path.exists(CSV_AGREGADO):
-        df_agg = pd.read_csv(CSV_AGREGADO, sep=';', encoding='utf-8')
+    if existe_tabela(CSV_AGREGADO):
+        df_agg = ler_tabela(CSV_AGREGADO)
         df_agg.columns = ['razao_social', 'uf', 'total_despesas', 'media_trimestral', 'desvio_padrao']
         df_agg.to_sql('desempenho_operadora', engine, if_exists='append', index=False)
         print(f"✅ Tabela de desempenho salva.")
 
-if __name__ == "__main__":
-    # Remove o banco antigo se existir para começar limpo
-    if os.path.exists("banco_teste.db"):
-        os.remove("banco_teste.db")
-        
-    engine = criar_banco_e_tabelas()
-    if engine:
+# Resumos mantidos na carga: tabela -> (colunas do DataFrame, colunas da tabela)
+RESUMOS = {
+    'resumo_trimestre': (['Ano', 'Trimestre'], ['ano', 'trimestre']),
+    'resumo_uf': (['UF'], ['uf']),
+    'resumo_operadora': (['RegistroANS', 'RazaoSocial'], ['registro_ans', 'razao_social']),
+    'resumo_operadora_periodo': (['RegistroANS', 'Ano', 'Trimestre'], ['registro_ans', 'ano', 'trimestre']),
+    'resumo_modalidade': (['Modalidade'], ['modalidade']),
+}
+# Chave primária de cada resumo (usada no ON CONFLICT)
+CHAVES_RESUMOS = {
+    'resumo_trimestre': ['ano', 'trimestre'],
+    'resumo_uf': ['uf'],
+    'resumo_operadora': ['registro_ans'],
+    'resumo_operadora_periodo': ['registro_ans', 'ano', 'trimestre'],
+    'resumo_modalidade': ['modalidade'],
+}
+
+def atualizar_resumos(conn, bloco):
+    """
+    Soma o bloco nos resumos (total e quantidade) de forma incremental:
+    se a chave já existe, o valor é acumulado (UPSERT), senão é criada.
+    """
+    for tabela, (colunas_df, colunas_sql) in RESUMOS.items():
+        parcial = bloco.groupby(colunas_df, observed=True)['Valor'].agg(total='sum', qtd='count').reset_index()
+        if 'RegistroANS' in parcial:
+            parcial['RegistroANS'] = parcial['RegistroANS'].astype(str)
+
+        chaves = CHAVES_RESUMOS[tabela]
+        colunas = colunas_sql + ['total', 'qtd']
+        sql = f"""
+            INSERT INTO {tabela} ({', '.join(colunas)})
+            VALUES ({', '.join('?' for _ in colunas)})
+            ON CONFLICT({', '.join(chaves)}) DO UPDATE SET
+                total = total + excluded.total,
+                qtd = qtd + excluded.qtd
+        """
+        conn.executemany(sql, linhas_para_sql(parcial))
+
+def montar_indice_busca(conn):
+    """(Re)constrói o índice FTS5 de busca a partir da tabela operadoras"""
+    conn.execute("DELETE FROM operadoras_busca")
+    conn.execute("""
+        INSERT INTO operadoras_busca (registro_ans, razao_social, cnpj_digitos)
+        SELECT registro_ans, razao_social,
+               REPLACE(REPLACE(REPLACE(COALESCE(cnpj, ''), '.', ''), '/', ''), '-', '')
+        FROM operadoras
+    """)
+    # Junta os segmentos do índice em um só (consultas mais rápidas)
+    conn.execute("INSERT INTO operadoras_busca (operadoras_busca) VALUES ('optimize')")
+
+def registrar_versao(conn):
+    """Grava um carimbo novo de versão dos dados (a API usa para invalidar o cache)"""
+    versao = f"{datetime.now():%Y%m%d%H%M%S}-{uuid.uuid4().hex[:8]}"
+    conn.execute("INSERT OR REPLACE INTO metadados (chave, valor) VALUES ('versao_dados', ?)", (versao,))
+    return versao
+
+def comandos_do_schema():
+    """Lê o schema.sql e separa os comandos em (tabelas, índices)"""
+    with open(SQL_SCHEMA, 'r', encoding='utf-8') as f:
+        sql_script = f.read()
+
+    tabelas, indices = [], []
+    for cmd in sql_script.split(';'):
+        # Remove as linhas de comentário para olhar só o comando
+        limpo = "\n".join(l for l in cmd.splitlines() if not l.strip().startswith('--')).strip()
+        if not limpo:
+            continue
+        if limpo.upper().startswith('CREATE INDEX'):
+            indices.append(limpo)
+        else:
+            tabelas.append(limpo)
+    return tabelas, indices
+
+def aplicar_pragmas(conn, pragmas):
+    for nome, valor in pragmas.items():
+        conn.execute(f"PRAGMA {nome} = {valor}")
+
+def linhas_para_sql(df):
+    """DataFrame -> lista de tuplas com tipos do Python (NaN vira NULL)"""
+    objetos = df.astype(object).where(df.notna(), None)
+    return list(objetos.itertuples(index=False, name=None))
+
+def inserir_lotes(conn, sql, linhas, tamanho_lote=TAMANHO_LOTE):
+    """executemany em lotes grandes; devolve quantas linhas foram inseridas"""
+    total = 0
+    for inicio in range(0, len(linhas), tamanho_lote):
+        lote = linhas[inicio:inicio + tamanho_lote]
+        conn.executemany(sql, lote)
+        total += len(lote)
+    return total
+
+# Colunas da tabela de fato e da dimensão de contas (schema.sql)
+COLUNAS_FATO = ['registro', 'periodo', 'seq', 'conta', 'valor']
+COLUNAS_CONTAS = ['id', 'descricao', 'categoria']
+# Conta das linhas sem descrição
+DESCRICAO_VAZIA = ''
+
+def descartar_registros_invalidos(bloco):
+    """
+    A Missão 2 mantém como texto o Registro ANS que não é número (ex: 'nan'), mas despesas_fato
+    guarda o registro como inteiro. Essas linhas ficam fora da carga (e dos resumos, para os totais
+    baterem com as despesas) e só são contadas. Devolve (bloco sem elas, quantidade descartada).
+    """
+    numeros = pd.to_numeric(bloco['RegistroANS'], errors='coerce')
+    validos = np.isfinite(numeros.to_numpy(dtype='float64', na_value=np.nan))
+    if validos.all():
+        return bloco, 0
+    return bloco[validos], int((~validos).sum())
+
+def avisar_descartadas(descartadas):
+    if descartadas:
+        print(f"⚠️ {descartadas} linha(s) com Registro ANS não numérico ficaram fora da carga.")
+
+def codificar_despesas(bloco, contas, primeira_seq=0):
+    """
+    Bloco do arquivo completo -> DataFrame no formato de despesas_fato (só inteiros e o valor).
+    O Registro ANS precisa ser numérico (ver descartar_registros_invalidos).
+    'contas' é o dicionário (descricao, categoria) -> id da carga inteira: cresce com as contas
+    que aparecem pela primeira vez neste bloco, devolvidas à parte para gravar em contas_dim.
+    Cada coluna de texto é fatorada uma vez; o dicionário só é consultado por par distinto.
+    """
+    # Descrição vazia ganha código próprio (e não -1, que no divmod abaixo apontaria para a última
+    # descrição do bloco): vira a conta de descrição '' (contas_dim.descricao é NOT NULL)
+    cod_desc, descricoes = pd.factorize(bloco['DESCRICAO'], use_na_sentinel=False)
+    cod_cat, categorias = pd.factorize(bloco['Categoria']) # Categoria vazia -> -1
+
+    # Par (descrição, categoria) como um inteiro só: fatorar de novo dá os pares distintos
+    largura = len(categorias) + 1
+    cod_par, pares = pd.factorize(cod_desc.astype(np.int64) * largura + (cod_cat + 1))
+
+    ids_pares = np.empty(len(pares), dtype=np.int64)
+    novas = []
+    for i, par in enumerate(pares):
+        d, c = divmod(int(par), largura)
+        descricao = descricoes[d]
+        chave = (str(descricao) if pd.notna(descricao) else DESCRICAO_VAZIA, str(categorias[c - 1]) if c else None)
+        if chave not in contas:
+            contas[chave] = len(contas) + 1
+            novas.append((contas[chave], *chave))
+        ids_pares[i] = contas[chave]
+
+    cod_tri, trimestres = pd.factorize(bloco['Trimestre'].astype(str))
+    numeros_tri = np.array([chave_periodo(0, t) for t in trimestres], dtype=np.int64)
+
+    fato = pd.DataFrame({
+        'registro': pd.to_numeric(bloco['RegistroANS']).astype(np.int64).to_numpy(),
+        'periodo': bloco['Ano'].astype(np.int64).to_numpy() * 10 + numeros_tri[cod_tri],
+        'seq': np.arange(primeira_seq, primeira_seq + len(bloco), dtype=np.int64),
+        'conta': ids_pares[cod_par],
+        'valor': bloco['Valor'].to_numpy(),
+    }, columns=COLUNAS_FATO)
+    return fato, novas
+
+def blocos_do_arquivo_completo():
+    """Fonte padrão da carga em massa: o arquivo completo lido em blocos (streaming)"""
+    return ler_tabela_em_blocos(CSV_COMPLETO, colunas=COLUNAS_COMPLETO, tipos=TIPOS_COMPLETO,
+                                tamanho_bloco=TAMANHO_LOTE)
+
+def importar_dados_em_massa(caminho_db=ARQUIVO_DB, blocos=None):
+    """
+    Carga rápida direto pelo sqlite3:
+    - pragmas de carga (WAL, synchronous OFF, cache grande) só durante a importação
+    - executemany em lotes grandes dentro de UMA transação
+    - índices criados só depois que os dados estão no banco
+    - 'blocos' pode ser qualquer iterador de DataFrames (não precisa do arquivo inteiro na memória)
+    """
+    print("--- Carga em massa (SQLite) ---")
+    blocos = blocos if blocos is not None else blocos_do_arquivo_completo()
+    comandos_tabelas, comandos_indices = comandos_do_schema()
+
+    conn = sqlite3.connect(caminho_db, isolation_level=None) # Controlamos a transação na mão
+    try:
+        aplicar_pragmas(conn, PRAGMAS_CARGA)
+
+        for cmd in comandos_tabelas:
+            conn.execute(cmd)
+
+        conn.execute("BEGIN")
+        qtd_ops = qtd_desp = descartadas = 0
+        # Estatísticas por operadora/trimestre, acumuladas enquanto os blocos passam
+        acumulador = novo_acumulador_trimestral()
+        # Contas já gravadas em contas_dim: (descricao, categoria) -> id
+        contas = {}
+
+        with etapa('carga', tabela='despesas') as span:
+            for bloco in blocos:
+                bloco, qtd = descartar_registros_invalidos(bloco)
+                descartadas += qtd
+
+                # A. OPERADORAS (OR IGNORE: a mesma operadora aparece em vários blocos)
+                df_ops = bloco[['RegistroANS', 'CNPJ', 'RazaoSocial', 'Modalidade', 'UF']].drop_duplicates(subset=['RegistroANS'])
+                df_ops = df_ops.astype({'RegistroANS': str})
+                qtd_ops += inserir_lotes(conn, """
+                    INSERT OR IGNORE INTO operadoras (registro_ans, cnpj, razao_social, modalidade, uf)
+                    VALUES (?, ?, ?, ?, ?)
+                """, linhas_para_sql(df_ops))
+
+                # B. DESPESAS (contas novas primeiro, depois as linhas de fato só com inteiros)
+                df_desp, contas_novas = codificar_despesas(bloco, contas, primeira_seq=qtd_desp)
+                conn.executemany("INSERT INTO contas_dim (id, descricao, categoria) VALUES (?, ?, ?)", contas_novas)
+                qtd_desp += inserir_lotes(conn, """
+                    INSERT INTO despesas_fato (registro, periodo, seq, conta, valor)
+                    VALUES (?, ?, ?, ?, ?)
+                """, linhas_para_sql(df_desp))
+
+                # Resumos para a API (/api/estatisticas)
+                atualizar_resumos(conn, bloco)
+                acumulador.atualizar(bloco)
+            span['linhas'] = qtd_desp
+            span['descartadas'] = descartadas
+        avisar_descartadas(descartadas)
+
+        # C. AGREGADOS (direto do acumulador: não depende do arquivo despesas_agregadas)
+        with etapa('desempenho') as span:
+            df_agg = desempenho_por_operadora(acumulador)
+            span['linhas'] = inserir_lotes(conn, """
+                INSERT INTO desempenho_operadora (razao_social, uf, total_despesas, media_trimestral, desvio_padrao)
+                VALUES (?, ?, ?, ?, ?)
+            """, linhas_para_sql(df_agg))
+
+        # D. ÍNDICE DE BUSCA
+        montar_indice_busca(conn)
+
+        versao = registrar_versao(conn)
+        conn.execute("COMMIT")
+        print(f"✅ {qtd_desp} despesas salvas ({qtd_ops} linhas de operadoras processadas). Versão: {versao}")
+
+        # E. ÍNDICES (construir de uma vez no final é bem mais barato que manter durante os INSERTs)
+        print("Criando índices...")
+        with etapa('indices', quantidade=len(comandos_indices)):
+            for cmd in comandos_indices:
+                conn.execute(cmd)
+
+        aplicar_pragmas(conn, PRAGMAS_PADRAO)
+        return True
+
+    except Exception as e:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        print(f"❌ Erro na carga em massa: {e}")
+        return False
+
+    finally:
+        conn.close()
+
+def carregar(caminho_db, blocos=None):
+    """
+    Monta o banco em 'caminho_db' no MODO_CARGA configurado. Devolve True se deu certo.
+    'blocos' (só no modo massa): iterador de DataFrames no lugar do arquivo completo.
+    """
+    if MODO_CARGA == "massa":
+        return importar_dados_em_massa(caminho_db, blocos)
+
+    engine = criar_banco_e_tabelas(caminho_db)
+    if not engine:
+        return False
+    try:
         importar_dados(engine)
-        print("\n🚀 SUCESSO! Banco de dados pronto para análise.")
\ No newline at end of file
+        return True
+    finally:
+        engine.dispose() # Solta o arquivo antes do VACUUM/troca
+
+def carregar_e_publicar(blocos=None):
+    """
+    Carga azul/verde: o banco novo é montado em outro arquivo enquanto a API segue lendo o atual.
+    Só depois de pronto (e otimizado) o ponteiro é trocado. Se a carga falhar, nada muda para a API.
+    Até lá o arquivo tem o nome .parcial: nem a listagem de versões nem o --voltar o enxergam.
+    """
+    caminho_db = novo_caminho_versao()
+    parcial = caminho_parcial(caminho_db)
+    try:
+        if not carregar(parcial, blocos):
+            return False
+
+        with etapa('otimizacao'):
+            print("Otimizando o banco novo (ANALYZE + VACUUM)...")
+            otimizar(parcial)
+        concluir_versao(caminho_db)
+    finally:
+        # Falhou (ou levantou exceção) antes do nome final: não fica banco pela metade no disco
+        if os.path.exists(parcial):
+            os.remove(parcial)
+
+    publicar(caminho_db)
+    limpar_versoes_antigas()
+    return True
+
+def importar(blocos=None):
+    """Carga completa no modo de PUBLICACAO configurado. Devolve True se deu certo."""
+    if PUBLICACAO == "no_lugar":
+        # Remove o banco antigo se existir para começar limpo
+        if os.path.exists(ARQUIVO_DB):
+            os.remove(ARQUIVO_DB)
+        return carregar(ARQUIVO_DB, blocos)
+    return carregar_e_publicar(blocos)
+
+if __name__ == "__main__":
+    with execucao("importador") as relatorio:
+        relatorio.update(modo=MODO_CARGA, publicacao=PUBLICACAO)
+        if importar():
+            print("\n🚀 SUCESSO! Banco de dados pronto para análise.")
+        else:
+            relatorio['status'] = "erro"
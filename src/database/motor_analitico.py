@@ -0,0 +1,159 @@
+import re
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+# Resumo operadora x período mantido pelo importador (uma linha por registro/ano/trimestre)
+SQL_RESUMO = "SELECT registro_ans, ano, trimestre, total, qtd FROM resumo_operadora_periodo"
+
+# Banco antigo (sem o resumo): monta o mesmo resultado com uma única varredura em despesas
+SQL_RESUMO_DESPESAS = """
+    SELECT registro_ans, ano, trimestre, SUM(valor) AS total, COUNT(*) AS qtd
+    FROM despesas
+    GROUP BY registro_ans, ano, trimestre
+"""
+
+SQL_OPERADORAS = "SELECT registro_ans, razao_social, uf FROM operadoras"
+
+def formatar_periodo(ano, trimestre):
+    """(2023, '3T') -> '3T2023' (mesmo formato dos arquivos da ANS)"""
+    return f"{trimestre}{ano}"
+
+def chave_periodo(ano, trimestre):
+    """(2023, '3T') -> 20233: o período como inteiro, do jeito que fica em despesas_fato"""
+    return int(ano) * 10 + int(str(trimestre).upper().rstrip("T"))
+
+def ler_periodo(texto):
+    """Aceita '3T2023', '2023-3T', '2023-3' ou '2023/3T' e devolve (2023, '3T')"""
+    limpo = (texto or "").strip().upper()
+
+    m = re.fullmatch(r"([1-4])T[-/ ]?(\d{4})", limpo)
+    if m:
+        return int(m.group(2)), f"{m.group(1)}T"
+
+    m = re.fullmatch(r"(\d{4})[-/ ]?([1-4])T?", limpo)
+    if m:
+        return int(m.group(1)), f"{m.group(2)}T"
+
+    raise ValueError(f"Período inválido: '{texto}'. Use o formato 3T2023.")
+
+class MotorAnalitico:
+    """
+    Matriz compacta operadora x período (totais de despesa) montada uma vez só.
+    Crescimento entre quaisquer dois trimestres, operadoras acima da média e distribuição por UF
+    saem de operações vetorizadas do NumPy, sem voltar a varrer a tabela de despesas.
+    """
+
+    def __init__(self, resumo, operadoras):
+        resumo = resumo.astype({'registro_ans': str, 'ano': int, 'trimestre': str})
+
+        # Eixos da matriz
+        self.periodos = sorted(set(zip(resumo['ano'], resumo['trimestre'])))
+        self.registros = np.array(sorted(resumo['registro_ans'].unique()), dtype=object)
+        self._indice_periodo = {p: i for i, p in enumerate(self.periodos)}
+
+        linhas = pd.Index(self.registros).get_indexer(resumo['registro_ans'])
+        colunas = np.array([self._indice_periodo[p] for p in zip(resumo['ano'], resumo['trimestre'])], dtype=int)
+
+        forma = (len(self.registros), len(self.periodos))
+        self.totais = np.zeros(forma)
+        self.qtd = np.zeros(forma, dtype=np.int64)
+        np.add.at(self.totais, (linhas, colunas), resumo['total'].to_numpy(dtype=float))
+        np.add.at(self.qtd, (linhas, colunas), resumo['qtd'].to_numpy(dtype=np.int64))
+        # Operadora teve lançamento no período?
+        self.presente = self.qtd > 0
+
+        # Atributos das operadoras, na mesma ordem das linhas da matriz
+        meta = operadoras.astype({'registro_ans': str}).drop_duplicates('registro_ans').set_index('registro_ans').reindex(self.registros)
+        self.razao_social = meta['razao_social'].fillna("OPERADORA NÃO IDENTIFICADA").to_numpy(dtype=object)
+        uf = meta['uf'].fillna("INDEFINIDO").to_numpy(dtype=object)
+        self.uf_codigos, self.ufs = pd.factorize(uf)
+
+    @classmethod
+    def do_banco(cls, engine):
+        """Monta o motor a partir do banco (resumo pronto ou, em banco antigo, um GROUP BY)"""
+        with engine.connect() as conn:
+            try:
+                resumo = pd.read_sql(text(SQL_RESUMO), conn)
+            except OperationalError:
+                resumo = pd.read_sql(text(SQL_RESUMO_DESPESAS), conn)
+            operadoras = pd.read_sql(text(SQL_OPERADORAS), conn)
+        return cls(resumo, operadoras)
+
+    def listar_periodos(self):
+        return [formatar_periodo(ano, tri) for ano, tri in self.periodos]
+
+    def coluna(self, periodo):
+        """'3T2023' -> índice da coluna na matriz"""
+        chave = ler_periodo(periodo) if isinstance(periodo, str) else periodo
+        if chave not in self._indice_periodo:
+            raise ValueError(f"Sem dados para o período {formatar_periodo(*chave)}.")
+        return self._indice_periodo[chave]
+
+    def crescimento(self, de, ate, minimo=500000, limite=5):
+        """Top operadoras com maior crescimento percentual de despesas entre dois trimestres"""
+        i, j = self.coluna(de), self.coluna(ate)
+        inicial, final = self.totais[:, i], self.totais[:, j]
+
+        # Filtro: ignora operadoras pequenas (total inicial <= mínimo) para focar nas relevantes
+        validas = self.presente[:, i] & self.presente[:, j] & (inicial > minimo)
+        linhas = np.flatnonzero(validas)
+        percentual = (final[linhas] - inicial[linhas]) / inicial[linhas] * 100
+
+        ordem = np.argsort(-percentual, kind='stable')[:limite]
+        return [
+            {
+                "registro_ans": self.registros[linhas[k]],
+                "razao_social": self.razao_social[linhas[k]],
+                "total_inicial": float(inicial[linhas[k]]),
+                "total_final": float(final[linhas[k]]),
+                "crescimento_percentual": round(float(percentual[k]), 2),
+            }
+            for k in ordem
+        ]
+
+    def acima_da_media(self, min_trimestres=2, limite=10):
+        """Operadoras com total acima da média do mercado em pelo menos 'min_trimestres' trimestres"""
+        # Média do mercado em cada período (só entre operadoras com lançamento no período)
+        operadoras_no_periodo = self.presente.sum(axis=0)
+        media_mercado = np.divide(self.totais.sum(axis=0), operadoras_no_periodo,
+                                  out=np.zeros(len(self.periodos)), where=operadoras_no_periodo > 0)
+
+        acima = self.presente & (self.totais > media_mercado)
+        qtd_acima = acima.sum(axis=1)
+
+        linhas = np.flatnonzero(qtd_acima >= min_trimestres)
+        # Ordena por quantidade (desc) e depois por razão social
+        ordem = sorted(linhas, key=lambda k: (-qtd_acima[k], self.razao_social[k]))[:limite]
+        return [
+            {
+                "registro_ans": self.registros[k],
+                "razao_social": self.razao_social[k],
+                "qtd_trimestres_acima": int(qtd_acima[k]),
+            }
+            for k in ordem
+        ]
+
+    def distribuicao_uf(self, limite=5, periodos=None):
+        """Despesa total, quantidade de operadoras e média por operadora em cada UF"""
+        colunas = [self.coluna(p) for p in periodos] if periodos else list(range(len(self.periodos)))
+        total_por_operadora = self.totais[:, colunas].sum(axis=1)
+        participa = self.presente[:, colunas].any(axis=1)
+
+        n_ufs = len(self.ufs)
+        total_uf = np.bincount(self.uf_codigos, weights=total_por_operadora, minlength=n_ufs)
+        qtd_uf = np.bincount(self.uf_codigos, weights=participa, minlength=n_ufs).astype(int)
+
+        resultado = [
+            {
+                "uf": self.ufs[k],
+                "total_despesas": float(total_uf[k]),
+                "qtd_operadoras": int(qtd_uf[k]),
+                "media_por_operadora": round(float(total_uf[k] / qtd_uf[k]), 2),
+            }
+            for k in range(n_ufs)
+            if self.ufs[k] != "INDEFINIDO" and qtd_uf[k] > 0
+        ]
+        resultado.sort(key=lambda r: r["total_despesas"], reverse=True)
+        return resultado[:limite]
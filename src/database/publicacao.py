@@ -0,0 +1,135 @@
+import os
+import sys
+import sqlite3
+import uuid
+from datetime import datetime
+
+# --- PUBLICAÇÃO DO BANCO (AZUL/VERDE) ---
+# O importador nunca mexe no banco que a API está lendo:
+# 1. monta um arquivo novo em DIR_VERSOES (banco-<data>-<id>.db.parcial)
+# 2. roda ANALYZE e VACUUM nele e só então dá o nome final (banco-<data>-<id>.db)
+# 3. troca o ponteiro (ARQUIVO_PONTEIRO) de uma vez só (os.replace é atômico)
+# A API confere o ponteiro junto com a versão dos dados e reabre o pool no arquivo novo.
+# As versões anteriores ficam guardadas: voltar é só apontar para uma delas (--voltar).
+
+DIR_VERSOES = os.environ.get("BANCO_DIR_VERSOES", "./bancos")
+# Arquivo texto com o caminho do banco em uso (funciona no Windows, onde symlink exige permissão)
+ARQUIVO_PONTEIRO = os.environ.get("BANCO_PONTEIRO", "./banco_atual.txt")
+# Sem ponteiro (instalação antiga ou carga no modo no lugar): o arquivo de sempre
+ARQUIVO_LEGADO = "banco_teste.db"
+
+# Quantas versões ficam no disco (a atual + as anteriores, para voltar)
+MANTER_VERSOES = 3
+
+PREFIXO_VERSAO = "banco-"
+# Banco ainda em montagem: carga que falhou ou foi interrompida nunca aparece como versão
+# (listar_versoes, limpar_versoes_antigas e --voltar só enxergam os arquivos .db)
+SUFIXO_PARCIAL = ".parcial"
+
+def novo_caminho_versao():
+    """Caminho do próximo banco (o nome começa pela data: ordem alfabética = ordem de criação)"""
+    os.makedirs(DIR_VERSOES, exist_ok=True)
+    nome = f"{PREFIXO_VERSAO}{datetime.now():%Y%m%d-%H%M%S}-{uuid.uuid4().hex[:6]}.db"
+    return os.path.join(DIR_VERSOES, nome)
+
+def caminho_parcial(caminho_db):
+    """Nome do arquivo enquanto a versão 'caminho_db' é montada"""
+    return caminho_db + SUFIXO_PARCIAL
+
+def concluir_versao(caminho_db):
+    """Dá o nome final à versão montada em caminho_parcial(caminho_db)"""
+    os.replace(caminho_parcial(caminho_db), caminho_db)
+    return caminho_db
+
+def listar_versoes():
+    """Bancos versionados no disco, do mais antigo para o mais novo"""
+    if not os.path.isdir(DIR_VERSOES):
+        return []
+    nomes = sorted(n for n in os.listdir(DIR_VERSOES) if n.startswith(PREFIXO_VERSAO) and n.endswith(".db"))
+    return [os.path.join(DIR_VERSOES, n) for n in nomes]
+
+def ler_ponteiro():
+    try:
+        with open(ARQUIVO_PONTEIRO, 'r', encoding='utf-8') as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+def banco_atual():
+    """Arquivo que a API e as análises devem ler agora"""
+    caminho = ler_ponteiro()
+    if caminho and os.path.exists(caminho):
+        return caminho
+    return ARQUIVO_LEGADO
+
+def url_banco_atual():
+    return f"sqlite:///{banco_atual()}"
+
+def otimizar(caminho_db):
+    """Estatísticas para o planejador de consultas (ANALYZE) e arquivo compactado (VACUUM)"""
+    conn = sqlite3.connect(caminho_db, isolation_level=None)
+    try:
+        conn.execute("ANALYZE")
+        conn.execute("VACUUM")
+    finally:
+        conn.close()
+
+def publicar(caminho_db):
+    """Aponta o ponteiro para 'caminho_db'. Quem ler o ponteiro vê o caminho antigo ou o novo, nunca meio arquivo."""
+    if not os.path.exists(caminho_db):
+        raise FileNotFoundError(f"Banco não encontrado: {caminho_db}")
+
+    temporario = f"{ARQUIVO_PONTEIRO}.{uuid.uuid4().hex[:6]}.tmp"
+    with open(temporario, 'w', encoding='utf-8') as f:
+        f.write(caminho_db + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temporario, ARQUIVO_PONTEIRO)
+    print(f"🔀 Banco em uso: {caminho_db}")
+    return caminho_db
+
+def versao_anterior():
+    """A versão guardada logo antes da atual (None se não houver)"""
+    versoes = listar_versoes()
+    atual = os.path.normpath(banco_atual())
+    normalizadas = [os.path.normpath(v) for v in versoes]
+    if atual not in normalizadas:
+        return versoes[-1] if versoes else None
+    posicao = normalizadas.index(atual)
+    return versoes[posicao - 1] if posicao > 0 else None
+
+def voltar():
+    """Rollback: volta o ponteiro para a versão anterior"""
+    anterior = versao_anterior()
+    if anterior is None:
+        print("⚠️ Não há versão anterior guardada.")
+        return None
+    return publicar(anterior)
+
+def limpar_versoes_antigas(manter=MANTER_VERSOES):
+    """Apaga as versões mais antigas além de 'manter' (nunca a que está em uso)"""
+    atual = os.path.normpath(banco_atual())
+    antigas = [v for v in listar_versoes()[:-manter] if os.path.normpath(v) != atual] if manter > 0 else []
+    for caminho in antigas:
+        try:
+            os.remove(caminho)
+        except OSError as e:
+            # No Windows o arquivo pode estar aberto por uma conexão antiga: fica para a próxima
+            print(f"⚠️ Não foi possível apagar {caminho}: {e}")
+    return antigas
+
+if __name__ == "__main__":
+    # python src/database/publicacao.py            -> lista as versões
+    # python src/database/publicacao.py --voltar   -> volta para a versão anterior
+    # python src/database/publicacao.py <arquivo>  -> passa a usar o arquivo indicado
+    argumentos = sys.argv[1:]
+    if argumentos == ["--voltar"]:
+        voltar()
+    elif argumentos:
+        publicar(argumentos[0])
+    else:
+        atual = os.path.normpath(banco_atual())
+        print(f"Em uso: {banco_atual()}")
+        for caminho in listar_versoes():
+            marca = "*" if os.path.normpath(caminho) == atual else " "
+            print(f" {marca} {caminho} ({os.path.getsize(caminho) / 2**20:.1f} MB)")
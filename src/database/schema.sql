@@ -7,17 +7,40 @@ CREATE TABLE IF NOT EXISTS operadoras (
     uf TEXT
 );
 
--- 2. Tabela de Fato: DESPESAS
-CREATE TABLE IF NOT EXISTS despesas (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    registro_ans TEXT,
-    ano INTEGER,
-    trimestre TEXT,
-    descricao TEXT,
-    valor REAL,
-    FOREIGN KEY(registro_ans) REFERENCES operadoras(registro_ans)
+-- 2. Tabela de Fato: DESPESAS (formato compacto)
+-- Cada descrição de conta é gravada uma vez só aqui (a tabela de fato guarda só o id, de 1 ou 2 bytes)
+CREATE TABLE IF NOT EXISTS contas_dim (
+    id INTEGER PRIMARY KEY,
+    descricao TEXT NOT NULL,
+    categoria TEXT, -- Categoria da conta contábil (ex: EVENTOS_SINISTROS)
+    UNIQUE(descricao, categoria)
 );
 
+-- Só inteiros e o valor: registro ANS como número e o período empacotado (ano*10 + trimestre: 20233 = 3T2023)
+-- WITHOUT ROWID: as linhas ficam gravadas na ordem da chave, então o histórico de uma operadora
+-- (o acesso da API) é uma leitura contínua, sem índice à parte
+CREATE TABLE IF NOT EXISTS despesas_fato (
+    registro INTEGER NOT NULL,
+    periodo INTEGER NOT NULL,
+    seq INTEGER NOT NULL, -- Ordem de chegada da linha (desempata linhas iguais da mesma operadora/período)
+    conta INTEGER NOT NULL REFERENCES contas_dim(id),
+    valor REAL,
+    PRIMARY KEY(registro, periodo, seq)
+) WITHOUT ROWID;
+
+-- Visão de compatibilidade: mesmas colunas da antiga tabela despesas (consultas avulsas, bancos antigos)
+-- Filtrar por registro_ans aqui não usa a chave: consultas frequentes vão direto em despesas_fato
+CREATE VIEW IF NOT EXISTS despesas AS
+SELECT f.seq AS id,
+       printf('%06d', f.registro) AS registro_ans,
+       f.periodo / 10 AS ano,
+       (f.periodo % 10) || 'T' AS trimestre,
+       c.descricao,
+       c.categoria,
+       f.valor
+FROM despesas_fato f
+JOIN contas_dim c ON c.id = f.conta;
+
 -- 3. Tabela Agregada: PERFORMANCE_UF
 CREATE TABLE IF NOT EXISTS desempenho_operadora (
     razao_social TEXT,
@@ -27,6 +50,63 @@ CREATE TABLE IF NOT EXISTS desempenho_operadora (
     desvio_padrao REAL
 );
 
+-- 4. Tabelas de Resumo (mantidas pelo importador a cada carga)
+-- A API lê daqui em vez de varrer a tabela de despesas
+CREATE TABLE IF NOT EXISTS resumo_trimestre (
+    ano INTEGER,
+    trimestre TEXT,
+    total REAL,
+    qtd INTEGER,
+    PRIMARY KEY(ano, trimestre)
+);
+
+CREATE TABLE IF NOT EXISTS resumo_uf (
+    uf TEXT PRIMARY KEY,
+    total REAL,
+    qtd INTEGER
+);
+
+CREATE TABLE IF NOT EXISTS resumo_operadora (
+    registro_ans TEXT PRIMARY KEY,
+    razao_social TEXT,
+    total REAL,
+    qtd INTEGER
+);
+
+-- Operadora x período: base do motor analítico (crescimento entre trimestres, acima da média)
+CREATE TABLE IF NOT EXISTS resumo_operadora_periodo (
+    registro_ans TEXT,
+    ano INTEGER,
+    trimestre TEXT,
+    total REAL,
+    qtd INTEGER,
+    PRIMARY KEY(registro_ans, ano, trimestre)
+);
+
+CREATE TABLE IF NOT EXISTS resumo_modalidade (
+    modalidade TEXT PRIMARY KEY,
+    total REAL,
+    qtd INTEGER
+);
+
+-- 5. Metadados da carga (ex: versao_dados, usada pela API para invalidar o cache)
+CREATE TABLE IF NOT EXISTS metadados (
+    chave TEXT PRIMARY KEY,
+    valor TEXT
+);
+
+-- 6. Índice de Busca (FTS5) sobre as operadoras, preenchido pelo importador
+-- remove_diacritics: busca sem acento e sem diferenciar maiúsculas
+-- prefix: acelera buscas por começo de palavra/CNPJ (o que o usuário digita)
+CREATE VIRTUAL TABLE IF NOT EXISTS operadoras_busca USING fts5(
+    registro_ans UNINDEXED,
+    razao_social,
+    cnpj_digitos,
+    tokenize = "unicode61 remove_diacritics 2",
+    prefix = '2 3 4'
+);
+
 -- Índices (Otimização)
-CREATE INDEX IF NOT EXISTS idx_despesas_registro ON despesas(registro_ans);
-CREATE INDEX IF NOT EXISTS idx_despesas_ano_tri ON despesas(ano, trimestre);
\ No newline at end of file
+-- despesas_fato não precisa de índice: a chave (registro, periodo) já cobre o histórico por operadora
+-- e os totais por período saem das tabelas de resumo
+CREATE INDEX IF NOT EXISTS idx_operadoras_cnpj ON operadoras(cnpj);
\ No newline at end of file
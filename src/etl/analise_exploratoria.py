@@ -1,5 +1,10 @@
-import pandas as pd
 import os
+import sys
+
+# Adiciona o diretório atual ao path para importar o leitor compartilhado dos CSVs da ANS
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from leitor_ans import ler_csv_ans
 
 # Caminho do arquivo que você baixou
 caminho_arquivo = "./downloads_ans/3T2023.csv"
@@ -11,11 +16,14 @@ else:
     print("Lendo o arquivo... (Isso pode demorar alguns segundos)")
     
     try:
-        # Padrão Governo Brasileiro: Separador ';' e encoding 'latin1' (ou 'cp1252')
-        # on_bad_lines='skip' ignora linhas quebradas para não travar o script
-        df = pd.read_csv(caminho_arquivo, sep=';', encoding='latin1', on_bad_lines='skip')
+        # Separador, codificação (UTF-8 ou latin1) e vírgula decimal são detectados pelo leitor_ans.py
+        # Sem esquema: todas as colunas. Linhas quebradas vão para a quarentena (e são contadas)
+        resumo = {}
+        df = ler_csv_ans(caminho_arquivo, None, resumo=resumo)
         
         print("\n--- SUCESSO! O ARQUIVO FOI LIDO ---")
+        print(f"Formato: {resumo['codificacao']}, separador '{resumo['separador']}', decimal '{resumo['decimal']}' "
+              f"({resumo['quarentena']} linha(s) em quarentena)")
         
         print(f"\n1. Quantidade de linhas e colunas: {df.shape}")
         
@@ -0,0 +1,73 @@
+import os
+import pickle
+
+import pandas as pd
+
+from leitor_ans import detectar_codificacao, ler_csv_ans
+
+# --- CADASTRO DAS OPERADORAS (Relatorio_cadop.csv) ---
+ARQUIVO_CADASTRO = "./downloads_ans/Relatorio_cadop.csv"
+# Cadastro já lido, tipado e indexado pelo Registro ANS. Pickle do Pandas: guarda tipos e índice,
+# então a Missão 2 não precisa reler nem reinterpretar o CSV quando ele não mudou.
+ARQUIVO_INSTANTANEO = "./downloads_ans/cadastro.pkl"
+# Muda quando as colunas ou as regras do índice mudam: instantâneos de outra versão são refeitos
+VERSAO_INSTANTANEO = 1
+
+def ler_cadastro_csv(caminho=ARQUIVO_CADASTRO, codificacao=None):
+    """Só as colunas usadas no join (esquema 'cadastro' do leitor_ans.py), lidas uma vez só"""
+    return ler_csv_ans(caminho, 'cadastro', formato={'codificacao': codificacao} if codificacao else None)
+
+def codigos_registro(serie):
+    """Chave inteira do Registro ANS (-1 quando não é numérico)"""
+    numeros = pd.to_numeric(serie, errors='coerce')
+    return numeros.fillna(-1).astype('int64').to_numpy()
+
+def montar_indice_cadastro(df_cadastro):
+    """Indexa a tabela pequena (cadastro) pela chave inteira do Registro ANS"""
+    cadastro = df_cadastro.rename(columns={'Razao_Social': 'RazaoSocial'})
+    cadastro = cadastro.assign(codigo=codigos_registro(cadastro['REGISTRO_OPERADORA']))
+    cadastro = cadastro[cadastro['codigo'] >= 0].drop_duplicates(subset='codigo')
+    indice = cadastro.set_index('codigo')[['CNPJ', 'RazaoSocial', 'Modalidade', 'UF']]
+    # Poucas modalidades e UFs distintas: categóricas ocupam bem menos no instantâneo
+    return indice.astype({'Modalidade': 'category', 'UF': 'category'})
+
+def assinatura(caminho):
+    """Tamanho e data de modificação: se o CSV for trocado, o instantâneo deixa de valer"""
+    info = os.stat(caminho)
+    return {'bytes': info.st_size, 'modificado_ns': info.st_mtime_ns}
+
+def salvar_instantaneo(indice, caminho_csv=ARQUIVO_CADASTRO, destino=ARQUIVO_INSTANTANEO, codificacao=None):
+    """Grava o índice do cadastro (arquivo temporário + rename: nunca fica meio instantâneo no disco)"""
+    indice.attrs = {'versao': VERSAO_INSTANTANEO, 'origem': assinatura(caminho_csv), 'codificacao': codificacao}
+    temporario = destino + ".tmp"
+    indice.to_pickle(temporario)
+    os.replace(temporario, destino)
+    return destino
+
+def carregar_instantaneo(caminho_csv=ARQUIVO_CADASTRO, origem=ARQUIVO_INSTANTANEO):
+    """Índice do cadastro gravado antes, ou None se não existir ou não corresponder mais ao CSV"""
+    if not os.path.exists(origem) or not os.path.exists(caminho_csv):
+        return None
+    try:
+        indice = pd.read_pickle(origem)
+    except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError, ValueError) as e:
+        print(f"⚠️ Instantâneo do cadastro inválido, refazendo: {e}")
+        return None
+
+    if indice.attrs.get('versao') != VERSAO_INSTANTANEO or indice.attrs.get('origem') != assinatura(caminho_csv):
+        return None
+    return indice
+
+def atualizar_instantaneo(caminho_csv=ARQUIVO_CADASTRO, codificacao=None, destino=ARQUIVO_INSTANTANEO):
+    """Lê o CSV uma vez (codificação detectada pela amostra) e grava o instantâneo"""
+    codificacao = codificacao or detectar_codificacao(caminho_csv)
+    indice = montar_indice_cadastro(ler_cadastro_csv(caminho_csv, codificacao))
+    salvar_instantaneo(indice, caminho_csv, destino, codificacao)
+    return indice
+
+def carregar_indice_cadastro(caminho_csv=ARQUIVO_CADASTRO):
+    """O cadastro para o join: do instantâneo, se estiver em dia; senão do CSV (e o instantâneo é refeito)"""
+    indice = carregar_instantaneo(caminho_csv)
+    if indice is not None:
+        return indice
+    return atualizar_instantaneo(caminho_csv)
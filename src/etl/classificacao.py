@@ -0,0 +1,83 @@
+import re
+import numpy as np
+import pandas as pd
+
+# --- CLASSIFICAÇÃO DAS CONTAS CONTÁBEIS ---
+# A categoria sai do código da conta (CD_CONTA_CONTABIL) pelo Plano de Contas Padrão da ANS.
+# Os arquivos trazem todos os níveis do plano: a conta 41 já é a soma das subcontas 411, 4111, ... 411111.
+# Só um nível entra como despesa (a conta 41); as subcontas têm categoria própria, senão o mesmo
+# dinheiro seria somado uma vez por nível da hierarquia.
+CONTAS_CATEGORIA = {
+    '41': 'EVENTOS_SINISTROS',     # Eventos Indenizáveis Líquidos / Sinistros Retidos (conta sintética)
+}
+# Demais códigos pelo prefixo, do mais específico para o mais geral
+PREFIXOS_CATEGORIA = [
+    ('41', 'EVENTOS_SINISTROS_SUBCONTAS'),   # Detalhe da conta 41 (já somado nela)
+    ('4', 'OUTRAS_DESPESAS'),
+    ('3', 'RECEITAS'),
+    ('2', 'PASSIVO'),
+    ('1', 'ATIVO'),
+]
+CATEGORIA_INDEFINIDA = 'OUTROS'
+
+# Ordem fixa: o mesmo código inteiro para a mesma categoria em todos os arquivos e blocos
+CATEGORIAS = list(CONTAS_CATEGORIA.values()) + [categoria for _, categoria in PREFIXOS_CATEGORIA] + [CATEGORIA_INDEFINIDA]
+TIPO_CATEGORIA = pd.CategoricalDtype(CATEGORIAS)
+
+# Filtro do PDF: "Despesas com Eventos/Sinistros"
+CATEGORIAS_DESPESA = ['EVENTOS_SINISTROS']
+CODIGOS_DESPESA = np.array([CATEGORIAS.index(c) for c in CATEGORIAS_DESPESA])
+
+# Fallback para linhas com o código de conta vazio ou desconhecido: o texto da descrição (mesmo termo do filtro antigo)
+TERMO_BUSCA = re.compile('EVENTOS|SINISTROS', re.IGNORECASE)
+
+# Tabelas de consulta: cada código/descrição distinto é classificado uma vez só por processo
+_mapa_contas = {}
+_mapa_descricoes = {}
+
+def categoria_da_conta(codigo):
+    """'41' -> 'EVENTOS_SINISTROS', '411111' -> 'EVENTOS_SINISTROS_SUBCONTAS'. None se o código não estiver no plano de contas."""
+    if codigo not in _mapa_contas:
+        texto = str(codigo).strip()
+        _mapa_contas[codigo] = CONTAS_CATEGORIA.get(texto) or next(
+            (cat for prefixo, cat in PREFIXOS_CATEGORIA if texto.startswith(prefixo)), None)
+    return _mapa_contas[codigo]
+
+def categoria_da_descricao(descricao):
+    if descricao not in _mapa_descricoes:
+        encontrou = TERMO_BUSCA.search(str(descricao))
+        _mapa_descricoes[descricao] = 'EVENTOS_SINISTROS' if encontrou else CATEGORIA_INDEFINIDA
+    return _mapa_descricoes[descricao]
+
+def codigos_por_valor_distinto(serie, classificar):
+    """
+    Classifica só os valores distintos da coluna e espalha o resultado pelas linhas
+    com uma indexação de array (nada de texto ou regex linha a linha).
+    Devolve o código inteiro da categoria por linha (-1 = sem categoria).
+    """
+    cat = serie if isinstance(serie.dtype, pd.CategoricalDtype) else serie.astype('category')
+
+    tabela = np.array([CATEGORIAS.index(c) if c else -1 for c in map(classificar, cat.cat.categories)] + [-1])
+    # Código -1 (valor vazio) cai na última posição da tabela, que também é -1
+    return tabela[cat.cat.codes.to_numpy()]
+
+def classificar_bloco(bloco):
+    """
+    Categoria de cada linha: pelo código da conta e, onde ele está vazio ou fora do plano, pela descrição.
+    CD_CONTA_CONTABIL é obrigatória (esquema 'demonstracoes' do leitor_ans.py).
+    """
+    codigos = codigos_por_valor_distinto(bloco['CD_CONTA_CONTABIL'], categoria_da_conta)
+
+    sem_conta = codigos < 0
+    if sem_conta.any():
+        pela_descricao = codigos_por_valor_distinto(bloco['DESCRICAO'], categoria_da_descricao)
+        codigos = np.where(sem_conta, pela_descricao, codigos)
+
+    return codigos
+
+def categorias_do_bloco(codigos):
+    return pd.Categorical.from_codes(codigos, dtype=TIPO_CATEGORIA)
+
+def mascara_despesas(codigos):
+    """Teste de pertinência em inteiros: linha é despesa de Eventos/Sinistros?"""
+    return np.isin(codigos, CODIGOS_DESPESA)
@@ -1,45 +1,163 @@
 import requests
 import os
-import pandas as pd
-import io
+import sys
 import urllib3
+from datetime import datetime
+
+# Adiciona o diretório atual ao path para importar os módulos do ETL
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+# Adiciona a raiz do projeto para importar os utilitários compartilhados (src/utils)
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from cadastro import ARQUIVO_CADASTRO, carregar_instantaneo, atualizar_instantaneo
+from leitor_ans import detectar_codificacao, detectar_formato
+from manifesto import carregar_manifesto, salvar_manifesto, cabecalhos_condicionais, hash_arquivo
+from src.utils.metricas import etapa, execucao
 
 urllib3.disable_warnings()
 
 # Configuração
 URL_CADASTRO = "https://dadosabertos.ans.gov.br/FTP/PDA/operadoras_de_plano_de_saude_ativas/Relatorio_cadop.csv"
-ARQUIVO_SAIDA = "./downloads_ans/Relatorio_cadop.csv"
-
-def baixar_cadastro():
-    print(f"Baixando dados cadastrais de: {URL_CADASTRO}...")
-    try:
-        r = requests.get(URL_CADASTRO, verify=False, timeout=60)
-        if r.status_code == 200:
-            # Salva o arquivo no disco
-            with open(ARQUIVO_SAIDA, 'wb') as f:
-                f.write(r.content)
-            print("✅ Download concluído!")
-            return True
+ARQUIVO_SAIDA = ARQUIVO_CADASTRO
+# Download em andamento (ou interrompido): só vira ARQUIVO_SAIDA quando termina
+ARQUIVO_PARCIAL = ARQUIVO_SAIDA + ".parcial"
+# Entrada do cadastro no manifesto dos downloads (downloads_ans/manifesto.json)
+CHAVE_MANIFESTO = "Relatorio_cadop"
+TAMANHO_BLOCO_DOWNLOAD = 1024 * 1024 # 1 MB por vez, direto para o disco
+
+def baixar_cadastro(url=URL_CADASTRO, sessao=None):
+    """
+    Atualiza o Relatorio_cadop.csv só quando ele mudou no servidor:
+    - GET condicional (If-None-Match / If-Modified-Since): sem mudança, o servidor responde 304 sem corpo
+    - download em blocos para um arquivo .parcial; se cair no meio, a próxima execução continua
+      de onde parou (Range), desde que o arquivo no servidor ainda seja o mesmo (If-Range)
+    - no fim, a codificação é detectada uma vez e o instantâneo tipado do cadastro é gravado (cadastro.py)
+    Retorna True se o cadastro está pronto para a Missão 2.
+    """
+    print(f"Baixando dados cadastrais de: {url}...")
+    with etapa('download', arquivo=CHAVE_MANIFESTO) as span:
+        try:
+            resultado = _baixar(url, sessao or requests.Session())
+        except requests.RequestException as e:
+            # O .parcial fica no disco: a próxima execução continua dele
+            print(f"Erro: {e}")
+            resultado = None
+        span['status'] = resultado['status'] if resultado else 'falha'
+        span['bytes'] = (resultado or {}).get('bytes', 0)
+    return resultado is not None
+
+def _baixar(url, sessao):
+    os.makedirs(os.path.dirname(ARQUIVO_SAIDA), exist_ok=True)
+    manifesto = carregar_manifesto()
+    entrada = manifesto.get(CHAVE_MANIFESTO, {})
+    parcial = entrada.get('parcial') or {}
+
+    cabecalhos = {}
+    ja_baixado = 0
+    validador = parcial.get('etag') or parcial.get('last_modified')
+    if os.path.exists(ARQUIVO_PARCIAL) and parcial.get('url') == url and validador:
+        # Continua o download interrompido. Se o arquivo mudou no servidor, o If-Range faz ele mandar tudo (200)
+        ja_baixado = os.path.getsize(ARQUIVO_PARCIAL)
+        cabecalhos = {'Range': f"bytes={ja_baixado}-", 'If-Range': validador}
+    elif entrada.get('url') == url and os.path.exists(ARQUIVO_SAIDA):
+        cabecalhos = cabecalhos_condicionais(entrada)
+
+    with sessao.get(url, headers=cabecalhos, stream=True, timeout=60, verify=False) as resp:
+        if resp.status_code == 304:
+            print("♻️ Cadastro sem mudanças no servidor.")
+            garantir_instantaneo(entrada.get('codificacao'))
+            return {'status': 'inalterado', 'bytes': 0}
+
+        if resp.status_code == 416:
+            # O .parcial não serve mais (ex: maior que o arquivo no servidor): recomeça do zero
+            os.remove(ARQUIVO_PARCIAL)
+            entrada.pop('parcial', None)
+            manifesto[CHAVE_MANIFESTO] = entrada
+            salvar_manifesto(manifesto, chaves=[CHAVE_MANIFESTO])
+            return _baixar(url, sessao)
+
+        if resp.status_code not in (200, 206):
+            print(f"❌ Erro {resp.status_code}")
+            return None
+
+        validadores = {'url': url, 'etag': resp.headers.get('ETag'), 'last_modified': resp.headers.get('Last-Modified')}
+        if resp.status_code == 206:
+            print(f"Continuando o download a partir de {ja_baixado} bytes...")
+            validadores = {**parcial, **{k: v for k, v in validadores.items() if v}}
+            modo = 'ab'
         else:
-            print(f"❌ Erro {r.status_code}")
-            return False
-    except Exception as e:
-        print(f"Erro: {e}")
-        return False
+            # Os validadores vão para o manifesto antes do corpo: é o que permite continuar se cair no meio
+            manifesto[CHAVE_MANIFESTO] = {**entrada, 'parcial': validadores}
+            salvar_manifesto(manifesto, chaves=[CHAVE_MANIFESTO])
+            ja_baixado = 0
+            modo = 'wb'
+
+        esperado = tamanho_total(resp, ja_baixado)
+        with open(ARQUIVO_PARCIAL, modo) as f:
+            for bloco in resp.iter_content(chunk_size=TAMANHO_BLOCO_DOWNLOAD):
+                f.write(bloco)
+
+    tamanho = os.path.getsize(ARQUIVO_PARCIAL)
+    if esperado is not None and tamanho != esperado:
+        print(f"⚠️ Download incompleto ({tamanho} de {esperado} bytes). Rode de novo para continuar.")
+        return None
+
+    # Servidor mandou de novo (sem suporte a GET condicional?), mas o conteúdo é o mesmo
+    sha256 = hash_arquivo(ARQUIVO_PARCIAL)
+    if sha256 == entrada.get('sha256') and os.path.exists(ARQUIVO_SAIDA):
+        os.remove(ARQUIVO_PARCIAL)
+        status = 'inalterado'
+        print("♻️ Conteúdo idêntico ao já baixado.")
+    else:
+        os.replace(ARQUIVO_PARCIAL, ARQUIVO_SAIDA)
+        status = 'novo'
+        print("✅ Download concluído!")
+
+    codificacao = entrada.get('codificacao') if status == 'inalterado' else None
+    codificacao = codificacao or detectar_codificacao(ARQUIVO_SAIDA)
+
+    manifesto[CHAVE_MANIFESTO] = {
+        **validadores,
+        'sha256': sha256,
+        'bytes': tamanho,
+        'codificacao': codificacao,
+        'baixado_em': datetime.now().isoformat(timespec='seconds'),
+    }
+    salvar_manifesto(manifesto, chaves=[CHAVE_MANIFESTO])
+
+    if status == 'novo':
+        atualizar_instantaneo(ARQUIVO_SAIDA, codificacao)
+    else:
+        garantir_instantaneo(codificacao)
+    return {'status': status, 'bytes': tamanho - ja_baixado}
+
+def tamanho_total(resp, ja_baixado):
+    """Tamanho final esperado do arquivo (None se o servidor não informar)"""
+    if resp.status_code == 206:
+        # Content-Range: bytes 1000-4999/5000
+        total = resp.headers.get('Content-Range', '').rpartition('/')[2]
+        return int(total) if total.isdigit() else None
+    tamanho = resp.headers.get('Content-Length')
+    return int(tamanho) if tamanho and tamanho.isdigit() else None
+
+def garantir_instantaneo(codificacao=None):
+    """CSV em dia, mas instantâneo ausente ou de outra versão: refaz a partir do CSV que já está no disco"""
+    if os.path.exists(ARQUIVO_SAIDA) and carregar_instantaneo(ARQUIVO_SAIDA) is None:
+        atualizar_instantaneo(ARQUIVO_SAIDA, codificacao)
 
 def analisar_colunas():
     if os.path.exists(ARQUIVO_SAIDA):
         print("\nAnalisando colunas do arquivo cadastral...")
         try:
-            # Tenta ler as primeiras 5 linhas para ver o cabeçalho
-            # CSVs da ANS costumam usar ponto e vírgula (;) e encoding latin1
-            df = pd.read_csv(ARQUIVO_SAIDA, sep=';', encoding='latin1', nrows=5)
-            print("--- Colunas encontradas ---")
-            for col in df.columns:
+            # Cabeçalho, separador e codificação vêm da amostra do começo do arquivo
+            formato = detectar_formato(ARQUIVO_SAIDA)
+            print(f"--- Colunas encontradas ({formato['codificacao']}, separador '{formato['separador']}') ---")
+            for col in formato['colunas']:
                 print(f" - {col}")
-        except Exception as e:
+        except OSError as e:
             print(f"Erro ao ler CSV: {e}")
 
 if __name__ == "__main__":
-    if baixar_cadastro():
-        analisar_colunas()
\ No newline at end of file
+    with execucao("download_cadastro"):
+        if baixar_cadastro():
+            analisar_colunas()
@@ -0,0 +1,490 @@
+import codecs
+import csv
+import io
+import os
+import re
+import sys
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+# O motor do pyarrow é opcional: sem ele, a leitura usa o motor C do Pandas
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+except ImportError:
+    pa = None
+
+# Adiciona a raiz do projeto para importar os utilitários compartilhados (src/utils)
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from src.utils.metricas import contador
+
+# --- LEITURA DOS CSVs DA ANS ---
+# Um caminho só para todo arquivo da ANS (demonstrações contábeis, cadastro de operadoras):
+# - codificação, separador e vírgula decimal descobertos pelo começo do arquivo (sem reler o arquivo inteiro)
+# - esquema explícito por tipo de arquivo: só as colunas usadas, com os tipos já definidos
+# - motor mais rápido disponível (pyarrow; senão o motor C do Pandas)
+# - linhas malformadas (ou com um inteiro do esquema vazio/inválido) vão para a quarentena (DIR_QUARENTENA)
+#   e são contadas, em vez de sumirem ou derrubarem o arquivo inteiro
+
+# --- CONFIGURAÇÕES ---
+# Motor de leitura: 'auto' (pyarrow se estiver instalado), 'pyarrow' ou 'c'
+# Ex: ETL_MOTOR_CSV=c python src/etl/main.py
+MOTOR_CSV = os.environ.get("ETL_MOTOR_CSV", "auto").lower()
+
+# Bytes lidos do começo do arquivo para descobrir o formato
+TAMANHO_AMOSTRA = 64 * 1024
+# Amostras só ASCII servem nas duas codificações: a detecção olha no máximo estas antes de ficar com UTF-8
+# (se o arquivo não for UTF-8 mais adiante, a leitura percebe e relê como latin1)
+AMOSTRAS_CODIFICACAO = 4
+# Linhas por bloco na leitura em blocos (o tamanho em bytes sai da amostra)
+TAMANHO_BLOCO = 500_000
+
+# Linhas ruins de cada arquivo lido vão para DIR_QUARENTENA/<nome>.csv, com o cabeçalho original
+DIR_QUARENTENA = "./downloads_ans/quarentena"
+
+SEPARADORES = [';', ',', '\t', '|']
+DECIMAL_VIRGULA = re.compile(r'^-?\d+,\d+$')
+DECIMAL_PONTO = re.compile(r'^-?\d+\.\d+$')
+
+# Esquema de cada tipo de arquivo da ANS: colunas lidas e tipos
+# (o arquivo bruto tem mais colunas; as outras nem são convertidas)
+ESQUEMAS = {
+    # Demonstrações contábeis trimestrais (1T2023.csv, ...)
+    'demonstracoes': {
+        'colunas': ['REG_ANS', 'DATA', 'CD_CONTA_CONTABIL', 'DESCRICAO', 'VL_SALDO_FINAL'],
+        # Tipos compactos: 'category' guarda cada texto repetido uma única vez
+        # (DATA e DESCRICAO se repetem muito; CD_CONTA_CONTABIL tem poucos códigos, ver classificacao.py).
+        # REG_ANS é lido como texto e convertido depois: linha sem registro válido vai para a quarentena
+        'tipos': {
+            'REG_ANS': 'int32',
+            'DATA': 'category',
+            'CD_CONTA_CONTABIL': 'category',
+            'DESCRICAO': 'category',
+            'VL_SALDO_FINAL': 'float64',
+        },
+    },
+    # Cadastro das operadoras ativas (Relatorio_cadop.csv): só as colunas usadas no join
+    'cadastro': {
+        'colunas': ['REGISTRO_OPERADORA', 'CNPJ', 'Razao_Social', 'Modalidade', 'UF'],
+        # Tudo texto: REGISTRO_OPERADORA e CNPJ não podem perder zeros à esquerda
+        'tipos': {
+            'REGISTRO_OPERADORA': 'str',
+            'CNPJ': 'str',
+            'Razao_Social': 'str',
+            'Modalidade': 'str',
+            'UF': 'str',
+        },
+    },
+}
+
+# Tipos inteiros (sem valor nulo): lidos como texto, ver separar_inteiros_invalidos
+TIPOS_INTEIROS = ('int32', 'int64')
+
+LINHAS_QUARENTENA = contador("etl_linhas_quarentena_total", "Linhas malformadas enviadas para a quarentena",
+                             ("esquema",))
+
+def motor_ativo(motor=None):
+    """Resolve o motor pedido (ou o configurado) e garante que ele pode ser usado"""
+    motor = (motor or MOTOR_CSV).lower()
+
+    if motor == 'auto':
+        return 'pyarrow' if pa is not None else 'c'
+    if motor not in ('pyarrow', 'c'):
+        raise ValueError(f"Motor de CSV desconhecido: {motor}. Use 'auto', 'pyarrow' ou 'c'.")
+    if motor == 'pyarrow' and pa is None:
+        raise ImportError("Motor pyarrow requer o pacote 'pyarrow' (pip install pyarrow).")
+    return motor
+
+@contextmanager
+def _abrir_binario(fonte):
+    """Caminho ou arquivo já aberto (ex: io.BytesIO de uma fatia); quem abriu é quem fecha"""
+    if hasattr(fonte, 'read'):
+        yield fonte
+        return
+    with open(fonte, 'rb') as f:
+        yield f
+
+def _ler_amostra(fonte, tamanho):
+    """Bytes do começo da fonte, sem mudar a posição de leitura"""
+    with _abrir_binario(fonte) as f:
+        inicio = f.tell()
+        amostra = f.read(tamanho)
+        f.seek(inicio)
+    return amostra
+
+def detectar_codificacao(fonte, tamanho_amostra=TAMANHO_AMOSTRA):
+    """
+    UTF-8 (com ou sem BOM) ou latin1 (arquivos antigos da ANS).
+    Decide pelo primeiro trecho com bytes fora do ASCII (acentos): trechos só ASCII servem nas duas,
+    então a leitura avança até achar um, por no máximo AMOSTRAS_CODIFICACAO trechos (sem isso, um arquivo
+    todo ASCII seria lido inteiro só para isso). Sem acento nenhum nesse começo, fica UTF-8.
+    """
+    with _abrir_binario(fonte) as f:
+        inicio = f.tell()
+        try:
+            trecho = f.read(tamanho_amostra)
+            if trecho.startswith(codecs.BOM_UTF8):
+                return 'utf-8-sig'
+
+            decodificador = codecs.getincrementaldecoder('utf-8')()
+            for amostra in range(AMOSTRAS_CODIFICACAO):
+                if amostra:
+                    trecho = f.read(tamanho_amostra)
+                if not trecho:
+                    break
+                try:
+                    # final=False: um caractere cortado no fim do trecho não conta como erro
+                    decodificador.decode(trecho, final=False)
+                except UnicodeDecodeError:
+                    return 'latin1'
+                if not trecho.isascii():
+                    break
+            return 'utf-8'
+        finally:
+            f.seek(inicio)
+
+def detectar_decimal(linhas, separador):
+    """',' se os números da amostra usam vírgula decimal (padrão da ANS), senão '.'"""
+    if separador == ',':
+        return '.'
+
+    virgulas = pontos = 0
+    for linha in linhas:
+        for campo in linha.split(separador):
+            campo = campo.strip().strip('"')
+            if DECIMAL_VIRGULA.match(campo):
+                virgulas += 1
+            elif DECIMAL_PONTO.match(campo):
+                pontos += 1
+    return ',' if virgulas > pontos else '.'
+
+def detectar_formato(fonte, tamanho_amostra=TAMANHO_AMOSTRA):
+    """Codificação, separador, decimal e colunas do arquivo, tudo a partir da amostra do começo"""
+    codificacao = detectar_codificacao(fonte, tamanho_amostra)
+    amostra = _ler_amostra(fonte, tamanho_amostra)
+
+    linhas = amostra.decode(codificacao, errors='replace').splitlines()
+    if len(amostra) == tamanho_amostra and len(linhas) > 1:
+        linhas = linhas[:-1] # A última linha da amostra pode estar cortada
+
+    cabecalho = linhas[0] if linhas else ""
+    separador = max(SEPARADORES, key=cabecalho.count)
+    return {
+        'codificacao': codificacao,
+        'separador': separador,
+        'decimal': detectar_decimal(linhas[1:], separador),
+        'cabecalho': cabecalho,
+        'colunas': [c.strip().strip('"') for c in cabecalho.split(separador)],
+        'bytes_por_linha': len(amostra) / max(len(linhas), 1),
+    }
+
+def _definicao(esquema, formato):
+    """(colunas, tipos) do esquema, conferindo se o arquivo tem todas as colunas (None = arquivo inteiro)"""
+    if esquema is None:
+        return None, None
+
+    definicao = ESQUEMAS[esquema]
+    ausentes = [c for c in definicao['colunas'] if c not in formato['colunas']]
+    if ausentes:
+        raise ValueError(f"Arquivo fora do esquema '{esquema}': faltam as colunas {ausentes}")
+    return definicao['colunas'], definicao['tipos']
+
+class Quarentena:
+    """
+    Guarda as linhas malformadas de um arquivo em DIR_QUARENTENA/<nome>.csv (com o cabeçalho original).
+    O arquivo só é criado se aparecer alguma linha ruim.
+    """
+
+    def __init__(self, nome, cabecalho, esquema=None, diretorio=None):
+        self.caminho = os.path.join(diretorio or DIR_QUARENTENA, f"{nome}.csv")
+        self.cabecalho, self.esquema = cabecalho, esquema
+        self.linhas = 0
+        self._arquivo = None
+        self._lock = threading.Lock() # O pyarrow pode chamar de outras threads
+
+        # Quarentena de uma leitura anterior do mesmo arquivo não vale mais
+        if os.path.exists(self.caminho):
+            os.remove(self.caminho)
+
+    def guardar(self, texto):
+        with self._lock:
+            if self._arquivo is None:
+                os.makedirs(os.path.dirname(self.caminho), exist_ok=True)
+                self._arquivo = open(self.caminho, 'w', encoding='utf-8')
+                self._arquivo.write(self.cabecalho + "\n")
+            self._arquivo.write(texto + "\n")
+            self.linhas += 1
+
+    def guardar_linhas(self, df, formato):
+        """Linhas já lidas (só as colunas do esquema) no layout do cabeçalho original; as outras colunas ficam vazias"""
+        texto = df.reindex(columns=formato['colunas']).to_csv(
+            sep=formato['separador'], decimal=formato['decimal'], header=False, index=False, lineterminator="\n")
+        for linha in texto.splitlines():
+            self.guardar(linha)
+
+    def reiniciar(self):
+        """Descarta o que foi guardado (o arquivo vai ser relido do começo)"""
+        with self._lock:
+            if self._arquivo is not None:
+                self._arquivo.close()
+                self._arquivo = None
+                os.remove(self.caminho)
+            self.linhas = 0
+
+    def linha_pyarrow(self, linha):
+        """invalid_row_handler do pyarrow: recebe a linha crua"""
+        self.guardar(linha.text)
+        return 'skip'
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *erro):
+        if self._arquivo is not None:
+            self._arquivo.close()
+        if self.linhas:
+            LINHAS_QUARENTENA.incrementar(self.linhas, esquema=self.esquema or "")
+            print(f"⚠️ {self.linhas} linha(s) malformada(s) ou inválida(s) separada(s) em: {self.caminho}")
+
+def _falha_utf8(erro, formato):
+    """O arquivo foi lido como UTF-8, mas tem bytes que não são UTF-8 depois da amostra"""
+    if not formato['codificacao'].startswith('utf-8'):
+        return False
+    if isinstance(erro, UnicodeDecodeError):
+        return True
+    return pa is not None and isinstance(erro, pa.ArrowInvalid) and 'invalid UTF8' in str(erro)
+
+def _reler_como_latin1(fonte, inicio, formato, quarentena):
+    """Prepara a releitura do começo: codificação latin1 e quarentena vazia"""
+    print("⚠️ O arquivo não é UTF-8 depois da amostra: relendo como latin1.")
+    formato['codificacao'] = 'latin1'
+    quarentena.reiniciar()
+    if inicio is not None:
+        fonte.seek(inicio)
+
+def _pular_linhas(blocos, quantidade):
+    """(linhas já entregues, linhas novas) de cada bloco: as 'quantidade' primeiras já foram entregues"""
+    for bloco in blocos:
+        corte = min(quantidade, len(bloco))
+        quantidade -= corte
+        yield bloco.iloc[:corte], bloco.iloc[corte:].reset_index(drop=True)
+
+def _nome_fonte(fonte):
+    if isinstance(fonte, (str, os.PathLike)):
+        return os.path.splitext(os.path.basename(fonte))[0]
+    return "dados"
+
+def _tipos_leitura(tipos):
+    """Tipos passados ao motor: as colunas inteiras vêm como texto (um valor vazio ou não numérico
+    derrubaria a leitura do arquivo inteiro nos dois motores)"""
+    if not tipos:
+        return tipos
+    return {coluna: 'str' if tipo in TIPOS_INTEIROS else tipo for coluna, tipo in tipos.items()}
+
+def _tipos_arrow(tipos):
+    """Tipos do esquema no pyarrow: 'category' vira dicionário (vira Categorical no Pandas)"""
+    conversao = {
+        'int32': pa.int32(),
+        'int64': pa.int64(),
+        'float64': pa.float64(),
+        'str': pa.string(),
+        'category': pa.dictionary(pa.int32(), pa.string()),
+    }
+    return {coluna: conversao[tipo] for coluna, tipo in (tipos or {}).items()}
+
+def _opcoes_pyarrow(formato, colunas, tipos, quarentena, bytes_bloco=None):
+    # O pyarrow já pula o BOM sozinho; latin1 é convertido para UTF-8 durante a leitura
+    codificacao = 'utf8' if formato['codificacao'].startswith('utf-8') else formato['codificacao']
+    leitura = pa_csv.ReadOptions(encoding=codificacao, **({'block_size': bytes_bloco} if bytes_bloco else {}))
+    separacao = pa_csv.ParseOptions(delimiter=formato['separador'], invalid_row_handler=quarentena.linha_pyarrow)
+    conversao = pa_csv.ConvertOptions(
+        include_columns=colunas or [],
+        column_types=_tipos_arrow(_tipos_leitura(tipos)),
+        decimal_point=formato['decimal'],
+        strings_can_be_null=True, # Campo vazio vira NaN, como no Pandas
+    )
+    return {'read_options': leitura, 'parse_options': separacao, 'convert_options': conversao}
+
+def _opcoes_pandas(formato, colunas, tipos):
+    return {
+        'sep': formato['separador'],
+        'encoding': formato['codificacao'],
+        'decimal': formato['decimal'],
+        'usecols': colunas,
+        'dtype': _tipos_leitura(tipos),
+    }
+
+def separar_malformadas(trecho, formato, quarentena):
+    """
+    Tira do trecho (linhas inteiras, sem o cabeçalho) as linhas com número de campos diferente
+    do cabeçalho e manda para a quarentena. O motor C do Pandas não serve para isso: com usecols,
+    ele aceita calado as linhas com campos a mais.
+    Os separadores são contados por linha no NumPy; só as linhas suspeitas (poucas) passam pelo
+    módulo csv, que respeita aspas (um ';' dentro de "..." não é separador).
+    """
+    dados = np.frombuffer(trecho, dtype=np.uint8)
+    fins = np.flatnonzero(dados == ord('\n'))
+    if not len(fins) or fins[-1] != len(dados) - 1:
+        fins = np.append(fins, len(dados)) # Última linha sem quebra no fim do arquivo
+    inicios = np.concatenate(([0], fins[:-1] + 1))
+
+    separadores = np.flatnonzero(dados == ord(formato['separador']))
+    por_linha = np.diff(np.searchsorted(separadores, fins), prepend=0)
+    esperados = len(formato['colunas']) - 1
+    # Linhas vazias (ou só '\r') o Pandas já pula
+    suspeitas = np.flatnonzero((por_linha != esperados) & (fins - inicios > 1))
+    if not len(suspeitas):
+        return trecho
+
+    pedacos, anterior = [], 0
+    for linha in suspeitas.tolist():
+        inicio, fim = int(inicios[linha]), int(fins[linha])
+        texto = trecho[inicio:fim].decode(formato['codificacao'], errors='replace').rstrip('\r')
+        campos = next(csv.reader([texto], delimiter=formato['separador']), [])
+        if len(campos) == esperados + 1:
+            continue # Separador entre aspas: a linha está certa
+        quarentena.guardar(texto)
+        pedacos.append(trecho[anterior:inicio])
+        anterior = fim + 1
+    pedacos.append(trecho[anterior:])
+    return b"".join(pedacos)
+
+def separar_inteiros_invalidos(df, tipos, quarentena, formato):
+    """
+    Converte as colunas inteiras do esquema (lidas como texto). Linhas com valor vazio, não numérico,
+    fracionário ou fora do tipo vão para a quarentena e saem do bloco.
+    """
+    inteiras = [coluna for coluna, tipo in (tipos or {}).items() if tipo in TIPOS_INTEIROS]
+    if not inteiras or not len(df):
+        return df
+
+    valores = {coluna: pd.to_numeric(df[coluna], errors='coerce') for coluna in inteiras}
+    invalidas = np.zeros(len(df), dtype=bool)
+    for coluna in inteiras:
+        limites = np.iinfo(tipos[coluna])
+        numeros = valores[coluna].to_numpy(dtype='float64', na_value=np.nan)
+        # NaN falha em todas as comparações: conta como inválido pelo 'not'
+        invalidas |= ~((numeros % 1 == 0) & (numeros >= limites.min) & (numeros <= limites.max))
+
+    if invalidas.any():
+        quarentena.guardar_linhas(df[invalidas], formato)
+        validas = ~invalidas
+        df = df[validas].reset_index(drop=True)
+        valores = {coluna: serie[validas].reset_index(drop=True) for coluna, serie in valores.items()}
+    else:
+        df = df.copy()
+    for coluna in inteiras:
+        df[coluna] = valores[coluna].astype(tipos[coluna])
+    return df
+
+def _padronizar(df, colunas, tipos, quarentena, formato):
+    """Mesmas colunas, na ordem do esquema, e mesmos tipos nos dois motores"""
+    if colunas:
+        df = df[colunas]
+    df = separar_inteiros_invalidos(df, tipos, quarentena, formato)
+    for coluna, tipo in (tipos or {}).items():
+        if tipo == 'category' and isinstance(df[coluna].dtype, pd.CategoricalDtype):
+            # O pyarrow guarda as categorias na ordem em que aparecem; o Pandas, em ordem alfabética
+            df[coluna] = df[coluna].cat.reorder_categories(sorted(df[coluna].cat.categories))
+    return df.astype(tipos) if tipos else df
+
+def _blocos_pyarrow(fonte, formato, colunas, tipos, quarentena, bytes_bloco):
+    with _abrir_binario(fonte) as f:
+        leitor = pa_csv.open_csv(f, **_opcoes_pyarrow(formato, colunas, tipos, quarentena, bytes_bloco))
+        for lote in leitor:
+            if lote.num_rows:
+                yield lote.to_pandas()
+
+def _blocos_pandas(fonte, formato, colunas, tipos, quarentena, bytes_bloco=None):
+    """Trechos de linhas inteiras (bytes_bloco=None: o arquivo todo de uma vez) lidos pelo motor C"""
+    opcoes = _opcoes_pandas(formato, colunas, tipos)
+    with _abrir_binario(fonte) as f:
+        cabecalho = f.readline()
+        while True:
+            trecho = f.read(bytes_bloco or -1)
+            if not trecho:
+                return
+            trecho += f.readline() # Completa a última linha do trecho
+            trecho = separar_malformadas(trecho, formato, quarentena)
+            yield pd.read_csv(io.BytesIO(cabecalho + trecho), engine='c', **opcoes)
+
+def ler_csv_ans_em_blocos(fonte, esquema, tamanho_bloco=TAMANHO_BLOCO, formato=None, nome=None,
+                          resumo=None, motor=None):
+    """
+    Lê um CSV da ANS entregando um bloco (DataFrame) por vez, com as colunas e tipos do esquema.
+    - fonte: caminho ou arquivo binário já aberto (ex: io.BytesIO de uma fatia do arquivo)
+    - esquema: chave de ESQUEMAS (None = todas as colunas, tipos adivinhados; só para exploração)
+    - formato: o que já se sabe do arquivo (ex: {'codificacao': 'latin1'}); o resto é detectado
+    - nome: nome do arquivo de quarentena (padrão: o nome do arquivo lido)
+    - resumo: dicionário preenchido no fim com o motor, o formato detectado e as linhas em quarentena
+    Se o arquivo deixar de ser UTF-8 depois da amostra, ele é relido como latin1 a partir do começo,
+    pulando as linhas que já foram entregues.
+    """
+    formato = {**detectar_formato(fonte), **(formato or {})}
+    colunas, tipos = _definicao(esquema, formato)
+    motor = motor_ativo(motor)
+    # Blocos medidos em bytes (os dois motores leem assim): linhas pedidas x tamanho médio da linha
+    bytes_bloco = max(int(tamanho_bloco * formato['bytes_por_linha']), 1024 * 1024)
+    ler_blocos = _blocos_pyarrow if motor == 'pyarrow' else _blocos_pandas
+    inicio = fonte.tell() if hasattr(fonte, 'read') else None
+
+    quarentena = Quarentena(nome or _nome_fonte(fonte), formato['cabecalho'], esquema)
+    entregues = 0
+    try:
+        with quarentena:
+            try:
+                for bloco in ler_blocos(fonte, formato, colunas, tipos, quarentena, bytes_bloco):
+                    entregues += len(bloco)
+                    yield _padronizar(bloco, colunas, tipos, quarentena, formato)
+            except Exception as e:
+                if not _falha_utf8(e, formato):
+                    raise
+                _reler_como_latin1(fonte, inicio, formato, quarentena)
+                blocos = ler_blocos(fonte, formato, colunas, tipos, quarentena, bytes_bloco)
+                for ja_entregues, bloco in _pular_linhas(blocos, entregues):
+                    # A quarentena foi reiniciada: as linhas já entregues voltam a passar pela conferência
+                    separar_inteiros_invalidos(ja_entregues[colunas] if colunas else ja_entregues, tipos,
+                                               quarentena, formato)
+                    if len(bloco):
+                        yield _padronizar(bloco, colunas, tipos, quarentena, formato)
+    finally:
+        if resumo is not None:
+            resumo.update(motor=motor, codificacao=formato['codificacao'], separador=formato['separador'],
+                          decimal=formato['decimal'], quarentena=quarentena.linhas)
+
+def ler_csv_ans(fonte, esquema, formato=None, nome=None, resumo=None, motor=None):
+    """Mesma coisa que ler_csv_ans_em_blocos, mas devolve o arquivo inteiro em um DataFrame"""
+    formato = {**detectar_formato(fonte), **(formato or {})}
+    colunas, tipos = _definicao(esquema, formato)
+    motor = motor_ativo(motor)
+    inicio = fonte.tell() if hasattr(fonte, 'read') else None
+
+    def ler(f):
+        if motor == 'pyarrow':
+            # Arquivo inteiro de uma vez: o pyarrow lê os blocos em várias threads
+            return pa_csv.read_csv(f, **_opcoes_pyarrow(formato, colunas, tipos, quarentena)).to_pandas()
+        blocos = list(_blocos_pandas(f, formato, colunas, tipos, quarentena))
+        return blocos[0] if blocos else pd.DataFrame(columns=colunas or formato['colunas'])
+
+    quarentena = Quarentena(nome or _nome_fonte(fonte), formato['cabecalho'], esquema)
+    try:
+        with quarentena:
+            try:
+                with _abrir_binario(fonte) as f:
+                    df = ler(f)
+            except Exception as e:
+                # A amostra era UTF-8 válido, mas o resto do arquivo não
+                if not _falha_utf8(e, formato):
+                    raise
+                _reler_como_latin1(fonte, inicio, formato, quarentena)
+                with _abrir_binario(fonte) as f:
+                    df = ler(f)
+            return _padronizar(df, colunas, tipos, quarentena, formato)
+    finally:
+        if resumo is not None:
+            resumo.update(motor=motor, codificacao=formato['codificacao'], separador=formato['separador'],
+                          decimal=formato['decimal'], quarentena=quarentena.linhas)
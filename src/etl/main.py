@@ -1,15 +1,26 @@
 import os # "diretório". Uso para manipular caminhos de arquivos e pastas
-import pandas as pd # "planilhas". Uso para manipular dados tabulares
+import hashlib # "impressão digital". Identifica o conteúdo do ZIP baixado
 import sys # "sistema". Uso para manipular o path de importação
 import requests # "navegador" do código. Acessa sites. Uso para bater na porta do site e pedir o arquivo
-import zipfile # "tesouras". Ao inves de salvar arquivo .zip no disco, abre diretamente na ram
-import io # "tesouras". Ao inves de salvar arquivo .zip no disco, abre diretamente na ram
+import zipfile # "tesouras". Abre o .zip salvo no disco e extrai o CSV
 import urllib3 # <--- Mudança aqui: Importação direta e limpa
+from concurrent.futures import ThreadPoolExecutor, as_completed # "equipe". Vários downloads ao mesmo tempo
+from requests.adapters import HTTPAdapter # "pool". Reaproveita conexões entre os downloads
 
 # Adiciona o diretório atual ao path para conseguir importar o outro arquivo
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+# Adiciona a raiz do projeto para importar os utilitários compartilhados (src/utils)
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
 
-from transformacao import processar_arquivo
+from transformacao import VERSAO_SAIDA, processar_arquivo
+from paralelo import (PROCESSOS_TRANSFORMACAO, modo_multiprocesso, criar_pool, despachar_trimestre,
+                      concluir_trimestre, apagar_fatias)
+from manifesto import (DIR_CACHE, DIR_PROCESSADOS, carregar_manifesto, salvar_manifesto,
+                       caminho_no_cache, cabecalhos_condicionais, trimestre_em_dia,
+                       registrar_trimestre)
+from src.utils.armazenamento import (FORMATO, PARTICOES_DESPESAS, salvar_tabela, salvar_tabela_em_blocos,
+                                     ler_tabela, existe_tabela)
+from src.utils.metricas import etapa, execucao
 
 # --- CONFIGURAÇÃO DE SSL ---
 # Desabilita o aviso de "InsecureRequestWarning" de forma limpa
@@ -18,7 +29,11 @@ urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 # --- CONFIGURAÇÕES DO PROJETO ---
 BASE_URL = "https://dadosabertos.ans.gov.br/FTP/PDA/demonstracoes_contabeis/"
 DIR_TEMP = "./downloads_ans"
-ARQUIVO_FINAL = "consolidado_despesas.csv"
+ARQUIVO_FINAL = "consolidado_despesas" # extensão (.csv ou .parquet) vem de ETL_FORMATO
+
+# Downloads concorrentes: poucos workers bastam, o gargalo é a espera da rede
+MAX_DOWNLOADS_PARALELOS = 4
+TAMANHO_BLOCO_DOWNLOAD = 1024 * 1024 # 1 MB por vez (o ZIP nunca fica inteiro na RAM)
 
 # Lista dos trimestres que queremos
 TRIMESTRES_ALVO = [
@@ -27,94 +42,289 @@ TRIMESTRES_ALVO = [
     ("2023", "1T2023")
 ]
 
-def baixar_arquivo(ano, trimestre):
-    """Baixa o ZIP e retorna o caminho do arquivo extraído de interesse"""
+def criar_sessao():
+    """Cria uma sessão HTTP com pool de conexões compartilhado pelos downloads"""
+    sessao = requests.Session()
+    sessao.verify = False # verify=False ignora verificação SSL
+    adaptador = HTTPAdapter(pool_connections=MAX_DOWNLOADS_PARALELOS, pool_maxsize=MAX_DOWNLOADS_PARALELOS)
+    sessao.mount("https://", adaptador)
+    sessao.mount("http://", adaptador)
+    return sessao
+
+def localizar_csv(pasta, trimestre):
+    """Procura o CSV de interesse dentro da pasta extraída do trimestre"""
+    csvs = [f for f in os.listdir(pasta) if f.lower().endswith('.csv')]
+    
+    for f in csvs:
+        # Procura arquivo que tenha o nome do trimestre
+        if trimestre.upper() in f.upper():
+            return os.path.join(pasta, f)
+    
+    # Fallback: pega o primeiro CSV que encontrar se o nome não bater
+    if csvs:
+        return os.path.join(pasta, csvs[0])
+    return None
+
+def baixar_arquivo(ano, trimestre, sessao=None, anterior=None):
+    """
+    Baixa o ZIP em blocos para o cache e extrai o CSV de interesse.
+    Retorna um dicionário com os dados do download ('status' novo ou inalterado) ou None se falhar.
+    """
+    with etapa('download', trimestre=trimestre) as span:
+        download = _baixar_e_extrair(ano, trimestre, sessao, anterior)
+        span['status'] = download['status'] if download else 'falha'
+        span['bytes'] = (download or {}).get('bytes', 0)
+    return download
+
+def _baixar_e_extrair(ano, trimestre, sessao=None, anterior=None):
+    sessao = sessao or criar_sessao()
+    anterior = anterior or {}
     variacoes_nome = [f"{trimestre.upper()}.zip", f"{trimestre.lower()}.zip"]
     
+    os.makedirs(DIR_CACHE, exist_ok=True)
+    caminho_parcial = os.path.join(DIR_CACHE, f"{trimestre}.parcial")
+    
     for nome_arquivo in variacoes_nome:
         url = f"{BASE_URL}{ano}/{nome_arquivo}"
         print(f"[{trimestre}] Baixando de: {url}...")
         
+        # GET condicional: se nada mudou desde a última vez, o servidor responde 304 sem corpo
+        cabecalhos = {}
+        if anterior.get('url') == url and trimestre_em_dia(anterior):
+            cabecalhos = cabecalhos_condicionais(anterior)
+        
         try:
-            # verify=False ignora verificação SSL
-            resp = requests.get(url, verify=False, timeout=120) # Aumentei timeout para 120s
-            if resp.status_code == 200:
-                os.makedirs(DIR_TEMP, exist_ok=True)
-                with zipfile.ZipFile(io.BytesIO(resp.content)) as z:
-                    z.extractall(DIR_TEMP)
+            # stream=True: o corpo vem aos poucos, gravado direto no disco
+            with sessao.get(url, timeout=120, stream=True, headers=cabecalhos) as resp: # Aumentei timeout para 120s
+                if resp.status_code == 304:
+                    print(f"[{trimestre}] ♻️ Sem mudanças no servidor, usando o cache.")
+                    return {**anterior, 'status': 'inalterado'}
+                
+                if resp.status_code != 200:
+                    if resp.status_code != 404:
+                        print(f"Erro {resp.status_code}")
+                    continue
                 
-                # Procura o CSV extraído
-                for f in os.listdir(DIR_TEMP):
-                    # Procura arquivo que tenha o nome do trimestre ou 'despesa'
-                    if f.endswith('.csv') and (trimestre.upper() in f.upper() or trimestre.lower() in f.lower()):
-                        return os.path.join(DIR_TEMP, f)
+                # O hash é calculado durante o próprio download (sem reler o arquivo)
+                h = hashlib.sha256()
+                with open(caminho_parcial, 'wb') as f:
+                    for bloco in resp.iter_content(chunk_size=TAMANHO_BLOCO_DOWNLOAD):
+                        f.write(bloco)
+                        h.update(bloco)
                 
-                # Fallback: pega o primeiro CSV que encontrar se o nome não bater
-                csvs = [f for f in os.listdir(DIR_TEMP) if f.endswith('.csv')]
-                if csvs:
-                    return os.path.join(DIR_TEMP, csvs[0])
-                    
-            elif resp.status_code != 404:
-                print(f"Erro {resp.status_code}")
+                info = {
+                    'url': url,
+                    'etag': resp.headers.get('ETag'),
+                    'last_modified': resp.headers.get('Last-Modified'),
+                    'sha256': h.hexdigest(),
+                    'bytes': os.path.getsize(caminho_parcial),
+                }
+            
+            info['zip'] = caminho_no_cache(info['sha256'])
+            
+            # Servidor mandou de novo, mas o conteúdo é o mesmo que já processamos
+            if info['sha256'] == anterior.get('sha256') and trimestre_em_dia(anterior):
+                os.remove(caminho_parcial)
+                print(f"[{trimestre}] ♻️ Conteúdo idêntico ao já processado, pulando.")
+                return {**anterior, **info, 'status': 'inalterado'}
+            
+            os.replace(caminho_parcial, info['zip'])
+            
+            # Cada trimestre extrai na sua própria pasta, assim downloads paralelos não se misturam
+            # O zipfile descompacta membro a membro para o disco
+            pasta_trimestre = os.path.join(DIR_TEMP, trimestre)
+            with zipfile.ZipFile(info['zip']) as z:
+                z.extractall(pasta_trimestre)
+            
+            return {**info, 'status': 'novo', 'csv': localizar_csv(pasta_trimestre, trimestre)}
                 
         except Exception as e:
             print(f"Erro de conexão no download: {e}")
             
     return None
 
-def executar_pipeline():
-    print("--- INICIANDO PIPELINE DE ETL ---")
-    lista_dfs = []
-    
-    for ano, tri in TRIMESTRES_ALVO:
-        # 1. DOWNLOAD
-        caminho_csv = baixar_arquivo(ano, tri)
+def transformar_trimestre(tri, caminho_csv):
+    """Transforma o CSV de um trimestre já baixado e devolve o DataFrame limpo"""
+    print(f"[{tri}] Processando dados (isso pode demorar)...")
+    with etapa('transformacao', trimestre=tri) as span:
+        df_trimestre = processar_arquivo(caminho_csv, trimestre=tri)
+        
+        if df_trimestre is None:
+            print(f"[{tri}] ❌ Falha na transformação.")
+            span['status'] = 'falha'
+            return None
+        
+        linhas_antes = len(df_trimestre)
         
-        if caminho_csv:
-            # 2. TRANSFORMAÇÃO
-            print(f"[{tri}] Processando dados (isso pode demorar)...")
-            df_trimestre = processar_arquivo(caminho_csv)
+        # Limpeza Extra: Remove valores zerados
+        df_trimestre = df_trimestre[df_trimestre['Valor'] != 0.0]
+        
+        linhas_depois = len(df_trimestre)
+        span['linhas'] = linhas_depois
+        print(f"[{tri}] ✅ Sucesso! {linhas_depois} registros úteis (removidos {linhas_antes - linhas_depois} zerados).")
+    
+    # Remove o arquivo temporário CSV para limpar a pasta
+    try:
+        os.remove(caminho_csv)
+    except OSError as e:
+        print(f"[{tri}] ⚠️ Não foi possível remover o CSV temporário: {e}")
+    
+    return df_trimestre
+
+def destino_trimestre(tri):
+    os.makedirs(DIR_PROCESSADOS, exist_ok=True)
+    return os.path.join(DIR_PROCESSADOS, tri)
+
+def salvar_trimestre(tri, df_trimestre):
+    """Grava a saída transformada do trimestre para ser reaproveitada nas próximas execuções"""
+    return salvar_tabela(df_trimestre, destino_trimestre(tri), particoes=PARTICOES_DESPESAS)
+
+def ler_trimestre(entrada):
+    """Lê a saída guardada de um trimestre no formato em que ela foi gravada"""
+    formato = entrada.get('formato', 'csv')
+    return ler_tabela(os.path.splitext(entrada['saida'])[0], formato=formato)
+
+# Chaves dos trimestres no manifesto (o cadastro tem a sua própria, ver download_cadastro.py)
+CHAVES_TRIMESTRES = [tri for _, tri in TRIMESTRES_ALVO]
+
+def atualizar_trimestres():
+    """
+    1. DOWNLOAD (em paralelo) + 2. TRANSFORMAÇÃO (assim que cada trimestre chega).
+    Devolve (manifesto, resultados, houve_mudanca): 'resultados' são os trimestres
+    transformados nesta execução que ainda estão na memória (trimestre -> DataFrame).
+    """
+    manifesto = carregar_manifesto()
+    resultados = {}
+    houve_mudanca = False
+    
+    # Modo multiprocesso (ETL_PROCESSOS > 1): a transformação sai do processo principal.
+    # Cada CSV é dividido em fatias, cada worker grava a sua saída no disco e aqui só juntamos.
+    pool = criar_pool() if modo_multiprocesso() else None
+    pendentes = {} # trimestre -> (download, futuros das fatias)
+    
+    def registrar(tri, download, saida, linhas):
+        registrar_trimestre(
+            manifesto, tri,
+            url=download['url'], etag=download['etag'], last_modified=download['last_modified'],
+            sha256=download['sha256'], zip=download['zip'],
+            saida=saida, formato=FORMATO, linhas=linhas, versao_saida=VERSAO_SAIDA,
+        )
+        # Salva a cada trimestre: se cair no meio, o que já foi feito não se perde
+        salvar_manifesto(manifesto, chaves=[tri])
+    
+    try:
+        # Enquanto um trimestre é transformado aqui, os outros continuam baixando nas threads
+        with criar_sessao() as sessao, ThreadPoolExecutor(max_workers=MAX_DOWNLOADS_PARALELOS) as executor:
+            futuros = {
+                executor.submit(baixar_arquivo, ano, tri, sessao, manifesto.get(tri)): tri
+                for ano, tri in TRIMESTRES_ALVO
+            }
             
-            if df_trimestre is not None:
-                linhas_antes = len(df_trimestre)
+            for futuro in as_completed(futuros):
+                tri = futuros[futuro]
+                download = futuro.result()
                 
-                # Limpeza Extra: Remove valores zerados
-                df_trimestre = df_trimestre[df_trimestre['Valor'] != 0.0]
+                if not download:
+                    print(f"[{tri}] ❌ Falha no download.")
+                    continue
                 
-                linhas_depois = len(df_trimestre)
-                print(f"[{tri}] ✅ Sucesso! {linhas_depois} registros úteis (removidos {linhas_antes - linhas_depois} zerados).")
+                if download['status'] == 'inalterado':
+                    # Só atualiza ETag/Last-Modified; a saída do trimestre continua valendo
+                    manifesto[tri].update({k: download[k] for k in ('url', 'etag', 'last_modified') if download.get(k)})
+                    continue
                 
-                lista_dfs.append(df_trimestre)
+                if not download.get('csv'):
+                    print(f"[{tri}] ❌ Nenhum CSV encontrado no ZIP.")
+                    continue
                 
-                # Remove o arquivo temporário CSV para limpar a pasta
-                try:
-                    os.remove(caminho_csv)
-                except:
-                    pass
-            else:
-                print(f"[{tri}] ❌ Falha na transformação.")
-        else:
-            print(f"[{tri}] ❌ Falha no download.")
-
-    # 3. CONSOLIDAÇÃO
-    if lista_dfs:
-        print("\nConsolidando todos os trimestres...")
-        df_final = pd.concat(lista_dfs, ignore_index=True)
-        
-        print(f"Total de registros processados: {len(df_final)}")
-        
-        # Salvando CSV
-        df_final.to_csv(ARQUIVO_FINAL, index=False, sep=';', encoding='utf-8')
-        print(f"✅ Arquivo CSV gerado: {ARQUIVO_FINAL}")
+                if pool is not None:
+                    # Só despacha: os workers começam enquanto os outros downloads continuam
+                    print(f"[{tri}] Enviando para {PROCESSOS_TRANSFORMACAO} processos...")
+                    pendentes[tri] = (download, despachar_trimestre(pool, download['csv'], destino_trimestre(tri),
+                                                                    trimestre=tri))
+                    continue
+                
+                df_trimestre = transformar_trimestre(tri, download['csv'])
+                if df_trimestre is None:
+                    continue
+                
+                registrar(tri, download, salvar_trimestre(tri, df_trimestre), len(df_trimestre))
+                resultados[tri] = df_trimestre
+                houve_mudanca = True
         
-        # Salvando ZIP
-        nome_zip = ARQUIVO_FINAL.replace('.csv', '.zip')
+        # Modo multiprocesso: espera as fatias de cada trimestre e junta as saídas
+        for tri, (download, futuros_fatias) in pendentes.items():
+            try:
+                saida, linhas = concluir_trimestre(tri, futuros_fatias, destino_trimestre(tri))
+            except Exception as e:
+                print(f"[{tri}] ❌ Falha na transformação: {e}")
+                continue
+            
+            os.remove(download['csv'])
+            registrar(tri, download, saida, linhas)
+            houve_mudanca = True
+    finally:
+        if pool is not None:
+            # Sempre encerra os workers, mesmo com erro no meio do caminho. Fatias que sobraram de
+            # trimestres não concluídos vão para o lixo (nos concluídos elas já viraram a saída final).
+            pool.shutdown(cancel_futures=True)
+            for tri in pendentes:
+                apagar_fatias(destino_trimestre(tri))
+    
+    salvar_manifesto(manifesto, chaves=CHAVES_TRIMESTRES)
+    return manifesto, resultados, houve_mudanca
+
+def trimestres_disponiveis(manifesto, resultados):
+    """Trimestres com dados (na memória ou na saída guardada), na ordem de TRIMESTRES_ALVO"""
+    return [tri for tri in CHAVES_TRIMESTRES if tri in resultados or trimestre_em_dia(manifesto.get(tri))]
+
+def trimestres_em_ordem(manifesto, resultados):
+    """
+    Um DataFrame por trimestre, na ordem de TRIMESTRES_ALVO (independente de quem terminou primeiro).
+    Trimestres que não estão na memória (sem mudança ou feitos pelos workers) vêm da saída guardada.
+    """
+    for tri in trimestres_disponiveis(manifesto, resultados):
+        yield resultados[tri] if tri in resultados else ler_trimestre(manifesto[tri])
+
+def consolidar(manifesto, resultados):
+    """
+    3. CONSOLIDAÇÃO (um trimestre por vez: a tabela final não precisa caber inteira na memória).
+    Devolve o caminho gerado, ou None se nenhum trimestre tem dados.
+    """
+    if not trimestres_disponiveis(manifesto, resultados):
+        print("❌ Nenhum dado foi processado com sucesso.")
+        return None
+    
+    print("\nConsolidando todos os trimestres...")
+    
+    # Salvando CSV (ou Parquet particionado por Ano/Trimestre)
+    with etapa('consolidacao') as span:
+        caminho_final, total = salvar_tabela_em_blocos(trimestres_em_ordem(manifesto, resultados), ARQUIVO_FINAL,
+                                                       particoes=PARTICOES_DESPESAS)
+        span['linhas'] = total
+    print(f"Total de registros processados: {total}")
+    print(f"✅ Arquivo gerado: {caminho_final}")
+    
+    # Salvando ZIP (só faz sentido para o CSV, o Parquet já é comprimido)
+    if caminho_final.endswith('.csv'):
+        nome_zip = caminho_final.replace('.csv', '.zip')
         with zipfile.ZipFile(nome_zip, 'w', zipfile.ZIP_DEFLATED) as z:
-            z.write(ARQUIVO_FINAL)
+            z.write(caminho_final)
         print(f"✅ Arquivo ZIP gerado: {nome_zip}")
-        
-    else:
-        print("❌ Nenhum dado foi processado com sucesso.")
+    
+    return caminho_final
+
+def executar_pipeline():
+    print("--- INICIANDO PIPELINE DE ETL ---")
+    manifesto, resultados, houve_mudanca = atualizar_trimestres()
+    
+    if not houve_mudanca and existe_tabela(ARQUIVO_FINAL):
+        print(f"\n♻️ Nenhum trimestre novo ou alterado. '{ARQUIVO_FINAL}' continua atualizado.")
+        return
+    
+    consolidar(manifesto, resultados)
 
 if __name__ == "__main__":
-    executar_pipeline()
\ No newline at end of file
+    # Tempos, linhas e memória de cada etapa vão para um relatório JSON (src/utils/metricas.py)
+    with execucao("pipeline"):
+        executar_pipeline()
\ No newline at end of file
@@ -0,0 +1,94 @@
+import hashlib
+import json
+import os
+import threading
+from datetime import datetime
+
+from transformacao import VERSAO_SAIDA
+
+# --- CONFIGURAÇÕES DO CACHE ---
+# ZIPs baixados ficam guardados pelo hash do conteúdo (sha256.zip)
+DIR_CACHE = "./downloads_ans/cache"
+# Saída já transformada de cada trimestre (uma por trimestre)
+DIR_PROCESSADOS = "./downloads_ans/processados"
+# Registro do que já foi baixado/transformado em execuções anteriores
+ARQUIVO_MANIFESTO = "./downloads_ans/manifesto.json"
+
+# Trimestres e cadastro podem ser baixados ao mesmo tempo (orquestrador.py): um grava por vez
+_lock_manifesto = threading.Lock()
+
+def carregar_manifesto():
+    """Lê o manifesto do disco. Se não existir (primeira execução), começa vazio."""
+    if not os.path.exists(ARQUIVO_MANIFESTO):
+        return {}
+
+    try:
+        with open(ARQUIVO_MANIFESTO, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        # Manifesto corrompido: reprocessa tudo em vez de confiar nele
+        print(f"⚠️ Manifesto inválido, ignorando: {e}")
+        return {}
+
+def salvar_manifesto(manifesto, chaves=None):
+    """
+    Grava o manifesto de forma atômica (arquivo temporário + rename).
+    Com 'chaves', só essas entradas são trocadas no manifesto que está no disco:
+    quem baixa os trimestres não apaga o que outra thread gravou do cadastro (e vice-versa).
+    """
+    os.makedirs(os.path.dirname(ARQUIVO_MANIFESTO), exist_ok=True)
+    temporario = ARQUIVO_MANIFESTO + ".tmp"
+
+    with _lock_manifesto:
+        if chaves is not None:
+            manifesto = {**carregar_manifesto(), **{k: manifesto[k] for k in chaves if k in manifesto}}
+
+        with open(temporario, 'w', encoding='utf-8') as f:
+            json.dump(manifesto, f, ensure_ascii=False, indent=2)
+
+        os.replace(temporario, ARQUIVO_MANIFESTO)
+
+def caminho_no_cache(sha256):
+    """Caminho do ZIP dentro do cache endereçado por conteúdo"""
+    return os.path.join(DIR_CACHE, f"{sha256}.zip")
+
+def hash_arquivo(caminho, tamanho_bloco=1024 * 1024):
+    """Calcula o sha256 de um arquivo lendo em blocos"""
+    h = hashlib.sha256()
+    with open(caminho, 'rb') as f:
+        for bloco in iter(lambda: f.read(tamanho_bloco), b''):
+            h.update(bloco)
+    return h.hexdigest()
+
+def cabecalhos_condicionais(entrada):
+    """Monta If-None-Match / If-Modified-Since a partir do que o servidor respondeu da última vez"""
+    cabecalhos = {}
+    if not entrada:
+        return cabecalhos
+
+    if entrada.get('etag'):
+        cabecalhos['If-None-Match'] = entrada['etag']
+    if entrada.get('last_modified'):
+        cabecalhos['If-Modified-Since'] = entrada['last_modified']
+    return cabecalhos
+
+def trimestre_em_dia(entrada):
+    """
+    O trimestre só pode ser pulado se a saída transformada ainda existir no disco
+    e tiver sido gerada pela versão atual da transformação (mesmas colunas e regras)
+    """
+    return (bool(entrada) and os.path.exists(entrada.get('saida', ''))
+            and entrada.get('versao_saida', 1) == VERSAO_SAIDA)
+
+def registrar_trimestre(manifesto, trimestre, **dados):
+    """Atualiza a entrada do trimestre no manifesto e remove o ZIP antigo do cache"""
+    anterior = manifesto.get(trimestre, {})
+    zip_antigo = anterior.get('zip')
+
+    entrada = {**anterior, **dados, 'processado_em': datetime.now().isoformat(timespec='seconds')}
+    manifesto[trimestre] = entrada
+
+    if zip_antigo and zip_antigo != entrada.get('zip') and os.path.exists(zip_antigo):
+        os.remove(zip_antigo)
+
+    return entrada
@@ -2,75 +2,160 @@ import pandas as pd
 import numpy as np
 import os
 import re
+import sys
+import time
+
+# Adiciona a raiz do projeto para importar os utilitários compartilhados (src/utils)
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from cadastro import ARQUIVO_CADASTRO, carregar_indice_cadastro, codigos_registro
+from src.utils.armazenamento import (PARTICOES_DESPESAS, salvar_tabela, salvar_tabela_em_blocos,
+                                     ler_tabela_em_blocos, existe_tabela)
+from src.utils.estatisticas import novo_acumulador_trimestral, desempenho_por_operadora
+from src.utils.metricas import etapa, execucao, registrar_etapa
 
 # --- CONFIGURAÇÕES ---
-ARQUIVO_DESPESAS = "consolidado_despesas.csv"
-ARQUIVO_CADASTRO = "./downloads_ans/Relatorio_cadop.csv"
-ARQUIVO_SAIDA = "despesas_agregadas.csv"
-ARQUIVO_COMPLETO_SQL = "dados_completos_para_sql.csv"
+# Tabelas intermediárias sem extensão: .csv ou .parquet conforme ETL_FORMATO
+ARQUIVO_DESPESAS = "consolidado_despesas"
+ARQUIVO_SAIDA = "despesas_agregadas"
+ARQUIVO_COMPLETO_SQL = "dados_completos_para_sql"
 
-def padronizar_registro_ans(valor):
-    try:
-        limpo = str(int(float(valor)))
-        return limpo.zfill(6)
-    except:
-        return str(valor)
+# Colunas das despesas usadas no join.
+# Projeção: CNPJ e RazaoSocial ainda estão 'A_DEFINIR', nem precisam ser lidos
+COLUNAS_DESPESAS = ['RegistroANS', 'Trimestre', 'Ano', 'Valor', 'DESCRICAO', 'Categoria']
 
-def executar_missao_2():
-    print("--- INICIANDO MISSÃO 2: CORREÇÃO (V4) ---")
-    
-    if not os.path.exists(ARQUIVO_DESPESAS) or not os.path.exists(ARQUIVO_CADASTRO):
-        print("❌ Erro: Arquivos não encontrados.")
-        return
+# Linhas de despesa lidas/cruzadas por vez (memória limitada mesmo com anos de dados)
+TAMANHO_BLOCO = 500_000
 
-    # 1. CARREGAR DESPESAS
-    print("Carregando despesas...")
-    df_despesas = pd.read_csv(ARQUIVO_DESPESAS, sep=';', encoding='utf-8')
-    df_despesas = df_despesas.drop(columns=['CNPJ', 'RazaoSocial'], errors='ignore')
-    df_despesas['RegistroANS'] = df_despesas['RegistroANS'].apply(padronizar_registro_ans)
+# Valores padrão para operadoras que não aparecem no cadastro ativo
+PADROES_CADASTRO = {
+    'RazaoSocial': "OPERADORA NÃO IDENTIFICADA",
+    'UF': "INDEFINIDO",
+    'Modalidade': "DESCONHECIDA",
+}
 
-    # 2. CARREGAR CADASTRO
-    print("Carregando cadastro...")
+def padronizar_registro_ans(serie):
+    """
+    Padroniza uma coluna inteira de Registro ANS: 123 / '123' / 123.0 -> '000123'.
+    Vetorizado (sem .apply): só valores não numéricos caem no str() linha a linha.
+    """
+    numeros = pd.to_numeric(serie, errors='coerce')
+    validos = np.isfinite(numeros.to_numpy(dtype='float64', na_value=np.nan))
+
+    resultado = pd.Series(index=serie.index, dtype=object)
+    resultado[validos] = numeros[validos].astype('int64').astype(str).str.zfill(6)
+    resultado[~validos] = serie[~validos].map(str)
+    return resultado.astype(str)
+
+def coluna_por_posicao(valores, posicoes, padrao=None):
+    """
+    Monta uma coluna do resultado como categórica.
+    Os textos ficam uma vez só nas categorias; por linha copiamos apenas um código inteiro.
+    """
+    cat = pd.Categorical(valores)
+    categorias = cat.categories
+    codigos = np.full(len(posicoes), -1, dtype='int64')
+    encontrados = posicoes >= 0
+    codigos[encontrados] = cat.codes[posicoes[encontrados]]
+
+    if padrao is not None:
+        if padrao not in categorias:
+            categorias = categorias.append(pd.Index([padrao]))
+        codigos = np.where(codigos < 0, categorias.get_loc(padrao), codigos)
+
+    return pd.Categorical.from_codes(codigos, categories=categorias)
+
+def enriquecer_despesas(df_despesas, indice_cadastro):
+    """Join das despesas com o cadastro via busca no índice (sem pd.merge em chave texto)"""
+    posicoes = indice_cadastro.index.get_indexer(codigos_registro(df_despesas['RegistroANS']))
+
+    df_completo = df_despesas.copy()
+    df_completo['RegistroANS'] = padronizar_registro_ans(df_despesas['RegistroANS'])
+
+    for coluna in ['CNPJ', 'RazaoSocial', 'Modalidade', 'UF']:
+        df_completo[coluna] = coluna_por_posicao(
+            indice_cadastro[coluna].to_numpy(), posicoes, PADROES_CADASTRO.get(coluna)
+        )
+
+    return df_completo
+
+def enriquecer_em_blocos(blocos, indice_cadastro, acumulador):
+    """Cruza cada bloco com o cadastro e já soma nas estatísticas por operadora/trimestre"""
+    tempo_join = tempo_agregacao = 0.0
+    linhas = 0
     try:
-        df_cadastro = pd.read_csv(ARQUIVO_CADASTRO, sep=';', encoding='utf-8')
-    except:
-        df_cadastro = pd.read_csv(ARQUIVO_CADASTRO, sep=';', encoding='latin1')
+        for bloco in blocos:
+            inicio = time.perf_counter()
+            df_completo = enriquecer_despesas(bloco, indice_cadastro)
+            tempo_join += time.perf_counter() - inicio
 
-    df_cadastro['RegistroANS'] = df_cadastro['REGISTRO_OPERADORA'].apply(padronizar_registro_ans)
-    
-    # --- AQUI ESTAVA O ERRO ---
-    # Adicionei 'Modalidade' na lista abaixo
-    colunas_necessarias = ['RegistroANS', 'CNPJ', 'Razao_Social', 'Modalidade', 'UF']
-    df_cadastro_limpo = df_cadastro[colunas_necessarias].copy()
-    
-    print(f"Despesas: {len(df_despesas)} linhas | Cadastro: {len(df_cadastro_limpo)} operadoras")
+            inicio = time.perf_counter()
+            acumulador.atualizar(df_completo)
+            tempo_agregacao += time.perf_counter() - inicio
 
-    # 3. O JOIN
-    print("Cruzando tabelas...")
-    df_completo = pd.merge(df_despesas, df_cadastro_limpo, on='RegistroANS', how='left')
-    
-    df_completo = df_completo.rename(columns={'Razao_Social': 'RazaoSocial'})
-    
-    # Preenche vazios
-    df_completo['RazaoSocial'] = df_completo['RazaoSocial'].fillna("OPERADORA NÃO IDENTIFICADA")
-    df_completo['UF'] = df_completo['UF'].fillna("INDEFINIDO")
-    df_completo['Modalidade'] = df_completo['Modalidade'].fillna("DESCONHECIDA") # Preenche modalidade vazia
+            linhas += len(df_completo)
+            yield df_completo
+    finally:
+        registrar_etapa('join', tempo_join, linhas)
+        registrar_etapa('agregacao', tempo_agregacao, linhas, grupos=len(acumulador))
+
+def carregar_cadastro():
+    """
+    Cadastro (tabela pequena, fica inteira na memória), já indexado pelo Registro ANS
+    (com 'Modalidade', ver cadastro.montar_indice_cadastro).
+    Vem do instantâneo gravado pelo download_cadastro.py; o CSV só é relido se mudou.
+    """
+    print("Carregando cadastro...")
+    with etapa('cadastro') as span:
+        indice_cadastro = carregar_indice_cadastro(ARQUIVO_CADASTRO)
+        span['linhas'] = len(indice_cadastro)
+    print(f"Cadastro: {len(indice_cadastro)} operadoras")
+    return indice_cadastro
+
+def enriquecer_e_gravar(blocos, indice_cadastro, canal=None):
+    """
+    Cruza os blocos de despesas com o cadastro, grava o arquivo completo e o de desempenho.
+    'canal' (opcional) recebe cada bloco cruzado assim que fica pronto: o orquestrador
+    passa os blocos direto para a carga no banco, sem reler o arquivo completo.
+    """
+    # 3. O JOIN (4. Preenche vazios já na montagem das colunas)
+    # Cada bloco cruzado vai direto para o arquivo SQL e para o acumulador de estatísticas
+    print("Cruzando tabelas e gravando o arquivo completo...")
+    acumulador = novo_acumulador_trimestral()
+    enriquecidos = enriquecer_em_blocos(blocos, indice_cadastro, acumulador)
+    if canal is not None:
+        enriquecidos = canal.repassar(enriquecidos)
+    caminho_completo, linhas = salvar_tabela_em_blocos(enriquecidos, ARQUIVO_COMPLETO_SQL,
+                                                       particoes=PARTICOES_DESPESAS)
+    print(f"Despesas: {linhas} linhas")
     
     # 5. AGREGAÇÃO E SALVAMENTO
+    # Média e desvio sobre os totais de cada trimestre (não sobre as linhas de despesa)
     print("Gerando arquivos corrigidos...")
+    with etapa('desempenho') as span:
+        df_agregado = desempenho_por_operadora(acumulador)
+        salvar_tabela(df_agregado, ARQUIVO_SAIDA)
+        span['linhas'] = len(df_agregado)
     
-    # Arquivo Agregado
-    df_agregado = df_completo.groupby(['RazaoSocial', 'UF'])['Valor'].agg(
-        Total_Despesas='sum', Media_Trimestral='mean', Desvio_Padrao='std'
-    ).reset_index().sort_values(by='Total_Despesas', ascending=False)
-    
-    df_agregado['Desvio_Padrao'] = df_agregado['Desvio_Padrao'].fillna(0)
-    df_agregado.to_csv(ARQUIVO_SAIDA, index=False, sep=';', encoding='utf-8')
-    
-    # Arquivo SQL (Agora com Modalidade!)
-    df_completo.to_csv(ARQUIVO_COMPLETO_SQL, index=False, sep=';', encoding='utf-8')
+    print(f"\n✅ SUCESSO! '{caminho_completo}' atualizado com a coluna Modalidade.")
+    return caminho_completo
+
+def executar_missao_2():
+    print("--- INICIANDO MISSÃO 2: CORREÇÃO (V4) ---")
     
-    print(f"\n✅ SUCESSO! '{ARQUIVO_COMPLETO_SQL}' atualizado com a coluna Modalidade.")
+    if not existe_tabela(ARQUIVO_DESPESAS) or not os.path.exists(ARQUIVO_CADASTRO):
+        print("❌ Erro: Arquivos não encontrados.")
+        return
+
+    # 1. CARREGAR CADASTRO
+    indice_cadastro = carregar_cadastro()
+
+    # 2. DESPESAS EM BLOCOS
+    blocos = ler_tabela_em_blocos(ARQUIVO_DESPESAS, colunas=COLUNAS_DESPESAS, tamanho_bloco=TAMANHO_BLOCO)
+
+    # 3 a 5. JOIN, AGREGAÇÃO E SALVAMENTO
+    enriquecer_e_gravar(blocos, indice_cadastro)
 
 if __name__ == "__main__":
-    executar_missao_2()
\ No newline at end of file
+    with execucao("missao2"):
+        executar_missao_2()
\ No newline at end of file
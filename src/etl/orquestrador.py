@@ -0,0 +1,331 @@
+import hashlib
+import json
+import os
+import queue
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from datetime import datetime
+
+# Adiciona o diretório atual ao path para importar os módulos do ETL
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+# Adiciona a raiz do projeto para importar os utilitários compartilhados (src/utils) e o importador
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from main import (ARQUIVO_FINAL, CHAVES_TRIMESTRES, atualizar_trimestres, trimestres_disponiveis,
+                  trimestres_em_ordem, consolidar)
+from download_cadastro import CHAVE_MANIFESTO, baixar_cadastro
+from cadastro import ARQUIVO_CADASTRO
+from missao2 import (ARQUIVO_COMPLETO_SQL, ARQUIVO_SAIDA, COLUNAS_DESPESAS, TAMANHO_BLOCO, carregar_cadastro,
+                     enriquecer_e_gravar)
+from manifesto import carregar_manifesto
+from src.database.importador import MODO_CARGA, importar
+from src.database.publicacao import banco_atual
+from src.utils.armazenamento import FORMATO, existe_tabela
+from src.utils.metricas import etapa, execucao
+
+# --- ORQUESTRADOR DO PIPELINE ---
+# Uma execução só no lugar de main.py -> download_cadastro.py -> missao2.py -> importador.py.
+# As etapas formam um grafo de dependências (ETAPAS):
+#
+#   cadastro ----------------+
+#                            +--> enriquecimento ==> carga
+#   trimestres --+-----------+
+#                +--> consolidacao
+#
+# - etapas independentes rodam ao mesmo tempo (o cadastro baixa junto com os trimestres;
+#   a consolidação grava o CSV final enquanto o enriquecimento cruza os mesmos trimestres)
+# - os trimestres passam da transformação para as etapas seguintes na memória (sem reler o consolidado)
+# - '==>' é um fluxo: cada bloco cruzado vai para a carga no banco assim que fica pronto,
+#   as duas etapas rodam juntas e o arquivo completo não é relido
+# - cada etapa concluída vira um ponto de controle: se a execução falhar, a próxima pula
+#   o que já terminou com os mesmos dados de entrada e recomeça da etapa que faltou
+
+# Pontos de controle das etapas já concluídas (ao lado do manifesto dos downloads)
+ARQUIVO_PONTOS = "./downloads_ans/pontos_de_controle.json"
+# Muda quando as etapas ou o que elas gravam mudam: pontos de outra versão não valem
+VERSAO_PONTOS = 1
+
+# Blocos no fluxo entre duas etapas: o produtor espera se o consumidor ficar para trás
+CAPACIDADE_CANAL = 4
+
+# Estados de etapa que liberam as dependentes
+CONCLUIDAS = ('ok', 'pulada')
+
+class Canal:
+    """
+    Fila limitada entre duas etapas que rodam ao mesmo tempo:
+    o produtor coloca os blocos (repassar) e o consumidor itera sobre o canal.
+    Se o produtor falhar, o erro chega ao consumidor; se o consumidor desistir (abandonar),
+    o produtor segue o próprio trabalho sem ficar preso na fila cheia.
+    """
+
+    _FIM = object()
+
+    def __init__(self, capacidade=CAPACIDADE_CANAL):
+        self._fila = queue.Queue(maxsize=capacidade)
+        self._abandonado = threading.Event()
+        self._erro = None
+
+    def colocar(self, item):
+        while not self._abandonado.is_set():
+            try:
+                self._fila.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def repassar(self, blocos):
+        """Coloca cada bloco no canal e devolve o mesmo bloco para quem está iterando (ex: gravar o arquivo)"""
+        for bloco in blocos:
+            self.colocar(bloco)
+            yield bloco
+
+    def fechar(self, erro=None):
+        self._erro = erro
+        self.colocar(self._FIM)
+
+    def abandonar(self):
+        self._abandonado.set()
+
+    def __iter__(self):
+        while True:
+            item = self._fila.get()
+            if item is self._FIM:
+                if self._erro is not None:
+                    raise RuntimeError(f"Etapa anterior falhou: {self._erro}")
+                return
+            yield item
+
+# --- ETAPAS ---
+def em_blocos(tabelas, colunas, tamanho_bloco=TAMANHO_BLOCO):
+    """Fatias de no máximo 'tamanho_bloco' linhas de cada DataFrame (só as colunas pedidas)"""
+    for df in tabelas:
+        df = df[colunas]
+        for inicio in range(0, len(df), tamanho_bloco):
+            yield df.iloc[inicio:inicio + tamanho_bloco]
+
+def executar_cadastro(contexto):
+    if baixar_cadastro():
+        return True
+    # Sem rede, mas com um cadastro de antes: segue com ele (como a Missão 2 faria)
+    if os.path.exists(ARQUIVO_CADASTRO):
+        print("⚠️ Usando o último cadastro baixado.")
+        return True
+    return False
+
+def executar_trimestres(contexto):
+    manifesto, resultados, _ = atualizar_trimestres()
+    if not trimestres_disponiveis(manifesto, resultados):
+        print("❌ Nenhum trimestre disponível.")
+        return False
+    return manifesto, resultados
+
+def executar_consolidacao(contexto):
+    manifesto, resultados = contexto['resultados']['trimestres']
+    return consolidar(manifesto, resultados) is not None
+
+def executar_enriquecimento(contexto):
+    manifesto, resultados = contexto['resultados']['trimestres']
+    blocos = em_blocos(trimestres_em_ordem(manifesto, resultados), COLUNAS_DESPESAS)
+    enriquecer_e_gravar(blocos, carregar_cadastro(), canal=contexto['saida'])
+    return True
+
+def executar_carga(contexto):
+    # Sem canal (enriquecimento pulado ou modo sqlalchemy), o importador lê o arquivo completo
+    return importar(blocos=contexto['entrada'])
+
+# Grafo do pipeline. Por etapa:
+# - depende: etapas que precisam terminar antes
+# - fluxo: dependência que, em vez de terminar antes, roda junto mandando blocos por um Canal
+# - entradas: chaves do manifesto de onde vêm os dados (sem 'entradas', a etapa sempre roda:
+#   os downloads já são incrementais, ver manifesto.py)
+# - saidas: confere se o que a etapa gravou ainda está no disco
+ETAPAS = {
+    'cadastro': {
+        'executar': executar_cadastro,
+    },
+    'trimestres': {
+        'executar': executar_trimestres,
+    },
+    'consolidacao': {
+        'executar': executar_consolidacao,
+        'depende': ['trimestres'],
+        'entradas': CHAVES_TRIMESTRES,
+        'saidas': lambda: existe_tabela(ARQUIVO_FINAL),
+    },
+    'enriquecimento': {
+        'executar': executar_enriquecimento,
+        'depende': ['trimestres', 'cadastro'],
+        'entradas': CHAVES_TRIMESTRES + [CHAVE_MANIFESTO],
+        'saidas': lambda: existe_tabela(ARQUIVO_COMPLETO_SQL) and existe_tabela(ARQUIVO_SAIDA),
+    },
+    'carga': {
+        'executar': executar_carga,
+        'depende': ['enriquecimento'],
+        # A carga pelo SQLAlchemy (modo antigo) só sabe ler o arquivo completo
+        'fluxo': 'enriquecimento' if MODO_CARGA == "massa" else None,
+        'entradas': CHAVES_TRIMESTRES + [CHAVE_MANIFESTO],
+        'saidas': lambda: os.path.exists(banco_atual()),
+    },
+}
+
+# --- PONTOS DE CONTROLE ---
+def carregar_pontos():
+    try:
+        with open(ARQUIVO_PONTOS, 'r', encoding='utf-8') as f:
+            pontos = json.load(f)
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as e:
+        print(f"⚠️ Pontos de controle inválidos, ignorando: {e}")
+        return {}
+    return pontos if pontos.get('versao') == VERSAO_PONTOS else {}
+
+def salvar_pontos(pontos):
+    """Grava de forma atômica (arquivo temporário + rename), como o manifesto"""
+    os.makedirs(os.path.dirname(ARQUIVO_PONTOS), exist_ok=True)
+    temporario = ARQUIVO_PONTOS + ".tmp"
+    with open(temporario, 'w', encoding='utf-8') as f:
+        json.dump({**pontos, 'versao': VERSAO_PONTOS}, f, ensure_ascii=False, indent=2)
+    os.replace(temporario, ARQUIVO_PONTOS)
+
+def assinatura_entradas(chaves):
+    """Resumo do que entra na etapa: hash do conteúdo baixado e versão da transformação de cada chave"""
+    manifesto = carregar_manifesto()
+    entradas = {
+        chave: [manifesto.get(chave, {}).get(campo) for campo in ('sha256', 'versao_saida')]
+        for chave in chaves
+    }
+    texto = json.dumps({'formato': FORMATO, 'entradas': entradas}, sort_keys=True)
+    return hashlib.sha256(texto.encode('utf-8')).hexdigest()
+
+def pode_pular(nome, definicao, pontos):
+    """A etapa já terminou numa execução anterior com as mesmas entradas, e o que ela gravou continua lá"""
+    if 'entradas' not in definicao:
+        return False
+    ponto = pontos.get('etapas', {}).get(nome)
+    return (bool(ponto) and ponto.get('assinatura') == assinatura_entradas(definicao['entradas'])
+            and definicao['saidas']())
+
+def marcar_concluida(pontos, nome, definicao):
+    if 'entradas' not in definicao:
+        return
+    pontos.setdefault('etapas', {})[nome] = {
+        'assinatura': assinatura_entradas(definicao['entradas']),
+        'concluida_em': datetime.now().isoformat(timespec='seconds'),
+    }
+    salvar_pontos(pontos)
+
+# --- EXECUÇÃO ---
+def _executar_etapa(nome, definicao, contexto):
+    """Roda uma etapa (numa thread) e fecha os canais dela, dê certo ou não"""
+    entrada, saida = contexto['entrada'], contexto['saida']
+    try:
+        with etapa('orquestrador', passo=nome):
+            resultado = definicao['executar'](contexto)
+    except Exception as e:
+        if saida is not None:
+            saida.fechar(e)
+        raise
+    finally:
+        if entrada is not None:
+            entrada.abandonar()
+    if saida is not None:
+        saida.fechar(RuntimeError(f"etapa '{nome}' falhou") if resultado is False else None)
+    return resultado
+
+def executar_dag(etapas=ETAPAS):
+    """
+    Roda as etapas respeitando as dependências, cada uma na sua thread assim que estiver liberada.
+    Devolve o estado final de cada etapa: ok, pulada, falha ou cancelada (dependência falhou).
+    Uma etapa falha se levantar exceção ou devolver False.
+    """
+    print("--- INICIANDO ORQUESTRADOR ---")
+    pontos = carregar_pontos()
+    estado, resultados, canais = {}, {}, {}
+
+    def liberada(nome, definicao):
+        fluxo = definicao.get('fluxo')
+        return all(estado.get(d) in CONCLUIDAS or (d == fluxo and d in canais)
+                   for d in definicao.get('depende', []))
+
+    def abrir_canal(produtor):
+        """Abre o fluxo só se o consumidor for rodar junto (senão o produtor ficaria preso na fila)"""
+        for nome, definicao in etapas.items():
+            if nome in estado or definicao.get('fluxo') != produtor:
+                continue
+            outras = [d for d in definicao.get('depende', []) if d != produtor]
+            if all(estado.get(d) in CONCLUIDAS for d in outras) and not pode_pular(nome, definicao, pontos):
+                canais[produtor] = Canal()
+                return canais[produtor]
+        return None
+
+    with ThreadPoolExecutor(max_workers=len(etapas)) as executor:
+        rodando = {}
+        while True:
+            # Libera tudo o que der (uma etapa pulada ou um canal aberto pode liberar outra)
+            mudou = True
+            while mudou:
+                mudou = False
+                for nome, definicao in etapas.items():
+                    if nome in estado:
+                        continue
+                    if any(estado.get(d) in ('falha', 'cancelada') for d in definicao.get('depende', [])):
+                        print(f"⏭️ [{nome}] Cancelada: uma dependência falhou.")
+                        estado[nome] = 'cancelada'
+                        mudou = True
+                        continue
+                    if not liberada(nome, definicao):
+                        continue
+                    if pode_pular(nome, definicao, pontos):
+                        print(f"♻️ [{nome}] Já concluída com os mesmos dados, pulando.")
+                        estado[nome] = 'pulada'
+                        mudou = True
+                        continue
+
+                    fluxo = definicao.get('fluxo')
+                    contexto = {
+                        'resultados': resultados,
+                        'entrada': canais.get(fluxo) if estado.get(fluxo) == 'rodando' else None,
+                        'saida': abrir_canal(nome),
+                    }
+                    print(f"▶️ [{nome}] Iniciando...")
+                    estado[nome] = 'rodando'
+                    rodando[executor.submit(_executar_etapa, nome, definicao, contexto)] = nome
+                    mudou = True
+
+            if not rodando:
+                break
+
+            feitos, _ = wait(rodando, return_when=FIRST_COMPLETED)
+            for futuro in feitos:
+                nome = rodando.pop(futuro)
+                try:
+                    resultado = futuro.result()
+                except Exception as e:
+                    print(f"❌ [{nome}] {type(e).__name__}: {e}")
+                    resultado = False
+
+                if resultado is False:
+                    print(f"❌ [{nome}] Falhou.")
+                    estado[nome] = 'falha'
+                else:
+                    print(f"✅ [{nome}] Concluída.")
+                    estado[nome] = 'ok'
+                    resultados[nome] = resultado
+                    marcar_concluida(pontos, nome, etapas[nome])
+
+    print("\n--- RESUMO ---")
+    for nome in etapas:
+        print(f" {nome}: {estado.get(nome)}")
+    return estado
+
+if __name__ == "__main__":
+    # Tempos, linhas e memória de todas as etapas num relatório só (src/utils/metricas.py)
+    with execucao("orquestrador") as relatorio:
+        estado = executar_dag()
+        relatorio['passos'] = estado
+        if any(s in ('falha', 'cancelada') for s in estado.values()):
+            relatorio['status'] = "erro"
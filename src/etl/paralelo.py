@@ -0,0 +1,165 @@
+import glob
+import io
+import multiprocessing
+import os
+import shutil
+import sys
+from concurrent.futures import ProcessPoolExecutor, wait
+
+# Adiciona a raiz do projeto para importar os utilitários compartilhados (src/utils)
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from transformacao import COLUNAS_SAIDA, processar_arquivo_em_blocos
+from src.utils.armazenamento import (PARTICOES_DESPESAS, formato_ativo, caminho_tabela,
+                                     salvar_tabela_em_blocos)
+from src.utils.metricas import etapa, etapas_isoladas, incorporar_etapas
+
+# --- CONFIGURAÇÕES DO MODO MULTIPROCESSO ---
+# Quantos processos transformam os CSVs (0 ou 1 = tudo no processo principal, como antes)
+# Ex: ETL_PROCESSOS=32 python src/etl/main.py
+PROCESSOS_TRANSFORMACAO = int(os.environ.get("ETL_PROCESSOS", "0"))
+
+# Cada CSV é dividido em fatias de pelo menos esse tamanho (uma fatia por tarefa do pool)
+TAMANHO_MINIMO_FATIA = 32 * 1024 * 1024 # 32 MB
+
+def modo_multiprocesso(processos=PROCESSOS_TRANSFORMACAO):
+    return processos > 1
+
+def criar_pool(processos=PROCESSOS_TRANSFORMACAO):
+    # spawn, não fork: o pool nasce com threads rodando (downloads, cadastro no orquestrador) e locks
+    # (métricas, manifesto) que podem estar presos no momento do fork e nunca seriam soltos no filho
+    return ProcessPoolExecutor(max_workers=processos, mp_context=multiprocessing.get_context("spawn"))
+
+def dividir_csv(caminho_csv, partes):
+    """
+    Divide o CSV em até 'partes' intervalos de bytes (inicio, fim) que terminam sempre em fim de linha.
+    A primeira fatia começa depois do cabeçalho: cada worker recebe o cabeçalho à parte.
+    """
+    tamanho = os.path.getsize(caminho_csv)
+
+    with open(caminho_csv, 'rb') as f:
+        cabecalho = f.readline()
+        inicio_dados = f.tell()
+
+        partes = max(1, min(partes, (tamanho - inicio_dados) // TAMANHO_MINIMO_FATIA or 1))
+        passo = (tamanho - inicio_dados) // partes
+
+        cortes = [inicio_dados]
+        for i in range(1, partes):
+            f.seek(inicio_dados + i * passo)
+            f.readline() # Avança até o fim da linha em que caiu
+            if f.tell() > cortes[-1] and f.tell() < tamanho:
+                cortes.append(f.tell())
+        cortes.append(tamanho)
+
+    return cabecalho, list(zip(cortes[:-1], cortes[1:]))
+
+def transformar_fatia(caminho_csv, cabecalho, inicio, fim, destino, formato, detalhes=None):
+    """
+    Executado dentro de um processo do pool (não compartilha nada com os outros).
+    Lê só o seu intervalo de bytes, transforma e grava direto no disco.
+    Devolve apenas um resumo pequeno -- o DataFrame nunca volta pelo pickle.
+    As etapas medidas no worker voltam no resumo para entrar no relatório da execução.
+    """
+    with etapas_isoladas() as etapas:
+        resumo = _transformar_fatia(caminho_csv, cabecalho, inicio, fim, destino, formato, detalhes or {})
+    return {**resumo, 'etapas': etapas}
+
+def _transformar_fatia(caminho_csv, cabecalho, inicio, fim, destino, formato, detalhes):
+    with open(caminho_csv, 'rb') as f:
+        f.seek(inicio)
+        fatia = io.BytesIO(cabecalho + f.read(fim - inicio))
+
+    linhas_originais = 0
+    def blocos_sem_zerados():
+        nonlocal linhas_originais
+        for bloco in processar_arquivo_em_blocos(fatia, fatia_bytes=fim - inicio, **detalhes):
+            linhas_originais += len(bloco)
+            # Limpeza Extra: Remove valores zerados (mesma regra do modo de um processo)
+            bloco = bloco[bloco['Valor'] != 0.0]
+            if len(bloco):
+                yield bloco
+
+    caminho, linhas = salvar_tabela_em_blocos(blocos_sem_zerados(), destino,
+                                              particoes=PARTICOES_DESPESAS, formato=formato)
+    return {'caminho': caminho if linhas else None, 'linhas': linhas, 'linhas_filtradas': linhas_originais}
+
+def despachar_trimestre(pool, caminho_csv, destino, processos=PROCESSOS_TRANSFORMACAO, formato=None, **detalhes):
+    """Envia as fatias do CSV para o pool (sem esperar). Cada fatia grava em 'destino.parte-NNN'."""
+    formato = formato_ativo(formato)
+    cabecalho, fatias = dividir_csv(caminho_csv, processos)
+    return [
+        pool.submit(transformar_fatia, caminho_csv, cabecalho, inicio, fim, f"{destino}.parte-{i:03d}", formato,
+                    {**detalhes, 'fatia': i})
+        for i, (inicio, fim) in enumerate(fatias)
+    ]
+
+def juntar_fatias(caminhos, destino, formato=None):
+    """
+    Passo final (barato): junta as saídas das fatias em uma tabela só, sem reprocessar nada.
+    - csv: concatena os arquivos byte a byte, mantendo um único cabeçalho
+    - parquet: só move os arquivos de cada partição (Ano=.../Trimestre=...) para a pasta final
+    """
+    formato = formato_ativo(formato)
+    caminho_final = caminho_tabela(destino, formato)
+    caminhos = [c for c in caminhos if c]
+
+    if os.path.isdir(caminho_final):
+        shutil.rmtree(caminho_final)
+    elif os.path.exists(caminho_final):
+        os.remove(caminho_final)
+
+    if formato == 'csv':
+        with open(caminho_final, 'wb') as saida:
+            if not caminhos:
+                # Nenhuma despesa no trimestre: tabela vazia, mas com cabeçalho
+                saida.write((";".join(COLUNAS_SAIDA) + "\n").encode('utf-8'))
+            for i, caminho in enumerate(caminhos):
+                with open(caminho, 'rb') as parte:
+                    if i > 0:
+                        parte.readline() # Pula o cabeçalho repetido
+                    shutil.copyfileobj(parte, saida)
+                os.remove(caminho)
+        return caminho_final
+
+    os.makedirs(caminho_final, exist_ok=True)
+    for i, caminho in enumerate(caminhos):
+        for pasta, _, arquivos in os.walk(caminho):
+            relativo = os.path.relpath(pasta, caminho)
+            for nome in arquivos:
+                # Prefixo da fatia no nome: arquivos de fatias diferentes nunca colidem
+                os.renames(os.path.join(pasta, nome),
+                           os.path.join(caminho_final, relativo, f"fatia-{i:03d}-{nome}"))
+        shutil.rmtree(caminho, ignore_errors=True)
+    return caminho_final
+
+def apagar_fatias(destino):
+    """Remove as saídas 'destino.parte-NNN' que sobraram de um trimestre que falhou"""
+    for caminho in glob.glob(f"{glob.escape(destino)}.parte-*"):
+        if os.path.isdir(caminho):
+            shutil.rmtree(caminho, ignore_errors=True)
+        else:
+            os.remove(caminho)
+
+def concluir_trimestre(tri, futuros, destino, formato=None):
+    """
+    Espera as fatias do trimestre, junta as saídas e devolve (caminho, linhas).
+    Se uma fatia falhar, espera as outras terminarem e apaga as saídas parciais antes de repassar o erro.
+    """
+    with etapa('transformacao', trimestre=tri, fatias=len(futuros)) as span:
+        try:
+            resumos = [futuro.result() for futuro in futuros]
+        except BaseException:
+            wait(futuros)
+            apagar_fatias(destino)
+            raise
+        linhas_filtradas = sum(r['linhas_filtradas'] for r in resumos)
+        linhas = sum(r['linhas'] for r in resumos)
+        for r in resumos:
+            incorporar_etapas(r['etapas'])
+
+        caminho = juntar_fatias([r['caminho'] for r in resumos], destino, formato)
+        span['linhas'] = linhas
+    print(f"[{tri}] ✅ Sucesso! {linhas} registros úteis (removidos {linhas_filtradas - linhas} zerados) "
+          f"em {len(futuros)} fatia(s).")
+    return caminho, linhas
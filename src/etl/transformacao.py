@@ -1,68 +1,183 @@
 import pandas as pd
 import os
+import sys
+import time
 
-def processar_arquivo(caminho_entrada):
+# Adiciona a raiz do projeto para importar os utilitários compartilhados (src/utils)
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from classificacao import classificar_bloco, categorias_do_bloco, mascara_despesas
+from leitor_ans import ESQUEMAS, TIPOS_INTEIROS, Quarentena, ler_csv_ans_em_blocos, separar_inteiros_invalidos
+from src.utils.metricas import registrar_etapa
+
+# --- CONFIGURAÇÕES DE LEITURA ---
+# Só lemos as colunas que usamos (o arquivo bruto tem mais), com tipos explícitos e compactos:
+# o esquema das demonstrações contábeis fica no leitor compartilhado (leitor_ans.py)
+COLUNAS_LEITURA = ESQUEMAS['demonstracoes']['colunas']
+TIPOS_COLUNAS = ESQUEMAS['demonstracoes']['tipos']
+# Linhas em dicionário não têm arquivo de origem: na quarentena elas ficam neste formato
+FORMATO_LINHAS = {'colunas': COLUNAS_LEITURA, 'separador': ';', 'decimal': ','}
+
+# Quantidade de linhas lidas por vez. Só um bloco fica na memória por vez.
+TAMANHO_BLOCO = 500_000
+
+COLUNAS_SAIDA = ['RegistroANS', 'CNPJ', 'RazaoSocial', 'Trimestre', 'Ano', 'Valor', 'DESCRICAO', 'Categoria']
+
+# Muda sempre que as colunas ou as regras da saída mudam:
+# saídas guardadas de outra versão são refeitas (ver manifesto.trimestre_em_dia)
+VERSAO_SAIDA = 3
+
+def bloco_de_linhas(linhas, quarentena):
+    """Monta um bloco (DataFrame) a partir de linhas em dicionário (ex: csv.DictReader)"""
+    bloco = pd.DataFrame.from_records(linhas, columns=COLUNAS_LEITURA)
+
+    # Linhas cruas chegam como texto: '1234,56' -> 1234.56
+    if not pd.api.types.is_numeric_dtype(bloco['VL_SALDO_FINAL']):
+        bloco['VL_SALDO_FINAL'] = bloco['VL_SALDO_FINAL'].astype(str).str.replace(',', '.', regex=False)
+
+    # REG_ANS vazio ou não numérico derrubaria o astype do bloco inteiro: a linha vai para a quarentena
+    bloco = bloco.astype({coluna: tipo for coluna, tipo in TIPOS_COLUNAS.items() if tipo not in TIPOS_INTEIROS})
+    return separar_inteiros_invalidos(bloco, TIPOS_COLUNAS, quarentena, FORMATO_LINHAS)
+
+def ler_blocos(fonte, tamanho_bloco=TAMANHO_BLOCO, nome=None, resumo=None):
+    """
+    Lê a fonte em blocos de tamanho fixo.
+    A fonte pode ser um caminho/arquivo CSV ou um iterador de linhas (dicionários).
+    """
+    if isinstance(fonte, (str, os.PathLike)) or hasattr(fonte, 'read'):
+        # Codificação, separador e vírgula decimal vêm da amostra do arquivo (leitor_ans.py);
+        # linhas malformadas vão para a quarentena em vez de derrubar (ou sumir da) leitura
+        yield from ler_csv_ans_em_blocos(fonte, 'demonstracoes', tamanho_bloco, nome=nome, resumo=resumo)
+        return
+
+    quarentena = Quarentena(nome or "linhas", FORMATO_LINHAS['separador'].join(COLUNAS_LEITURA), 'demonstracoes')
+    try:
+        with quarentena:
+            lote = []
+            for linha in fonte:
+                lote.append(linha)
+                if len(lote) >= tamanho_bloco:
+                    yield bloco_de_linhas(lote, quarentena)
+                    lote = []
+            if lote:
+                yield bloco_de_linhas(lote, quarentena)
+    finally:
+        if resumo is not None:
+            resumo.update(quarentena=quarentena.linhas)
+
+def transformar_bloco(bloco):
+    """Filtra as despesas de um bloco e padroniza as colunas"""
+    # 1. FILTRAGEM
+    # Filtro do PDF: "Despesas com Eventos/Sinistros", pela categoria da conta contábil
+    # Cada código distinto é classificado uma vez; por linha sobra só um teste em inteiros
+    codigos = classificar_bloco(bloco)
+    mascara = mascara_despesas(codigos)
+    df_filtrado = bloco[mascara].copy()
+    df_filtrado['Categoria'] = categorias_do_bloco(codigos[mascara])
+
+    # 2. CRIAÇÃO DE COLUNAS (Ano e Trimestre)
+    # Converte a coluna DATA para o formato de data do Python
+    datas = pd.to_datetime(df_filtrado['DATA'])
+
+    df_filtrado['Ano'] = datas.dt.year
+    # Lógica matemática para achar o trimestre: (Mês - 1) // 3 + 1
+    df_filtrado['Trimestre'] = (datas.dt.month - 1) // 3 + 1
+    df_filtrado['Trimestre'] = df_filtrado['Trimestre'].astype(str) + 'T' # Formata como '3T'
+
+    # 3. RENOMEAÇÃO E SELEÇÃO
+    # O PDF pede: CNPJ, RazaoSocial, Trimestre, Ano, Valor
+    # Trade-off: Não temos CNPJ nem RazaoSocial ainda, usamos REG_ANS e DESCRICAO
+    df_final = df_filtrado.rename(columns={
+        'REG_ANS': 'RegistroANS',
+        'VL_SALDO_FINAL': 'Valor'
+    })
+
+    # Adicionamos colunas vazias para CNPJ e RazaoSocial (serão preenchidas na Missão 2)
+    df_final['CNPJ'] = 'A_DEFINIR'
+    df_final['RazaoSocial'] = 'A_DEFINIR'
+
+    # Seleciona apenas as colunas que importam
+    return df_final[COLUNAS_SAIDA]
+
+def transformar_medindo(fonte, tamanho_bloco=TAMANHO_BLOCO, **detalhes):
+    """
+    Lê e transforma bloco a bloco, devolvendo (linhas lidas, bloco transformado).
+    Tempo de leitura (parse) e de filtro são medidos separados e registrados no fim como etapas.
+    """
+    tempo_parse = tempo_filtro = 0.0
+    lidas = filtradas = 0
+    # Motor, formato detectado e linhas em quarentena entram no relatório da etapa de parse
+    resumo = {}
+    nome = "-".join(str(detalhes[k]) for k in ('trimestre', 'fatia') if k in detalhes) or None
+    leitor = iter(ler_blocos(fonte, tamanho_bloco, nome=nome, resumo=resumo))
+
+    try:
+        while True:
+            inicio = time.perf_counter()
+            bloco = next(leitor, None)
+            tempo_parse += time.perf_counter() - inicio
+            if bloco is None:
+                break
+
+            inicio = time.perf_counter()
+            df_bloco = transformar_bloco(bloco)
+            tempo_filtro += time.perf_counter() - inicio
+
+            lidas += len(bloco)
+            filtradas += len(df_bloco)
+            yield len(bloco), df_bloco
+    finally:
+        registrar_etapa('parse', tempo_parse, lidas, **detalhes, **resumo)
+        registrar_etapa('filtro', tempo_filtro, lidas, linhas_saida=filtradas, **detalhes)
+
+def processar_arquivo_em_blocos(fonte, tamanho_bloco=TAMANHO_BLOCO, **detalhes):
+    """
+    Modo streaming: devolve (sob demanda) cada bloco já filtrado e padronizado.
+    A memória usada depende do tamanho do bloco, não do tamanho do arquivo.
+    """
+    for _, df_bloco in transformar_medindo(fonte, tamanho_bloco, **detalhes):
+        if len(df_bloco):
+            yield df_bloco
+
+def processar_arquivo(caminho_entrada, tamanho_bloco=TAMANHO_BLOCO, **detalhes):
     """
     Lê o arquivo bruto, filtra despesas e padroniza as colunas.
+    A leitura é feita em blocos: só as despesas filtradas ficam acumuladas.
     """
     print(f"Processando: {caminho_entrada}")
-    
+
     try:
-        # 1. LEITURA COM CORREÇÕES
-        # encoding='utf-8': Corrigimos o problema dos caracteres estranhos
-        # sep=';': O separador é ponto e vírgula
-        # decimal=',': Avisamos ao Pandas que a vírgula é o separador decimal (vital!)
-        df = pd.read_csv(caminho_entrada, sep=';', encoding='utf-8', decimal=',')
-        
-        # 2. FILTRAGEM (O PDF pede "Despesas com Eventos/Sinistros")
-        # Vamos buscar linhas onde a DESCRIÇÃO contém 'EVENTOS' ou 'SINISTROS'
-        # case=False ignora maiúsculas/minúsculas
-        termo_busca = 'EVENTOS|SINISTROS' 
-        df_filtrado = df[df['DESCRICAO'].str.contains(termo_busca, case=False, na=False)].copy()
-        
-        print(f"Linhas originais: {len(df)} -> Linhas de Despesa: {len(df_filtrado)}")
-        
-        # 3. CRIAÇÃO DE COLUNAS (Ano e Trimestre)
-        # Converte a coluna DATA para o formato de data do Python
-        df_filtrado['DATA'] = pd.to_datetime(df_filtrado['DATA'])
-        
-        df_filtrado['Ano'] = df_filtrado['DATA'].dt.year
-        # Lógica matemática para achar o trimestre: (Mês - 1) // 3 + 1
-        df_filtrado['Trimestre'] = (df_filtrado['DATA'].dt.month - 1) // 3 + 1
-        df_filtrado['Trimestre'] = df_filtrado['Trimestre'].astype(str) + 'T' # Formata como '3T'
-        
-        # 4. RENOMEAÇÃO E SELEÇÃO
-        # O PDF pede: CNPJ, RazaoSocial, Trimestre, Ano, Valor
-        # Trade-off: Não temos CNPJ nem RazaoSocial ainda, usamos REG_ANS e DESCRICAO
-        df_final = df_filtrado.rename(columns={
-            'REG_ANS': 'RegistroANS',
-            'VL_SALDO_FINAL': 'Valor'
-        })
-        
-        # Adicionamos colunas vazias para CNPJ e RazaoSocial (serão preenchidas na Missão 2)
-        df_final['CNPJ'] = 'A_DEFINIR' 
-        df_final['RazaoSocial'] = 'A_DEFINIR'
-        
-        # Seleciona apenas as colunas que importam
-        colunas_desejadas = ['RegistroANS', 'CNPJ', 'RazaoSocial', 'Trimestre', 'Ano', 'Valor', 'DESCRICAO']
-        return df_final[colunas_desejadas]
-        
+        linhas_originais = 0
+        blocos = []
+
+        for lidas, df_bloco in transformar_medindo(caminho_entrada, tamanho_bloco, **detalhes):
+            linhas_originais += lidas
+            blocos.append(df_bloco)
+
+        if blocos:
+            df_final = pd.concat(blocos, ignore_index=True)
+        else:
+            df_final = pd.DataFrame(columns=COLUNAS_SAIDA)
+
+        print(f"Linhas originais: {linhas_originais} -> Linhas de Despesa: {len(df_final)}")
+        return df_final
+
     except Exception as e:
-        print(f"Erro ao processar arquivo: {e}")
+        print(f"Erro ao processar arquivo: {type(e).__name__}: {e}")
         return None
 
 if __name__ == "__main__":
     # Teste unitário
-    caminho = "./downloads_ans/3T2023.csv"
+    caminho = "./downloads_ans/3T2023/3T2023.csv"
     if os.path.exists(caminho):
         df_resultado = processar_arquivo(caminho)
-        
+
         if df_resultado is not None:
             print("\n--- Amostra do Resultado Final ---")
             print(df_resultado.head())
-            
+
             # Salva um teste para você conferir
             df_resultado.to_csv("teste_consolidado.csv", index=False, sep=';', encoding='utf-8')
             print("\nArquivo 'teste_consolidado.csv' gerado na raiz para conferência.")
     else:
-        print("Arquivo de entrada não encontrado. Rode o main.py primeiro.")
\ No newline at end of file
+        print("Arquivo de entrada não encontrado. Rode o main.py primeiro.")
@@ -0,0 +1,160 @@
+import os
+import shutil
+import pandas as pd
+
+# Parquet é opcional: sem o pyarrow instalado o pipeline continua em CSV
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+# --- CONFIGURAÇÕES ---
+# Formato dos arquivos trocados entre as etapas: 'csv' (padrão) ou 'parquet'
+# Ex: ETL_FORMATO=parquet python src/etl/main.py
+FORMATO = os.environ.get("ETL_FORMATO", "csv").lower()
+
+# zstd comprime bem e descomprime rápido
+COMPRESSAO_PARQUET = "zstd"
+
+# Partições padrão das tabelas de despesas (uma pasta por Ano/Trimestre)
+PARTICOES_DESPESAS = ['Ano', 'Trimestre']
+
+def formato_ativo(formato=None):
+    """Resolve o formato pedido (ou o configurado) e garante que ele pode ser usado"""
+    formato = (formato or FORMATO).lower()
+
+    if formato not in ('csv', 'parquet'):
+        raise ValueError(f"Formato desconhecido: {formato}. Use 'csv' ou 'parquet'.")
+    if formato == 'parquet' and pa is None:
+        raise ImportError("Formato parquet requer o pacote 'pyarrow' (pip install pyarrow).")
+
+    return formato
+
+def caminho_tabela(nome_base, formato=None):
+    """'consolidado_despesas' -> 'consolidado_despesas.csv' ou 'consolidado_despesas.parquet' (pasta)"""
+    return f"{nome_base}.{formato_ativo(formato)}"
+
+def existe_tabela(nome_base, formato=None):
+    return os.path.exists(caminho_tabela(nome_base, formato))
+
+def salvar_tabela(df, nome_base, particoes=None, formato=None):
+    """
+    Grava o DataFrame no formato intermediário e devolve o caminho gerado.
+    Em parquet, 'particoes' vira uma pasta por valor (ex: Ano=2023/Trimestre=3T).
+    """
+    formato = formato_ativo(formato)
+    caminho = caminho_tabela(nome_base, formato)
+
+    if formato == 'csv':
+        df.to_csv(caminho, index=False, sep=';', encoding='utf-8')
+        return caminho
+
+    # Regrava a tabela inteira: remove a versão anterior para não sobrar partição velha
+    if os.path.isdir(caminho):
+        shutil.rmtree(caminho)
+
+    tabela = pa.Table.from_pandas(df, preserve_index=False)
+    pq.write_to_dataset(tabela, caminho, partition_cols=particoes or None,
+                        compression=COMPRESSAO_PARQUET)
+    return caminho
+
+def salvar_tabela_em_blocos(blocos, nome_base, particoes=None, formato=None):
+    """
+    Igual a salvar_tabela, mas recebe um iterador de DataFrames e grava um por vez
+    (a tabela inteira nunca fica na memória). Devolve (caminho, quantidade de linhas).
+    """
+    formato = formato_ativo(formato)
+    caminho = caminho_tabela(nome_base, formato)
+
+    if formato == 'parquet' and os.path.isdir(caminho):
+        shutil.rmtree(caminho)
+
+    linhas = 0
+    for i, bloco in enumerate(blocos):
+        if formato == 'csv':
+            # Primeiro bloco cria o arquivo com cabeçalho, os demais só acrescentam linhas
+            bloco.to_csv(caminho, index=False, sep=';', encoding='utf-8',
+                         mode='w' if i == 0 else 'a', header=(i == 0))
+        else:
+            tabela = pa.Table.from_pandas(bloco, preserve_index=False)
+            pq.write_to_dataset(tabela, caminho, partition_cols=particoes or None,
+                                compression=COMPRESSAO_PARQUET,
+                                basename_template=f"bloco-{i:05d}-{{i}}.parquet")
+        linhas += len(bloco)
+
+    return caminho, linhas
+
+def aplicar_filtros(df, filtros):
+    """Aplica filtros no formato do pyarrow ([('Ano', '=', 2023), ...]) em um DataFrame"""
+    operacoes = {
+        '=': lambda s, v: s == v,
+        '==': lambda s, v: s == v,
+        '!=': lambda s, v: s != v,
+        '<': lambda s, v: s < v,
+        '<=': lambda s, v: s <= v,
+        '>': lambda s, v: s > v,
+        '>=': lambda s, v: s >= v,
+        'in': lambda s, v: s.isin(v),
+        'not in': lambda s, v: ~s.isin(v),
+    }
+
+    mascara = pd.Series(True, index=df.index)
+    for coluna, op, valor in filtros:
+        mascara &= operacoes[op](df[coluna], valor)
+    return df[mascara]
+
+def abrir_dataset(caminho):
+    """Abre a pasta parquet reconhecendo as partições Ano=.../Trimestre=..."""
+    return ds.dataset(caminho, format='parquet', partitioning='hive')
+
+def ler_tabela(nome_base, colunas=None, filtros=None, tipos=None, formato=None):
+    """
+    Lê uma tabela intermediária.
+    - colunas: só essas colunas são lidas (projeção)
+    - filtros: [('Ano', '=', 2023), ('Trimestre', 'in', ['1T', '3T'])]
+      Em parquet, partições e row groups que não batem nem são lidos.
+    - tipos: dtypes para o CSV (o parquet já guarda os tipos)
+    """
+    formato = formato_ativo(formato)
+    caminho = caminho_tabela(nome_base, formato)
+
+    if formato == 'csv':
+        # Colunas usadas só no filtro precisam ser lidas também
+        usecols = None
+        if colunas:
+            usecols = list(dict.fromkeys(list(colunas) + [f[0] for f in filtros or []]))
+
+        df = pd.read_csv(caminho, sep=';', encoding='utf-8', usecols=usecols, dtype=tipos)
+        if filtros:
+            df = aplicar_filtros(df, filtros)
+        return df[list(colunas)] if colunas else df
+
+    filtro = pq.filters_to_expression(filtros) if filtros else None
+    return abrir_dataset(caminho).to_table(columns=colunas, filter=filtro).to_pandas()
+
+def ler_tabela_em_blocos(nome_base, colunas=None, filtros=None, tipos=None, formato=None,
+                         tamanho_bloco=500_000):
+    """Mesma coisa que ler_tabela, mas entrega um bloco (DataFrame) por vez"""
+    formato = formato_ativo(formato)
+    caminho = caminho_tabela(nome_base, formato)
+
+    if formato == 'csv':
+        usecols = None
+        if colunas:
+            usecols = list(dict.fromkeys(list(colunas) + [f[0] for f in filtros or []]))
+
+        with pd.read_csv(caminho, sep=';', encoding='utf-8', usecols=usecols, dtype=tipos,
+                         chunksize=tamanho_bloco) as leitor:
+            for bloco in leitor:
+                if filtros:
+                    bloco = aplicar_filtros(bloco, filtros)
+                yield bloco[list(colunas)] if colunas else bloco
+        return
+
+    filtro = pq.filters_to_expression(filtros) if filtros else None
+    for lote in abrir_dataset(caminho).to_batches(columns=colunas, filter=filtro,
+                                                  batch_size=tamanho_bloco):
+        if lote.num_rows:
+            yield lote.to_pandas()
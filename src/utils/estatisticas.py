@@ -0,0 +1,112 @@
+import numpy as np
+import pandas as pd
+
+# Estatísticas por grupo calculadas em uma passada só, bloco a bloco.
+# Cada grupo guarda (n, soma, média, M2) -- o estado de Welford. Dois estados parciais
+# (blocos, trimestres ou processos diferentes) se juntam de forma exata pela fórmula de Chan:
+#   delta = média_b - média_a
+#   média = média_a + delta * n_b / n
+#   M2    = M2_a + M2_b + delta² * n_a * n_b / n
+# Assim nada precisa ficar inteiro na memória: só uma linha por grupo.
+
+COLUNAS_ESTADO = ['n', 'soma', 'media', 'm2']
+
+def _sem_categorias(indice):
+    """Níveis categóricos viram valores simples (categorias diferentes entre blocos não atrapalham o merge)"""
+    niveis = indice.to_frame(index=False)
+    for coluna in niveis:
+        if isinstance(niveis[coluna].dtype, pd.CategoricalDtype):
+            niveis[coluna] = niveis[coluna].astype(object)
+    return pd.MultiIndex.from_frame(niveis)
+
+def _mesclar(a, b):
+    """Junta dois estados (DataFrames indexados pela chave do grupo) pela fórmula de Chan"""
+    indice = a.index.union(b.index)
+    a = a.reindex(indice, fill_value=0)
+    b = b.reindex(indice, fill_value=0)
+
+    n = a['n'] + b['n']
+    delta = b['media'] - a['media']
+    return pd.DataFrame({
+        'n': n.astype('int64'),
+        'soma': a['soma'] + b['soma'],
+        'media': a['media'] + delta * b['n'] / n,
+        'm2': a['m2'] + b['m2'] + delta ** 2 * a['n'] * b['n'] / n,
+    })
+
+class AcumuladorEstatisticas:
+    """
+    Soma, quantidade, média e variância por grupo, atualizadas bloco a bloco.
+    O estado é um DataFrame pequeno (uma linha por grupo): pode ser enviado entre processos
+    (pickle) e combinado com outro acumulador das mesmas chaves sem perder precisão.
+    """
+
+    def __init__(self, chaves):
+        self.chaves = list(chaves)
+        self.estado = None
+
+    def atualizar(self, bloco, coluna='Valor'):
+        """Acrescenta as linhas do bloco (NaN é ignorado, como no pandas)"""
+        valores = bloco[coluna]
+        grupos = valores.groupby([bloco[c] for c in self.chaves], observed=True, sort=False)
+
+        n = grupos.count()
+        parcial = pd.DataFrame({
+            'n': n.astype('int64'),
+            'soma': grupos.sum(),
+            'media': grupos.mean(),
+            'm2': grupos.var(ddof=0) * n,
+        })
+        parcial = parcial[parcial['n'] > 0]
+        parcial.index = _sem_categorias(parcial.index)
+
+        self.estado = parcial if self.estado is None else _mesclar(self.estado, parcial)
+        return self
+
+    def combinar(self, outro):
+        """Junta o estado de outro acumulador (ex: de outro trimestre ou de outro processo)"""
+        if outro.chaves != self.chaves:
+            raise ValueError(f"Chaves diferentes: {self.chaves} x {outro.chaves}")
+        if outro.estado is not None:
+            self.estado = outro.estado.copy() if self.estado is None else _mesclar(self.estado, outro.estado)
+        return self
+
+    def resultado(self):
+        """Uma linha por grupo: chaves + n, soma, media, variancia e desvio (amostrais, ddof=1)"""
+        if self.estado is None:
+            return pd.DataFrame(columns=self.chaves + COLUNAS_ESTADO + ['variancia', 'desvio'])
+
+        df = self.estado.copy()
+        df['variancia'] = (df['m2'] / (df['n'] - 1)).where(df['n'] > 1)
+        df['desvio'] = np.sqrt(df['variancia'])
+        df.index.names = self.chaves
+        return df.reset_index()
+
+    def __len__(self):
+        return 0 if self.estado is None else len(self.estado)
+
+# --- DESEMPENHO POR OPERADORA ---
+# Primeiro nível: total de cada operadora em cada trimestre (despesas linha a linha)
+CHAVES_TRIMESTRE = ['RazaoSocial', 'UF', 'Ano', 'Trimestre']
+# Segundo nível: média e desvio desses totais trimestrais por operadora
+CHAVES_OPERADORA = ['RazaoSocial', 'UF']
+
+def novo_acumulador_trimestral():
+    return AcumuladorEstatisticas(CHAVES_TRIMESTRE)
+
+def desempenho_por_operadora(por_trimestre):
+    """
+    Tabela desempenho_operadora a partir do acumulador trimestral:
+    Total_Despesas (soma), Media_Trimestral e Desvio_Padrao calculados sobre os totais de cada trimestre.
+    """
+    totais = por_trimestre.resultado()[CHAVES_TRIMESTRE + ['soma']]
+    por_operadora = AcumuladorEstatisticas(CHAVES_OPERADORA).atualizar(totais, coluna='soma').resultado()
+
+    df = pd.DataFrame({
+        'RazaoSocial': por_operadora['RazaoSocial'],
+        'UF': por_operadora['UF'],
+        'Total_Despesas': por_operadora['soma'],
+        'Media_Trimestral': por_operadora['media'],
+        'Desvio_Padrao': por_operadora['desvio'].fillna(0), # Um trimestre só: sem dispersão
+    })
+    return df.sort_values(by='Total_Despesas', ascending=False, ignore_index=True)
@@ -0,0 +1,268 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+# resource só existe em Unix: no Windows as medidas de memória ficam como None
+try:
+    import resource
+except ImportError:
+    resource = None
+
+# Instrumentação compartilhada pelo ETL e pela API, sem dependências externas:
+# - métricas no formato texto do Prometheus (contadores, histogramas e medidores)
+# - etapas do ETL (download, parse, filtro, join, agregação, carga) com tempo, linhas e memória
+# - relatório JSON de cada execução do ETL
+
+# --- CONFIGURAÇÕES ---
+# Pasta dos relatórios JSON de cada execução (um arquivo por execução)
+DIR_RELATORIOS = os.environ.get("ETL_DIR_RELATORIOS", "./relatorios")
+
+# Limites (em segundos) dos baldes dos histogramas de latência
+BALDES_PADRAO = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+def _chave_rotulos(nomes, rotulos):
+    return tuple(str(rotulos.get(nome, "")) for nome in nomes)
+
+def _formatar_rotulos(nomes, valores, extra=None):
+    pares = list(zip(nomes, valores)) + (list(extra.items()) if extra else [])
+    if not pares:
+        return ""
+    escapar = lambda v: str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return "{" + ",".join(f'{n}="{escapar(v)}"' for n, v in pares) + "}"
+
+class Contador:
+    """Valor que só cresce (ex: total de linhas carregadas)"""
+
+    tipo = "counter"
+
+    def __init__(self, nome, ajuda, rotulos=()):
+        self.nome, self.ajuda, self.rotulos = nome, ajuda, tuple(rotulos)
+        self._valores = {}
+        self._lock = threading.Lock()
+
+    def incrementar(self, valor=1, **rotulos):
+        chave = _chave_rotulos(self.rotulos, rotulos)
+        with self._lock:
+            self._valores[chave] = self._valores.get(chave, 0) + valor
+
+    def exportar(self):
+        with self._lock:
+            return [f"{self.nome}{_formatar_rotulos(self.rotulos, chave)} {valor}"
+                    for chave, valor in sorted(self._valores.items())]
+
+class Histograma:
+    """Distribuição de valores em baldes cumulativos (ex: latência por rota)"""
+
+    tipo = "histogram"
+
+    def __init__(self, nome, ajuda, rotulos=(), baldes=BALDES_PADRAO):
+        self.nome, self.ajuda, self.rotulos = nome, ajuda, tuple(rotulos)
+        self.baldes = tuple(sorted(baldes))
+        self._series = {} # chave -> [contagens por balde, soma, quantidade]
+        self._lock = threading.Lock()
+
+    def observar(self, valor, **rotulos):
+        chave = _chave_rotulos(self.rotulos, rotulos)
+        with self._lock:
+            serie = self._series.setdefault(chave, [[0] * len(self.baldes), 0.0, 0])
+            for i, limite in enumerate(self.baldes):
+                if valor <= limite:
+                    serie[0][i] += 1
+            serie[1] += valor
+            serie[2] += 1
+
+    def exportar(self):
+        linhas = []
+        with self._lock:
+            for chave, (contagens, soma, quantidade) in sorted(self._series.items()):
+                for limite, contagem in zip(self.baldes, contagens):
+                    linhas.append(f"{self.nome}_bucket{_formatar_rotulos(self.rotulos, chave, {'le': limite})} {contagem}")
+                linhas.append(f"{self.nome}_bucket{_formatar_rotulos(self.rotulos, chave, {'le': '+Inf'})} {quantidade}")
+                linhas.append(f"{self.nome}_sum{_formatar_rotulos(self.rotulos, chave)} {soma}")
+                linhas.append(f"{self.nome}_count{_formatar_rotulos(self.rotulos, chave)} {quantidade}")
+        return linhas
+
+class Medidor:
+    """Valor instantâneo lido na hora da exportação (ex: itens no cache)"""
+
+    tipo = "gauge"
+
+    def __init__(self, nome, ajuda, funcao):
+        self.nome, self.ajuda, self.funcao = nome, ajuda, funcao
+
+    def exportar(self):
+        try:
+            valor = self.funcao()
+        except Exception: # Medidor quebrado não pode derrubar o /metrics inteiro
+            return []
+        return [] if valor is None else [f"{self.nome} {valor}"]
+
+_metricas = {}
+_lock_registro = threading.Lock()
+
+def _registrar(classe, nome, *args, **kwargs):
+    """Cria a métrica uma vez só (módulos importados de novo reaproveitam a mesma)"""
+    with _lock_registro:
+        if nome not in _metricas:
+            _metricas[nome] = classe(nome, *args, **kwargs)
+        return _metricas[nome]
+
+def contador(nome, ajuda, rotulos=()):
+    return _registrar(Contador, nome, ajuda, rotulos)
+
+def histograma(nome, ajuda, rotulos=(), baldes=BALDES_PADRAO):
+    return _registrar(Histograma, nome, ajuda, rotulos, baldes)
+
+def medidor(nome, ajuda, funcao):
+    with _lock_registro:
+        _metricas[nome] = Medidor(nome, ajuda, funcao) # Sempre a função mais recente
+        return _metricas[nome]
+
+def exportar_prometheus():
+    """Todas as métricas no formato texto do Prometheus (para o /metrics)"""
+    with _lock_registro:
+        metricas = list(_metricas.values())
+
+    linhas = []
+    for metrica in sorted(metricas, key=lambda m: m.nome):
+        linhas.append(f"# HELP {metrica.nome} {metrica.ajuda}")
+        linhas.append(f"# TYPE {metrica.nome} {metrica.tipo}")
+        linhas.extend(metrica.exportar())
+    return "\n".join(linhas) + "\n"
+
+# --- ETAPAS DO ETL ---
+ETAPA_SEGUNDOS = histograma("etl_etapa_segundos", "Duração de cada etapa do ETL", ("etapa",))
+ETAPA_LINHAS = contador("etl_etapa_linhas_total", "Linhas processadas por etapa do ETL", ("etapa",))
+
+_execucao = {"etapas": []}
+_lock_execucao = threading.Lock()
+
+def memoria_atual_mb():
+    """Memória residente do processo agora (Linux); fora do Linux, o pico (ru_maxrss) ou None"""
+    try:
+        with open("/proc/self/statm") as f:
+            paginas = int(f.read().split()[1])
+        return round(paginas * os.sysconf("SC_PAGE_SIZE") / 2**20, 1)
+    except (OSError, ValueError, IndexError):
+        return memoria_pico_mb()
+
+def memoria_pico_mb():
+    if resource is None:
+        return None
+    # ru_maxrss vem em KB no Linux
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+def registrar_etapa(nome, segundos, linhas=None, **detalhes):
+    """Guarda uma etapa já medida (tempo, linhas e detalhes como trimestre ou bytes)"""
+    entrada = {"etapa": nome, "segundos": round(segundos, 4), "linhas": linhas}
+    if linhas is not None and segundos > 0:
+        entrada["linhas_por_segundo"] = round(linhas / segundos, 1)
+    if detalhes.get("bytes") and segundos > 0:
+        entrada["mb_por_segundo"] = round(detalhes["bytes"] / 2**20 / segundos, 2)
+    entrada.update(detalhes)
+    entrada["memoria_mb"] = memoria_atual_mb()
+
+    with _lock_execucao:
+        _execucao["etapas"].append(entrada)
+
+    ETAPA_SEGUNDOS.observar(segundos, etapa=nome)
+    if linhas:
+        ETAPA_LINHAS.incrementar(linhas, etapa=nome)
+    return entrada
+
+@contextmanager
+def etapa(nome, **detalhes):
+    """
+    Mede um trecho do ETL. Dentro do bloco, preencha span['linhas'] (e o que mais for útil):
+        with etapa('download', trimestre='3T2023') as span:
+            ...
+            span['bytes'] = tamanho
+    """
+    span = {}
+    inicio = time.perf_counter()
+    try:
+        yield span
+    except Exception as e:
+        span.update(status="erro", erro=f"{type(e).__name__}: {e}")
+        raise
+    finally:
+        registrar_etapa(nome, time.perf_counter() - inicio, span.pop("linhas", None), **detalhes, **span)
+
+def etapas_registradas():
+    with _lock_execucao:
+        return list(_execucao["etapas"])
+
+def incorporar_etapas(etapas):
+    """Acrescenta etapas medidas em outro processo (ex: workers do modo multiprocesso)"""
+    with _lock_execucao:
+        _execucao["etapas"].extend(etapas)
+
+@contextmanager
+def etapas_isoladas():
+    """Coleta só as etapas registradas dentro do bloco (um worker reaproveitado já tem as etapas das tarefas anteriores)"""
+    coletadas = []
+    with _lock_execucao:
+        anteriores, _execucao["etapas"] = _execucao["etapas"], coletadas
+    try:
+        yield coletadas
+    finally:
+        with _lock_execucao:
+            _execucao["etapas"] = anteriores
+
+def resumir_etapas(etapas):
+    """Totais por etapa: tempo somado, linhas e vazão (linhas/s)"""
+    resumo = {}
+    for e in etapas:
+        item = resumo.setdefault(e["etapa"], {"vezes": 0, "segundos": 0.0, "linhas": 0})
+        item["vezes"] += 1
+        item["segundos"] = round(item["segundos"] + e["segundos"], 4)
+        item["linhas"] += e.get("linhas") or 0
+    for item in resumo.values():
+        if item["segundos"] > 0 and item["linhas"]:
+            item["linhas_por_segundo"] = round(item["linhas"] / item["segundos"], 1)
+    return resumo
+
+@contextmanager
+def execucao(nome, diretorio=None):
+    """
+    Uma execução do ETL: zera as etapas, mede o total e, no fim (com sucesso ou erro),
+    grava o relatório JSON em DIR_RELATORIOS/<nome>-<data>.json.
+    """
+    with _lock_execucao:
+        _execucao["etapas"] = []
+    iniciado_em = datetime.now()
+    inicio = time.perf_counter()
+    relatorio = {"execucao": nome, "status": "ok"}
+
+    try:
+        yield relatorio
+    except BaseException as e:
+        relatorio.update(status="erro", erro=f"{type(e).__name__}: {e}")
+        raise
+    finally:
+        etapas = etapas_registradas()
+        relatorio.update(
+            iniciado_em=iniciado_em.isoformat(timespec='seconds'),
+            segundos=round(time.perf_counter() - inicio, 4),
+            memoria_pico_mb=memoria_pico_mb(),
+            resumo=resumir_etapas(etapas),
+            etapas=etapas,
+        )
+        salvar_relatorio(relatorio, nome, iniciado_em, diretorio)
+
+def salvar_relatorio(relatorio, nome, quando, diretorio=None):
+    diretorio = diretorio or DIR_RELATORIOS
+    try:
+        os.makedirs(diretorio, exist_ok=True)
+        caminho = os.path.join(diretorio, f"{nome}-{quando:%Y%m%d-%H%M%S}.json")
+        with open(caminho, 'w', encoding='utf-8') as f:
+            json.dump(relatorio, f, ensure_ascii=False, indent=2, default=str)
+        print(f"📝 Relatório da execução: {caminho}")
+        return caminho
+    except OSError as e:
+        # Falha ao gravar o relatório não pode esconder o resultado da execução
+        print(f"⚠️ Não foi possível gravar o relatório: {e}")
+        return None
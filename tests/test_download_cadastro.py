@@ -0,0 +1,181 @@
+import hashlib
+import os
+import sys
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Mesmo esquema dos scripts do ETL: módulos de src/etl e a raiz do projeto (src/utils) no path
+RAIZ = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(os.path.join(RAIZ, 'src', 'etl'))
+sys.path.append(RAIZ)
+
+import download_cadastro
+from cadastro import carregar_instantaneo
+from manifesto import carregar_manifesto
+
+# Download do cadastro (download_cadastro.py) contra um servidor local que imita o da ANS:
+# ETag, GET condicional (304), Range com If-Range (206 / 200) e 416 para faixa fora do arquivo.
+
+CABECALHO = "REGISTRO_OPERADORA;CNPJ;Razao_Social;Modalidade;UF\n"
+
+def gerar_cadastro(quantidade, sufixo=""):
+    linhas = [f"{i:06d};{i:014d};OPERADORA {i}{sufixo};Medicina de Grupo;SP\n" for i in range(1, quantidade + 1)]
+    return (CABECALHO + "".join(linhas)).encode('utf-8')
+
+class ServidorANS(BaseHTTPRequestHandler):
+    """Serve 'conteudo' com o ETag do seu hash. 'corte' (uma vez só) derruba a conexão no meio do corpo."""
+    conteudo = b""
+    corte = None
+    respostas = []  # (status, cabeçalhos da requisição) de cada resposta
+
+    @classmethod
+    def etag(cls):
+        return '"' + hashlib.sha256(cls.conteudo).hexdigest()[:16] + '"'
+
+    def do_GET(self):
+        conteudo, etag = ServidorANS.conteudo, ServidorANS.etag()
+
+        if self.headers.get('If-None-Match') == etag:
+            return self.responder(304, {'ETag': etag})
+
+        inicio = 0
+        faixa = self.headers.get('Range')
+        # If-Range diferente do ETag atual: o arquivo mudou, manda tudo de novo (200)
+        if faixa and self.headers.get('If-Range') in (None, etag):
+            inicio = int(faixa.removeprefix('bytes=').split('-')[0])
+            if inicio >= len(conteudo):
+                return self.responder(416, {'Content-Range': f"bytes */{len(conteudo)}"})
+
+        corpo = conteudo[inicio:]
+        cabecalhos = {'ETag': etag, 'Content-Length': str(len(corpo))}
+        if inicio:
+            cabecalhos['Content-Range'] = f"bytes {inicio}-{len(conteudo) - 1}/{len(conteudo)}"
+        self.responder(206 if inicio else 200, cabecalhos, corpo)
+
+    def responder(self, status, cabecalhos, corpo=b""):
+        ServidorANS.respostas.append((status, dict(self.headers)))
+        self.send_response(status)
+        for nome, valor in cabecalhos.items():
+            self.send_header(nome, valor)
+        if 'Content-Length' not in cabecalhos:
+            self.send_header('Content-Length', '0')
+        self.end_headers()
+
+        if ServidorANS.corte is not None and corpo:
+            # Conexão cai no meio: o cliente recebe menos bytes do que o Content-Length prometeu
+            corpo, ServidorANS.corte = corpo[:ServidorANS.corte], None
+            self.wfile.write(corpo)
+            self.wfile.flush()
+            self.close_connection = True
+            return
+        self.wfile.write(corpo)
+
+    def log_message(self, *args):
+        pass
+
+class TestDownloadCadastro(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.servidor = ThreadingHTTPServer(('127.0.0.1', 0), ServidorANS)
+        threading.Thread(target=cls.servidor.serve_forever, daemon=True).start()
+        cls.url = f"http://127.0.0.1:{cls.servidor.server_address[1]}/Relatorio_cadop.csv"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.servidor.shutdown()
+        cls.servidor.server_close()
+
+    def setUp(self):
+        # Os caminhos do ETL são relativos (./downloads_ans): cada teste roda numa pasta vazia
+        self.pasta = tempfile.TemporaryDirectory()
+        self.anterior = os.getcwd()
+        os.chdir(self.pasta.name)
+        # Blocos pequenos: o que chegou antes da queda já está no .parcial (o corpo tem ~115 KB)
+        self.bloco_original = download_cadastro.TAMANHO_BLOCO_DOWNLOAD
+        download_cadastro.TAMANHO_BLOCO_DOWNLOAD = 1000
+        ServidorANS.conteudo = gerar_cadastro(2000)
+        ServidorANS.corte = None
+        ServidorANS.respostas = []
+
+    def tearDown(self):
+        download_cadastro.TAMANHO_BLOCO_DOWNLOAD = self.bloco_original
+        os.chdir(self.anterior)
+        self.pasta.cleanup()
+
+    def baixar(self):
+        return download_cadastro.baixar_cadastro(self.url)
+
+    def status(self):
+        return [status for status, _ in ServidorANS.respostas]
+
+    def conferir_arquivo(self, conteudo):
+        with open(download_cadastro.ARQUIVO_SAIDA, 'rb') as f:
+            self.assertEqual(f.read(), conteudo)
+        self.assertFalse(os.path.exists(download_cadastro.ARQUIVO_PARCIAL))
+        entrada = carregar_manifesto()[download_cadastro.CHAVE_MANIFESTO]
+        self.assertEqual(entrada['sha256'], hashlib.sha256(conteudo).hexdigest())
+        self.assertNotIn('parcial', entrada)
+        # O instantâneo do cadastro acompanha o CSV baixado
+        indice = carregar_instantaneo(download_cadastro.ARQUIVO_SAIDA)
+        self.assertIsNotNone(indice)
+        self.assertEqual(len(indice), conteudo.count(b"\n") - 1)
+
+    def interromper(self, apos_bytes):
+        """Primeira tentativa cai no meio: sobra o .parcial com os validadores no manifesto"""
+        ServidorANS.corte = apos_bytes
+        self.assertFalse(self.baixar())
+        self.assertEqual(os.path.getsize(download_cadastro.ARQUIVO_PARCIAL), apos_bytes)
+
+    def test_sem_mudanca_responde_304(self):
+        self.assertTrue(self.baixar())
+        self.assertTrue(self.baixar())
+
+        self.assertEqual(self.status(), [200, 304])
+        self.assertEqual(ServidorANS.respostas[1][1].get('If-None-Match'), ServidorANS.etag())
+        self.conferir_arquivo(ServidorANS.conteudo)
+
+    def test_download_interrompido_continua_com_206(self):
+        self.interromper(5000)
+        self.assertTrue(self.baixar())
+
+        self.assertEqual(self.status(), [200, 206])
+        cabecalhos = ServidorANS.respostas[1][1]
+        self.assertEqual(cabecalhos.get('Range'), "bytes=5000-")
+        self.assertEqual(cabecalhos.get('If-Range'), ServidorANS.etag())
+        self.conferir_arquivo(ServidorANS.conteudo)
+
+    def test_arquivo_mudou_durante_a_retomada_baixa_tudo(self):
+        self.interromper(5000)
+        ServidorANS.conteudo = gerar_cadastro(2500, sufixo=" NOVA")
+        self.assertTrue(self.baixar())
+
+        # If-Range com o ETag antigo: o servidor ignora o Range e manda o arquivo novo inteiro
+        self.assertEqual(self.status(), [200, 200])
+        self.assertEqual(ServidorANS.respostas[1][1].get('Range'), "bytes=5000-")
+        self.conferir_arquivo(ServidorANS.conteudo)
+
+    def test_parcial_maior_que_o_arquivo_recomeca_apos_416(self):
+        self.interromper(5000)
+        # No servidor, o mesmo arquivo (mesmo ETag) agora é menor que o que já temos
+        with open(download_cadastro.ARQUIVO_PARCIAL, 'ab') as f:
+            f.write(b"x" * len(ServidorANS.conteudo))
+        self.assertTrue(self.baixar())
+
+        self.assertEqual(self.status(), [200, 416, 200])
+        self.assertNotIn('Range', ServidorANS.respostas[2][1])
+        self.conferir_arquivo(ServidorANS.conteudo)
+
+    def test_arquivo_novo_no_servidor_substitui_o_anterior(self):
+        self.assertTrue(self.baixar())
+        ServidorANS.conteudo = gerar_cadastro(1500, sufixo=" NOVA")
+        self.assertTrue(self.baixar())
+
+        self.assertEqual(self.status(), [200, 200])
+        self.assertIsNotNone(ServidorANS.respostas[1][1].get('If-None-Match'))
+        self.conferir_arquivo(ServidorANS.conteudo)
+
+if __name__ == "__main__":
+    unittest.main()
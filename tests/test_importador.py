@@ -0,0 +1,135 @@
+import os
+import sqlite3
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+import pandas as pd
+
+# Raiz do projeto no path (src.database, src.utils)
+RAIZ = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(RAIZ)
+
+from src.database import importador, publicacao
+
+# Carga do arquivo completo no formato compacto (despesas_fato + contas_dim)
+
+def bloco_completo(linhas):
+    """Bloco no formato do dados_completos_para_sql.csv: (registro, descrição, valor) por linha"""
+    return pd.DataFrame({
+        'RegistroANS': [r for r, _, _ in linhas],
+        'CNPJ': [f"{int(r):014d}" for r, _, _ in linhas],
+        'RazaoSocial': [f"OPERADORA {r}" for r, _, _ in linhas],
+        'Modalidade': 'Medicina de Grupo',
+        'UF': 'SP',
+        'Ano': 2023,
+        'Trimestre': '3T',
+        'DESCRICAO': [d for _, d, _ in linhas],
+        'Categoria': 'EVENTOS_SINISTROS',
+        'Valor': [v for _, _, v in linhas],
+    }, columns=importador.COLUNAS_COMPLETO)
+
+class TestCodificarDespesas(unittest.TestCase):
+
+    def test_descricao_vazia_ganha_conta_propria(self):
+        bloco = bloco_completo([('000001', 'A', 1.0), ('000001', None, 2.0), ('000002', 'Z', 3.0)])
+        contas = {}
+        fato, novas = importador.codificar_despesas(bloco, contas)
+
+        descricao_por_id = {id_: descricao for id_, descricao, _ in novas}
+        self.assertEqual([descricao_por_id[c] for c in fato['conta']], ['A', importador.DESCRICAO_VAZIA, 'Z'])
+        self.assertEqual(len(set(fato['conta'])), 3)
+
+    def test_descricao_vazia_reaproveita_a_conta_entre_blocos(self):
+        contas = {}
+        fato1, _ = importador.codificar_despesas(bloco_completo([('000001', None, 1.0)]), contas)
+        fato2, novas = importador.codificar_despesas(bloco_completo([('000003', float('nan'), 2.0)]), contas)
+        self.assertEqual(fato1['conta'].tolist(), fato2['conta'].tolist())
+        self.assertEqual(novas, [])
+
+class TestCargaEmMassa(unittest.TestCase):
+
+    def setUp(self):
+        self.pasta = tempfile.TemporaryDirectory()
+        self.schema_original = importador.SQL_SCHEMA
+        importador.SQL_SCHEMA = os.path.join(RAIZ, 'src', 'database', 'schema.sql')
+
+    def tearDown(self):
+        importador.SQL_SCHEMA = self.schema_original
+        self.pasta.cleanup()
+
+    def test_historico_nao_pega_a_descricao_de_outra_operadora(self):
+        caminho = os.path.join(self.pasta.name, 'teste.db')
+        bloco = bloco_completo([('000001', 'A', 1.0), ('000001', None, 2.0), ('000002', 'Z', 3.0)])
+        self.assertTrue(importador.importar_dados_em_massa(caminho, blocos=[bloco]))
+
+        with sqlite3.connect(caminho) as conn:
+            linhas = conn.execute("""
+                SELECT f.registro, c.descricao, f.valor
+                FROM despesas_fato f JOIN contas_dim c ON c.id = f.conta
+                ORDER BY f.seq
+            """).fetchall()
+        self.assertEqual(linhas, [(1, 'A', 1.0), (1, '', 2.0), (2, 'Z', 3.0)])
+
+class TestCargaVersionada(unittest.TestCase):
+    """Carga azul/verde: só versão completa e otimizada ganha o nome banco-*.db"""
+
+    def setUp(self):
+        self.pasta = tempfile.TemporaryDirectory()
+        self.originais = (importador.SQL_SCHEMA, importador.MODO_CARGA, publicacao.DIR_VERSOES,
+                          publicacao.ARQUIVO_PONTEIRO)
+        importador.SQL_SCHEMA = os.path.join(RAIZ, 'src', 'database', 'schema.sql')
+        importador.MODO_CARGA = "massa"
+        publicacao.DIR_VERSOES = os.path.join(self.pasta.name, 'bancos')
+        publicacao.ARQUIVO_PONTEIRO = os.path.join(self.pasta.name, 'banco_atual.txt')
+
+    def tearDown(self):
+        (importador.SQL_SCHEMA, importador.MODO_CARGA, publicacao.DIR_VERSOES,
+         publicacao.ARQUIVO_PONTEIRO) = self.originais
+        self.pasta.cleanup()
+
+    def blocos(self):
+        return [bloco_completo([('000001', 'A', 1.0), ('000002', 'Z', 3.0)])]
+
+    def arquivos(self):
+        return sorted(os.listdir(publicacao.DIR_VERSOES))
+
+    def test_carga_completa_vira_versao(self):
+        self.assertTrue(importador.carregar_e_publicar(self.blocos()))
+
+        versoes = publicacao.listar_versoes()
+        self.assertEqual(len(versoes), 1)
+        self.assertEqual(self.arquivos(), [os.path.basename(versoes[0])])
+        self.assertEqual(publicacao.banco_atual(), versoes[0])
+
+    def test_carga_que_falha_nao_deixa_versao(self):
+        self.assertTrue(importador.carregar_e_publicar(self.blocos()))
+        publicada = publicacao.banco_atual()
+
+        def blocos_com_erro():
+            yield from self.blocos()
+            raise ValueError("arquivo cortado")
+
+        self.assertFalse(importador.carregar_e_publicar(blocos_com_erro()))
+        with mock.patch.object(importador, 'otimizar', side_effect=sqlite3.OperationalError("disco cheio")):
+            with self.assertRaises(sqlite3.OperationalError):
+                importador.carregar_e_publicar(self.blocos())
+
+        # Nenhum .parcial sobrando, e o --voltar não tem para onde ir
+        self.assertEqual(self.arquivos(), [os.path.basename(publicada)])
+        self.assertEqual(publicacao.banco_atual(), publicada)
+        self.assertIsNone(publicacao.versao_anterior())
+
+    def test_parcial_de_carga_interrompida_nao_e_versao(self):
+        self.assertTrue(importador.carregar_e_publicar(self.blocos()))
+        # Processo morto no meio da carga: o finally não roda e o .parcial fica no disco
+        interrompida = publicacao.caminho_parcial(publicacao.novo_caminho_versao())
+        with open(interrompida, 'wb') as f:
+            f.write(b"meio banco")
+
+        self.assertEqual(len(publicacao.listar_versoes()), 1)
+        self.assertIsNone(publicacao.versao_anterior())
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,69 @@
+import io
+import os
+import sys
+import tempfile
+import unittest
+
+# Mesmo esquema dos scripts do ETL: módulos de src/etl e a raiz do projeto (src/utils) no path
+RAIZ = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(os.path.join(RAIZ, 'src', 'etl'))
+sys.path.append(RAIZ)
+
+import leitor_ans
+
+# Linhas sem REG_ANS válido (vazio, não numérico, fora do int32) vão para a quarentena nos dois motores,
+# em vez de derrubar a leitura do arquivo inteiro
+
+CABECALHO = "REG_ANS;DATA;CD_CONTA_CONTABIL;DESCRICAO;VL_SALDO_FINAL;OUTRA\n"
+LINHAS = [
+    "000001;2023-01-01;41;A;1,5;x\n",
+    ";2023-01-01;41;B;2,5;x\n",
+    "ABC;2023-01-01;41;C;3,5;x\n",
+    "99999999999;2023-01-01;41;D;4,5;x\n",
+    "3;2023-01-01;41;E;6,5;x\n",
+]
+CONTEUDO = (CABECALHO + "".join(LINHAS)).encode('utf-8')
+
+MOTORES = ['c'] + (['pyarrow'] if leitor_ans.pa is not None else [])
+
+class TestRegistroInvalido(unittest.TestCase):
+
+    def setUp(self):
+        self.pasta = tempfile.TemporaryDirectory()
+        self.diretorio_original = leitor_ans.DIR_QUARENTENA
+        leitor_ans.DIR_QUARENTENA = self.pasta.name
+
+    def tearDown(self):
+        leitor_ans.DIR_QUARENTENA = self.diretorio_original
+        self.pasta.cleanup()
+
+    def conferir(self, df, resumo):
+        self.assertEqual(str(df['REG_ANS'].dtype), 'int32')
+        self.assertEqual(df['REG_ANS'].tolist(), [1, 3])
+        self.assertEqual(df['DESCRICAO'].astype(str).tolist(), ['A', 'E'])
+        self.assertEqual(resumo['quarentena'], 3)
+
+        with open(os.path.join(self.pasta.name, 'teste.csv'), encoding='utf-8') as f:
+            guardadas = f.read().splitlines()
+        self.assertEqual(guardadas[0], CABECALHO.strip())
+        self.assertEqual([linha.split(';')[0] for linha in guardadas[1:]], ['', 'ABC', '99999999999'])
+
+    def test_arquivo_inteiro(self):
+        for motor in MOTORES:
+            with self.subTest(motor=motor):
+                resumo = {}
+                df = leitor_ans.ler_csv_ans(io.BytesIO(CONTEUDO), 'demonstracoes', nome='teste',
+                                            resumo=resumo, motor=motor)
+                self.conferir(df, resumo)
+
+    def test_em_blocos(self):
+        for motor in MOTORES:
+            with self.subTest(motor=motor):
+                resumo = {}
+                blocos = list(leitor_ans.ler_csv_ans_em_blocos(io.BytesIO(CONTEUDO), 'demonstracoes', nome='teste',
+                                                               resumo=resumo, motor=motor))
+                self.assertEqual(len(blocos), 1)
+                self.conferir(blocos[0], resumo)
+
+if __name__ == "__main__":
+    unittest.main()
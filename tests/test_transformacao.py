@@ -0,0 +1,46 @@
+import os
+import sys
+import tempfile
+import unittest
+
+# Mesmo esquema dos scripts do ETL: módulos de src/etl e a raiz do projeto (src/utils) no path
+RAIZ = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(os.path.join(RAIZ, 'src', 'etl'))
+sys.path.append(RAIZ)
+
+import leitor_ans
+import transformacao
+
+# Blocos montados de linhas em dicionário (csv.DictReader): REG_ANS vazio não derruba o bloco
+
+def linha(registro, descricao):
+    return {'REG_ANS': registro, 'DATA': '2023-01-01', 'CD_CONTA_CONTABIL': '41',
+            'DESCRICAO': descricao, 'VL_SALDO_FINAL': '1234,56'}
+
+class TestBlocoDeLinhas(unittest.TestCase):
+
+    def setUp(self):
+        self.pasta = tempfile.TemporaryDirectory()
+        self.diretorio_original = leitor_ans.DIR_QUARENTENA
+        leitor_ans.DIR_QUARENTENA = self.pasta.name
+
+    def tearDown(self):
+        leitor_ans.DIR_QUARENTENA = self.diretorio_original
+        self.pasta.cleanup()
+
+    def test_registro_invalido_vai_para_a_quarentena(self):
+        linhas = [linha('000001', 'A'), linha('', 'B'), linha(None, 'C'), linha('X1', 'D'), linha(7, 'E')]
+        resumo = {}
+        blocos = list(transformacao.ler_blocos(iter(linhas), tamanho_bloco=3, resumo=resumo))
+
+        self.assertEqual([b['REG_ANS'].tolist() for b in blocos], [[1], [7]])
+        self.assertTrue(all(str(b['REG_ANS'].dtype) == 'int32' for b in blocos))
+        self.assertEqual(blocos[0]['VL_SALDO_FINAL'].tolist(), [1234.56])
+        self.assertEqual(resumo['quarentena'], 3)
+
+        with open(os.path.join(self.pasta.name, 'linhas.csv'), encoding='utf-8') as f:
+            guardadas = f.read().splitlines()
+        self.assertEqual([g.split(';')[3] for g in guardadas[1:]], ['B', 'C', 'D'])
+
+if __name__ == "__main__":
+    unittest.main()